@@ -1,3 +1,4 @@
+import hmac
 import os
 
 from flask import (Flask, Response, abort, flash, g, jsonify, redirect,
@@ -5,13 +6,21 @@ from flask import (Flask, Response, abort, flash, g, jsonify, redirect,
 from flask_debugtoolbar import DebugToolbarExtension
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
+from feed import paginate, parse_fields, select_fields
 from forms import (ArticleForm, ArticleTagForm, LoginForm, RegisterForm,
                    TagsForm, UserEditForm)
+from fragments import CardCache
+from headlines import HeadlineRefresher
+from ingestion import HeadlineIngester
 from logger import logger
 from models import (
-    NEWS_CATEGORIES, Article, ArticleTag, Category, Saves, Tag, User,
+    NEWS_CATEGORIES, Article, ArticleTag, Category, Saves, TagJob, User,
     UserCategory, connect_db)
 from newsmart import NewSmart
+from recommendations import RecommendationRefresher
+from tag_jobs import TagJobWorker
+from url_validator import UrlValidator
+from user_context import load_current_user
 from util import CURR_USER_KEY, do_login, do_logout, login_required
 
 app = Flask(__name__)
@@ -24,11 +33,63 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_ECHO'] = False
 app.config['DEBUG_TB_INTERCEPT_REDIRECTS'] = True
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', "test")
+# bearer token of the full /api/metrics report; unset keeps it private
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
 toolbar = DebugToolbarExtension(app)
 
 connect_db(app)
 
 newsmart = NewSmart()
+tag_job_worker = TagJobWorker(
+    app, newsmart, max_workers=int(os.environ.get("TAG_JOB_WORKERS", 2)),
+    retry_delay=int(os.environ.get("TAG_JOB_RETRY_DELAY", 60)))
+recommendation_refresher = RecommendationRefresher(
+    app, newsmart,
+    max_age=int(os.environ.get("RECOMMENDATION_MAX_AGE", 1800)),
+    poll_interval=int(os.environ.get("RECOMMENDATION_POLL_INTERVAL", 60)))
+url_validator = UrlValidator(newsmart)
+headline_refresher = HeadlineRefresher(
+    newsmart, interval=int(os.environ.get("HEADLINES_REFRESH_INTERVAL", 1800)))
+headline_ingester = HeadlineIngester(
+    app, newsmart, interval=int(os.environ.get("HEADLINES_INGEST_INTERVAL", 900)),
+    is_leader=headline_refresher.is_leader)
+# article cards are rendered once and shared by every user
+card_cache = CardCache(
+    max_entries=int(os.environ.get("CARD_CACHE_ENTRIES", 2048)))
+app.jinja_env.globals['render_card'] = card_cache.render
+
+# pages render this many articles of a feed; the rest load from /api/feed
+FEED_FIRST_PAGE = int(os.environ.get("FEED_FIRST_PAGE", 7))
+FEED_PAGE_SIZE = 10
+FEED_MAX_PAGE_SIZE = 50
+
+
+@app.before_first_request
+def start_background_workers():
+    """
+    Start polling background jobs in this worker process.
+    Note: tests run queued jobs explicitly instead.
+    """
+    if not app.testing:
+        tag_job_worker.start()
+        recommendation_refresher.start()
+        headline_refresher.start()
+        headline_ingester.start()
+
+
+@app.cli.command("refresh-recommendations")
+def refresh_recommendations_command():
+    """Rebuild recommendation feeds of every user with bookmarks."""
+    queued = recommendation_refresher.mark_all_stale()
+    refreshed = recommendation_refresher.run_pending()
+    print(f"Refreshed {refreshed} of {queued} recommendation feeds.")
+
+
+@app.cli.command("ingest-headlines")
+def ingest_headlines_command():
+    """Store current top headlines of every category in the articles table."""
+    counts = headline_ingester.run(fetch=True)
+    print(f"Inserted {counts['inserted']} and updated {counts['updated']} articles.")
 
 
 @app.before_request
@@ -39,9 +100,11 @@ def add_user_to_g():
     Note: g is an application global context that lasts for
         one request/response cycle unlike the session which
         remains and persists for mulitple requests/respones.
+    g.user is a lean CurrentUser (id, username, category ids) cached per
+    worker; use g.user.model for the full user with its relationships.
     """
     g.user = (
-        User.query.get(session[CURR_USER_KEY])
+        load_current_user(session[CURR_USER_KEY])
         if CURR_USER_KEY in session
         else None
     )
@@ -52,17 +115,23 @@ def home_view():
     """
     Home page with viewable/hidden sections for authenicated users.
     """
-    top_articles = newsmart.get_top_articles()
-    bookmarked_urls = newsmart.get_bookmarked_urls()
-    category_map = newsmart.get_user_category_articles(limit=12)
-    related_articles = newsmart.get_recommended_articles()
-    bookmark_map = newsmart.get_bookmark_url_to_id()
+    # sections that miss the page deadline are None and left out of the page
+    sections = newsmart.get_home_sections(category_limit=12)
+    top_articles, top_cursor = (
+        paginate(sections['top_articles'], limit=FEED_FIRST_PAGE)
+        if sections['top_articles'] is not None else (None, None)
+    )
+    # only check bookmarks of articles on this page
+    bookmark_map = newsmart.get_bookmark_index(newsmart.article_urls(
+        top_articles, sections['related_articles'],
+        *(sections['category_map'] or {}).values()
+    ))
 
     return render_template(
-        "home.html", top_articles=top_articles,
-        bookmarked_urls=bookmarked_urls,
-        category_map=category_map,
-        related_articles=related_articles,
+        "home.html", top_articles=top_articles, top_cursor=top_cursor,
+        bookmarked_urls=bookmark_map,
+        category_map=sections['category_map'],
+        related_articles=sections['related_articles'],
         bookmark_map=bookmark_map,
         categories=NEWS_CATEGORIES,
     )
@@ -84,9 +153,14 @@ def category_detail_view(category):
     if (category.lower() not in NEWS_CATEGORIES):
         abort(404)
 
-    articles = newsmart.get_top_articles(category=category)
+    articles, cursor = paginate(
+        newsmart.get_top_articles(category=category) or [], limit=FEED_FIRST_PAGE)
+    # only check bookmarks of articles on this page
+    bookmark_map = newsmart.get_bookmark_index(newsmart.article_urls(articles))
+
     return render_template(
-        'category_detail.html', articles=articles,
+        'category_detail.html', articles=articles, cursor=cursor,
+        bookmark_map=bookmark_map,
         category=category, categories=NEWS_CATEGORIES,
     )
 
@@ -102,15 +176,17 @@ def search_view():
     if not phrase:
         return redirect(url_for('home_view'))
 
-    # call search
-    articles = newsmart.search_articles(phrase, exclude_domains=NewSmart.video_urls)
+    # stored articles first; newsapi.org only when they fall short
+    articles, cursor = paginate(
+        newsmart.get_search_results(phrase, NewSmart.video_urls) or [],
+        limit=FEED_FIRST_PAGE, by_date=False)
 
-    bookmarked_urls = newsmart.get_bookmarked_urls()
-    bookmark_map = newsmart.get_bookmark_url_to_id()
+    # only check bookmarks of articles on this page
+    bookmark_map = newsmart.get_bookmark_index(newsmart.article_urls(articles))
 
     return render_template(
-        'search.html', phrase=phrase, articles=articles,
-        bookmarked_urls=bookmarked_urls,
+        'search.html', phrase=phrase, articles=articles, cursor=cursor,
+        bookmarked_urls=bookmark_map,
         bookmark_map=bookmark_map,
         categories=NEWS_CATEGORIES,
     )
@@ -205,12 +281,13 @@ def user_profile_view():
             flash("Username updated.", "success")
         return redirect(url_for('user_profile_view'))
 
-    bookmarks = g.user.articles
+    user = g.user.model
+    bookmarks = user.articles
     categories = Category.query.all()
     bookmark_map = newsmart.get_bookmark_url_to_id()
 
     return render_template(
-        "user_profile.html", form=form, submit_button="Update User",
+        "user_profile.html", form=form, submit_button="Update User", user=user,
         bookmarks=bookmarks, bookmark_map=bookmark_map, category_objs=categories,
         categories=NEWS_CATEGORIES,
     )
@@ -229,17 +306,17 @@ def create_article():
     form = ArticleForm(**data, meta={'csrf': False})
 
     if form.validate():
-        if not newsmart.isUrlValid(form.url.data):
-            return (jsonify({"errors": {"url": ["Not a valid url."]}}), 400)
-
         article = Article.query.filter(Article.url == form.url.data).one_or_none()
         if article:
             # article object has been created already
             return (jsonify({"article": article.serialize()}), 200)
-        else:
-            # create new article object and save
-            new_article = Article.new(**form.data)
-            return (jsonify({"article": new_article.serialize()}), 201)
+
+        if not url_validator.is_valid(form.url.data):
+            return (jsonify({"errors": {"url": ["Not a valid url."]}}), 400)
+
+        # create new article object and save
+        new_article = Article.new(**form.data)
+        return (jsonify({"article": new_article.serialize()}), 201)
 
     errors = {"errors": form.errors}
     return (jsonify(errors), 400)
@@ -284,6 +361,8 @@ def create_bookmark():
             return (jsonify({"bookmark": bookmark.serialize()}), 200)
         # create a new bookmark
         bookmark = Saves.new(g.user.id, article_id)
+        if bookmark:
+            recommendation_refresher.notify()
         return (
             (jsonify({"bookmark": bookmark.serialize()}), 201)
             if bookmark else
@@ -310,6 +389,7 @@ def remove_bookmark(saves_id):
     Return a message in JSON response.
     """
     if Saves.remove(saves_id):
+        recommendation_refresher.notify()
         return (jsonify(
             {"bookmark": {"message": "Deleted.", "id": saves_id}}
         ), 200)
@@ -319,37 +399,119 @@ def remove_bookmark(saves_id):
     ), 400)
 
 
+@app.route('/api/bookmarks', methods=['POST'])
+@login_required(isJSON=True)
+def create_bookmark_with_article():
+    """
+    Bookmark an article in one request: save the article unless its url
+    exists, create the bookmark and tag the article in one transaction;
+    return article, bookmark, tags and tag job objects in JSON response.
+    With defer_tags, tags are extracted by a queued job instead; poll the
+    job via /api/tags/jobs/<job_id>.
+    Data: title, content, url, source, summary, img_url, timestamp, defer_tags
+    """
+    data = request.json
+    defer_tags = bool(data.pop('defer_tags', False))
+    form = ArticleForm(**data, meta={'csrf': False})
+
+    if not form.validate():
+        errors = {"errors": form.errors}
+        return (jsonify(errors), 400)
+
+    # existing articles keep their tags; no need to extract them again
+    article = Article.query.filter(Article.url == form.url.data).one_or_none()
+    needs_tags = not (article and article.tags)
+
+    if not article and not url_validator.is_valid(form.url.data):
+        return (jsonify({"errors": {"url": ["Not a valid url."]}}), 400)
+
+    keywords = []
+    if needs_tags and not defer_tags:
+        # extract keywords via 3rd party API before opening the transaction
+        terms_map = newsmart.get_relevant_terms(form.url.data)
+        if terms_map:
+            keywords = (terms_map['concepts'] + terms_map['keywords'])[:newsmart.max_terms]
+
+    result = Saves.new_with_article(g.user.id, form.data, keywords,
+                                    defer_tags=needs_tags and defer_tags)
+    if not result:
+        return (jsonify({
+            "bookmark": {"message": f"Failed to bookmark {form.url.data}."}
+        }), 400)
+
+    newsmart.tag_index.add(result['article'].id,
+                           [tag.id for tag in result['tags']])
+    if result['job']:
+        tag_job_worker.notify()
+    recommendation_refresher.notify()
+
+    return (
+        jsonify({
+            "article": result['article'].serialize(),
+            "bookmark": result['bookmark'].serialize(),
+            "tags": [tag.serialize() for tag in result['tags']],
+            "job": result['job'].serialize() if result['job'] else None,
+        }),
+        201 if result['created'] else 200
+    )
+
+
 @app.route('/api/tags', methods=['POST'])
 @login_required(isJSON=True)
 def create_tags():
     """
     Extract tags based on url and save them to database;
     return lists of tag objects created in JSON response.
-    Data: article_url
+    With query parameter mode=job, queue the extraction instead and
+    return the job in a 202 response; poll /api/tags/jobs/<job_id> for tags.
+    Data: article_url, article_id (optional; job mode links tags to it)
     """
     data = request.json
     form = TagsForm(**data, meta={'csrf': False})
 
     if form.validate():
+        if request.args.get('mode') == 'job':
+            job = TagJob.new(g.user.id, form.article_url.data, form.article_id.data)
+            if not job:
+                return (jsonify({"job": {"message": "Failed to queue tag job."}}),
+                        400)
+            tag_job_worker.notify()
+            return (
+                jsonify({"job": job.serialize()}), 202,
+                {"Location": url_for('get_tag_job', job_id=job.id)}
+            )
+
         # extract keywords via 3rd party API
-        # TODO: disable button on frontend after click since this takes awhile
+        # this takes awhile; prefer mode=job to avoid blocking the request
         terms_map = newsmart.get_relevant_terms(form.article_url.data)
+        if terms_map is None:
+            return (jsonify({"tags": {"message": "Failed to analyze article."}}), 400)
         if not terms_map['keywords'] and not terms_map['concepts']:
             return (jsonify({"tags": []}), 200)
-        keywords, concepts = terms_map['keywords'], terms_map['concepts']
-        # create each tag and save to db
-        tags = (
-            Tag.new(term) for index, term in enumerate(concepts + keywords)
-            if index < newsmart.max_terms
-        )
-        tags = filter(lambda tag: tag is not None, tags)
-        tags = list(map(lambda tag: tag.serialize(), tags))
+        # get or create tags in one round trip
+        tags = newsmart.save_tags(terms_map)
+        if tags is None:
+            return (jsonify({"tags": {"message": "Failed to create tags."}}), 400)
         return (jsonify({"tags": tags}), 201)
 
     errors = {"errors": form.errors}
     return (jsonify(errors), 400)
 
 
+@app.route('/api/tags/jobs/<int:job_id>')
+@login_required(isJSON=True)
+def get_tag_job(job_id):
+    """
+    Return status of a tag extraction job in JSON;
+    tags are included once the job is done.
+    """
+    job = TagJob.query.filter(
+        TagJob.id == job_id, TagJob.user_id == g.user.id
+    ).first_or_404()
+
+    return (jsonify({"job": job.serialize()}), 200)
+
+
 @app.route('/api/articletag', methods=['POST'])
 @login_required(isJSON=True)
 def create_article_tag():
@@ -364,6 +526,9 @@ def create_article_tag():
 
     if form.validate():
         article_tag = ArticleTag.new(form.article_id.data, form.tag_id.data)
+        if article_tag:
+            newsmart.tag_index.add(article_tag.article_id, [article_tag.tag_id])
+            recommendation_refresher.notify()
         return (
             (jsonify({"articletag": article_tag.serialize()}), 201)
             if article_tag else
@@ -396,3 +561,78 @@ def update_user_category():
     ]
 
     return (jsonify({"users_categories": user_categories}))
+
+
+@app.route('/api/feed/<string:section>')
+def get_feed(section):
+    """
+    Return a page of articles of a feed section in JSON: top, related,
+    search or a news category; the next page is requested with the
+    returned cursor, which is None on the last page.
+    Query: cursor, limit, fields (comma-separated article fields to
+    return, e.g. leaving out content) and q for search.
+    Logged-in users also get bookmark ids of the page's articles by url.
+    """
+    section = section.lower()
+    if section not in ("top", "related", "search", *NEWS_CATEGORIES):
+        abort(404)
+    if section == "related" and not g.user:
+        return (jsonify({"message": "Permission denied. Please log in."}), 401)
+
+    phrase = request.args.get('q')
+    if section == "search" and not phrase:
+        return (jsonify(
+            {"errors": {"q": ["Missing search phrase."]}}), 400)
+    try:
+        limit = int(request.args.get('limit', FEED_PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if not 0 < limit <= FEED_MAX_PAGE_SIZE:
+        return (jsonify(
+            {"errors": {"limit": [f"Must be from 1 to {FEED_MAX_PAGE_SIZE}."]}}),
+            400)
+    try:
+        fields = parse_fields(request.args.get('fields'))
+        articles = newsmart.get_feed(
+            section, phrase, exclude_domains=NewSmart.video_urls)
+        # headlines are newest first; search and related are ranked
+        page, cursor = paginate(
+            articles or [], request.args.get('cursor'), limit,
+            by_date=section not in ("search", "related"))
+    except ValueError as e:
+        return (jsonify({"errors": {"message": str(e)}}), 400)
+
+    result = {
+        "articles": [select_fields(article, fields) for article in page],
+        "cursor": cursor,
+    }
+    if g.user:
+        result["bookmarks"] = dict(
+            newsmart.get_bookmark_index(newsmart.article_urls(page)))
+    return (jsonify(result), 200)
+
+
+@app.route('/api/metrics')
+def get_metrics():
+    """
+    Return headline snapshot ages of this worker process in JSON for
+    monitoring; requests with the METRICS_TOKEN bearer token get every
+    operational metric, e.g. quota left and upstream latency.
+    """
+    token = app.config['METRICS_TOKEN']
+    if not token or not hmac.compare_digest(
+            request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return jsonify({"headlines": {"ages": headline_refresher.stats()['ages']}})
+
+    return jsonify({
+        "headlines": headline_refresher.stats(),
+        "headlines_cache": NewSmart.headlines_cache.stats(),
+        "single_flight": NewSmart.single_flight.stats(),
+        "quota": NewSmart.quota.report(),
+        "circuits": NewSmart.circuit_breaker.stats(),
+        "retries": NewSmart.retry_policy.budget.stats(),
+        "latency": NewSmart.latency.stats(),
+        "hedges": NewSmart.hedge_budget.stats(),
+        "url_validation": url_validator.stats(),
+        "card_cache": card_cache.stats(),
+    })
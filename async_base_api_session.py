@@ -0,0 +1,213 @@
+import asyncio
+import json
+import os
+import time
+import urllib
+import weakref
+
+import aiohttp
+import requests
+from yarl import URL
+
+from base_api_session import (HEAD_TIMEOUT, MAX_TIMEOUT, POOL_MAXSIZE,
+                              BaseApiSession)
+from logger import logger
+from retry import RetryPolicy
+
+# total keep-alive connections per event loop; POOL_MAXSIZE applies per host
+ASYNC_POOL_SIZE = int(os.environ.get("ASYNC_HTTP_POOL_SIZE", 100))
+
+# aiohttp sessions are bound to the event loop that created them
+_http_sessions = weakref.WeakKeyDictionary()
+
+
+def get_async_http_session():
+    """
+    Return the pooled keep-alive aiohttp.ClientSession for the running
+    event loop; all async API sessions on that loop share its connections.
+    Note: must be called from a coroutine.
+    """
+    loop = asyncio.get_running_loop()
+    session = _http_sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit=ASYNC_POOL_SIZE,
+                                         limit_per_host=POOL_MAXSIZE)
+        session = aiohttp.ClientSession(
+            connector=connector, cookie_jar=aiohttp.DummyCookieJar())
+        _http_sessions[loop] = session
+    return session
+
+
+async def close_async_http_session():
+    """Close the pooled session of the running event loop, if any."""
+    session = _http_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+
+class AsyncBaseApiSession:
+    """
+    asyncio counterpart of BaseApiSession; every request method is a
+    coroutine. Requests go through the quota, circuit breaker, retry
+    policy and latency tracker of session, a sync API session such as
+    the app's NewSmart, so both variants share budgets and circuits.
+    aiohttp errors are raised as their requests counterparts, which the
+    shared breaker and retry policy classify.
+    Note: quota and store lookups are quick local calls run on the loop.
+    """
+
+    def __init__(self, session=None):
+        self.session = BaseApiSession() if session is None else session
+
+    @property
+    def http(self):
+        """Pooled session shared by all async API sessions on this loop."""
+        return get_async_http_session()
+
+    async def get(self, url, params, timeout=MAX_TIMEOUT, **kwargs):
+        """
+        Wrap aiohttp GET with error handling;
+        return response in JSON.
+        """
+        # encode and escape url manually so spaces become %20 instead of +
+        params = urllib.parse.urlencode(sorted(params.items()),
+                                        quote_via=urllib.parse.quote)
+
+        async def attempt(timeout):
+            return await self.send_request(
+                "get", URL(f"{url}?{params}", encoded=True), timeout,
+                endpoint=url, **kwargs)
+
+        try:
+            resp = await self.session.retry_policy.call_async(
+                attempt, timeout, RetryPolicy.is_transient)
+        except requests.Timeout:
+            logger.critical(f"GET request timed out!")
+            if os.environ.get("FLASK_ENV") == "development":
+                raise
+            return None
+        except requests.RequestException as e:
+            logger.error(f"GET request: {e}")
+            if os.environ.get("FLASK_ENV") == "development":
+                raise
+            return None
+
+        return resp
+
+    async def post(self, url, data, timeout=MAX_TIMEOUT, **kwargs):
+        """
+        Wrap aiohttp POST with error handling;
+        return response in JSON.
+        """
+        # accept requests-style (user, password) auth tuples
+        if isinstance(kwargs.get("auth"), tuple):
+            kwargs["auth"] = aiohttp.BasicAuth(*kwargs["auth"])
+
+        async def attempt(timeout):
+            return await self.send_request("post", url, timeout, json=data, **kwargs)
+
+        # only retry connection failures; a slow request may have been acted on
+        try:
+            resp = await self.session.retry_policy.call_async(
+                attempt, timeout, RetryPolicy.is_connection_error)
+        except requests.Timeout:
+            logger.critical(f"POST request timed out!")
+            if os.environ.get("FLASK_ENV") == "development":
+                raise
+            return None
+        except requests.RequestException as e:
+            # quota and circuit errors are raised before a request exists
+            logger.error(f"POST request: {e} - body: {json.dumps(data)}")
+            if os.environ.get("FLASK_ENV") == "development":
+                raise
+            return None
+
+        return resp
+
+    async def delete(self, url):
+        """
+        Wrap aiohttp DELETE with error handling;
+        return response in JSON.
+        """
+        try:
+            resp = await self.send_request("delete", url, MAX_TIMEOUT)
+        except requests.Timeout:
+            logger.critical(f"DELETE request timed out!")
+            if os.environ.get("FLASK_ENV") == "development":
+                raise
+            return None
+        except requests.RequestException as e:
+            logger.error(f"DELETE request: {e}")
+            if os.environ.get("FLASK_ENV") == "development":
+                raise
+            return None
+
+        return resp
+
+    async def send_request(self, method, url, timeout, endpoint=None, **kwargs):
+        """
+        Send one request through the circuit breaker and quota of url with
+        the adaptive timeout of endpoint (url by default), capped by timeout;
+        return response in JSON; raise requests.HTTPError for error statuses.
+        """
+        endpoint = str(url) if endpoint is None else endpoint
+        latency = self.session.latency
+        timeout = latency.timeout(endpoint, default=timeout, ceiling=timeout)
+
+        with self.session.circuit_breaker.guard(endpoint):
+            self.session.spend_quota(endpoint)
+            start = time.monotonic()
+            try:
+                async with self.http.request(
+                        method, url, timeout=aiohttp.ClientTimeout(total=timeout),
+                        **kwargs) as resp:
+                    AsyncBaseApiSession.raise_for_status(resp)
+                    result = await resp.json(content_type=None)
+            except asyncio.TimeoutError as e:
+                # timeouts count at their length so timeouts can grow back
+                latency.record(endpoint, time.monotonic() - start)
+                raise requests.Timeout(f"{method.upper()} {endpoint} timed out.") from e
+            except aiohttp.ClientConnectionError as e:
+                raise requests.ConnectionError(str(e)) from e
+            except aiohttp.ClientError as e:
+                raise requests.RequestException(str(e)) from e
+            latency.record(endpoint, time.monotonic() - start)
+        return result
+
+    async def isUrlValid(self, url, timeout=HEAD_TIMEOUT, **kwargs):
+        """
+        Check if url is valid only (not if it is alive);
+        return True if it is; otherwise False.
+        Note: like BaseApiSession.check_url, HEAD goes to arbitrary
+            third-party sites, so it skips the API guards.
+        """
+        try:
+            async with self.http.head(
+                    url, timeout=aiohttp.ClientTimeout(
+                        total=min(timeout, HEAD_TIMEOUT)),
+                    **kwargs) as resp:
+                AsyncBaseApiSession.raise_for_status(resp)
+        except asyncio.TimeoutError:
+            logger.warning(f"HEAD request timed out for {url}")
+            return True
+        except requests.HTTPError as e:
+            logger.warning(f"HEAD request: {e}")
+            return True
+        except aiohttp.ClientError as e:
+            logger.error(f"ERROR: {e}")
+            return False
+
+        return True
+
+    @staticmethod
+    def raise_for_status(resp):
+        """Raise requests.HTTPError with the status of an error response."""
+        if resp.status < 400:
+            return
+        response = requests.Response()
+        response.status_code = resp.status
+        response.url = str(resp.url)
+        response.reason = resp.reason
+        raise requests.HTTPError(
+            f"{resp.status} Error: {resp.reason} for url: {resp.url}",
+            response=response)
@@ -0,0 +1,71 @@
+from async_base_api_session import AsyncBaseApiSession
+from base_api_session import MAX_TIMEOUT
+from news_api_session import NewsApiSession
+
+
+class AsyncNewsApiSession(AsyncBaseApiSession):
+    """
+    asyncio counterpart of NewsApiSession; shares its headline snapshots,
+    headlines cache and served urls.
+    """
+    headlines_url = NewsApiSession.headlines_url
+    articles_url = NewsApiSession.articles_url
+
+    async def get_top_articles(self, country='us', category=None, size=None,
+                               sources=[], timeout=MAX_TIMEOUT):
+        """
+        Send API request to newsapi.org;
+        return a list of article objects (see NewsApiSession.get_top_articles).
+        """
+        articles = NewsApiSession.headline_snapshot(country, category, size, sources)
+        if articles is not None:
+            return articles
+
+        key = NewsApiSession.headlines_key(country, category, size, sources)
+        articles = NewsApiSession.headlines_cache.get(key)
+        if articles is not None:
+            return list(articles)
+
+        # expired headlines beat spending the last of the quota
+        serve_stale = self.session.quota_policy(
+            "stale_cache", AsyncNewsApiSession.headlines_url)
+        stale = NewsApiSession.headlines_cache.get_stale(key)
+        if serve_stale and stale is not None:
+            return list(stale)
+
+        params = NewsApiSession.headlines_params(country, category, size, sources)
+        resp = await self.get(AsyncNewsApiSession.headlines_url, params,
+                              timeout=timeout)
+        articles = resp.get("articles") if resp else resp
+
+        # do not cache failed requests
+        if articles is not None:
+            NewsApiSession.headlines_cache.set(key, articles)
+            NewsApiSession.remember_served(articles)
+            return list(articles)
+
+        if "stale_cache" in self.session.quota_policies and stale is not None:
+            return list(stale)
+        return articles
+
+    async def search_articles(self, phrase, size=None, sort="popularity",
+                              language="en", days=7, exclude_domains=[],
+                              timeout=MAX_TIMEOUT):
+        """
+        Search for articles for specified phrase;
+        return a list of article objects.
+        """
+        assert sort in ("publishedAt", "relevancy", "popularity")
+
+        if not phrase:
+            return []
+
+        params = NewsApiSession.search_params(phrase, size, sort, language,
+                                              days, exclude_domains)
+        resp = await self.get(AsyncNewsApiSession.articles_url, params,
+                              timeout=timeout)
+        articles = resp.get("articles") if resp else resp
+
+        if articles:
+            NewsApiSession.remember_served(articles)
+        return articles
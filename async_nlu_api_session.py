@@ -0,0 +1,59 @@
+from async_base_api_session import AsyncBaseApiSession
+from nlu_api_session import NLUApiSession
+from util import canonical_url
+
+
+class AsyncNLUApiSession(AsyncBaseApiSession):
+    """
+    asyncio counterpart of NLUApiSession; analyses are kept in the
+    analysis store of its sync session, shared with NLUApiSession.
+    """
+    analytics_url = NLUApiSession.analytics_url
+    video_urls = NLUApiSession.video_urls
+
+    async def analyze_url(self, url, limit=10):
+        """
+        Request IBM Watson NLU instance to extract sentiment, keywords, concepts
+        for specified url; return lists of sentiment, keyword, concept objects.
+        """
+        json = NLUApiSession.analyze_payload(url, limit)
+        resp = await self.post(AsyncNLUApiSession.analytics_url,
+                               json, auth=('apiKey', NLUApiSession.nlu_key))
+
+        return resp
+
+    async def get_analysis(self, url, limit=10):
+        """
+        Return the analysis for specified url from the analysis store if
+        available; otherwise request it and keep it in the store.
+        """
+        store = getattr(self.session, "analysis_store", None)
+        if store is None:
+            return await self.analyze_url(url, limit)
+
+        key = canonical_url(url)
+        resp = store.lookup(key, limit, NLUApiSession.nlu_version,
+                            max_age=NLUApiSession.analysis_max_age)
+        if resp is None:
+            resp = await self.analyze_url(url, limit)
+            if resp:
+                store.save(key, limit, NLUApiSession.nlu_version, resp)
+        return resp
+
+    async def get_relevant_terms(self, url, limit=5,
+                                 keyword_relevance=0.7, concept_relevance=0.9):
+        """
+        Request and extract keywords and concepts for specified url;
+        return an object consists of keywords and concepts filtered
+        based on relevance, or None if the analysis failed
+        (see NLUApiSession.get_relevant_terms).
+        """
+        # do not use NLP on video urls
+        if NLUApiSession.is_video_url(url):
+            return NLUApiSession.extract_terms(None)
+
+        resp = await self.get_analysis(url, limit)
+        if not resp:
+            return None
+
+        return NLUApiSession.extract_terms(resp, keyword_relevance, concept_relevance)
@@ -1,26 +1,215 @@
+import http.cookiejar
+import json
 import os
+import threading
+import time
 import urllib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from circuit_breaker import CircuitBreaker
+from latency import LatencyTracker
 from logger import logger
+from quota import QuotaExceededError
+from retry import RetryBudget, RetryPolicy
 
 MAX_TIMEOUT = 10
+# seconds to wait on a HEAD request to a third-party site
+HEAD_TIMEOUT = float(os.environ.get("HEAD_TIMEOUT", 0.5))
+# number of upstream hosts to keep pools for, and keep-alive connections per host
+POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", 4))
+POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", 10))
+
+# name -> pooled session of this process; see get_http_session
+_http_sessions = dict()
+_http_sessions_pid = None
+_http_session_lock = threading.Lock()
+
+_hedge_executor = None
+_hedge_executor_pid = None
+
+
+def get_http_session(name="api"):
+    """
+    Return the pooled keep-alive requests.Session named name for this
+    process; fresh sessions are created after a fork so workers never
+    share sockets. HEAD checks of third-party sites use their own "head"
+    session, so their hosts never evict the pools of the upstream APIs.
+    Note: urllib3 connection pools are thread-safe; cookies are disabled
+        since a session is shared by every thread and upstream host.
+    """
+    global _http_sessions_pid
+
+    pid = os.getpid()
+    session = _http_sessions.get(name) if _http_sessions_pid == pid else None
+    if session is None:
+        with _http_session_lock:
+            if _http_sessions_pid != pid:
+                _http_sessions.clear()
+                _http_sessions_pid = pid
+            session = _http_sessions.get(name)
+            if session is None:
+                session = _http_sessions[name] = new_http_session()
+
+    return session
+
+
+def new_http_session():
+    """Return a requests.Session with pooled keep-alive connections and no cookies."""
+    session = requests.Session()
+    session.cookies.set_policy(
+        http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS,
+                          pool_maxsize=POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_hedge_executor():
+    """Return the thread pool running hedged requests in this process."""
+    global _hedge_executor, _hedge_executor_pid
+
+    pid = os.getpid()
+    if _hedge_executor is None or _hedge_executor_pid != pid:
+        with _http_session_lock:
+            if _hedge_executor is None or _hedge_executor_pid != pid:
+                _hedge_executor = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get("API_HEDGE_WORKERS", 8)),
+                    thread_name_prefix="hedge")
+                _hedge_executor_pid = pid
+
+    return _hedge_executor
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one in-flight call;
+    callers arriving meanwhile wait for it and share its result or error.
+    Note: shared results must be treated as read-only.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.collapsed = 0
+        self._flights = dict()
+        self._lock = threading.Lock()
+
+    def do(self, key, function, timeout=None):
+        """
+        Return result of function, or of the identical call already in
+        flight; raise its error. A waiting caller gives up with
+        requests.Timeout after timeout seconds.
+        """
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.collapsed += 1
+
+        if leader:
+            try:
+                flight.result = function()
+            except Exception as e:
+                flight.error = e
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+        elif not flight.done.wait(timeout):
+            raise requests.Timeout("Timed out waiting for identical request in flight.")
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def stats(self):
+        """Return a snapshot of call counters."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "collapsed": self.collapsed,
+                "in_flight": len(self._flights),
+            }
+
 
 class BaseApiSession:
+    # identical outbound calls from concurrent threads share one request
+    single_flight = SingleFlight()
+    # optional QuotaLimiter; quota_buckets maps a url to its bucket name
+    # and quota_policies names the fallbacks to apply when a bucket runs low
+    quota = None
+    quota_buckets = dict()
+    quota_policies = frozenset()
+    # fail fast while an upstream host keeps failing
+    circuit_breaker = CircuitBreaker(
+        failure_threshold=int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", 5)),
+        cooldown=float(os.environ.get("CIRCUIT_COOLDOWN", 30)),
+    )
+    # transient failures are retried within the caller's timeout
+    retry_policy = RetryPolicy(
+        retries=int(os.environ.get("API_RETRIES", 2)),
+        base_delay=float(os.environ.get("API_RETRY_BASE_DELAY", 0.1)),
+        max_delay=float(os.environ.get("API_RETRY_MAX_DELAY", 1.0)),
+        budget=RetryBudget(
+            ratio=float(os.environ.get("API_RETRY_BUDGET_RATIO", 0.1))),
+    )
+    # timeouts follow observed latency of each endpoint, capped by the caller
+    latency = LatencyTracker(
+        factor=float(os.environ.get("API_TIMEOUT_FACTOR", 3)))
+    # optionally send a second GET once the first is slower than p95
+    hedge_gets = os.environ.get("API_HEDGE_GETS") == "1"
+    hedge_budget = RetryBudget(
+        ratio=float(os.environ.get("API_HEDGE_BUDGET_RATIO", 0.05)))
+
+    @property
+    def http(self):
+        """Pooled session shared by all API sessions in this process."""
+        return get_http_session()
+
+    @property
+    def head_http(self):
+        """Pooled session of HEAD checks, apart from the API hosts' pools."""
+        return get_http_session("head")
     
     def get(self, url, params, timeout=MAX_TIMEOUT, **kwargs):
         """
         Wrap requests.get() with error handling;
         return response in JSON.
+        Concurrent requests with the same url and params share one response.
         """
         # encode and escape url manually
         # this is needed for space characters
         # requests.get() converts space to + instead of %20
-        params = urllib.parse.urlencode(params, quote_via=urllib.parse.quote)
+        params = urllib.parse.urlencode(sorted(params.items()),
+                                        quote_via=urllib.parse.quote)
+
+        def request(timeout):
+            return self.send_request("get", url, timeout,
+                                     params=params, **kwargs).json()
+
+        def attempt(timeout):
+            return self.hedge(url, request, timeout)
+
+        def send():
+            return self.retry_policy.call(attempt, timeout, RetryPolicy.is_transient)
+
         try:
-            resp = requests.get(url, params, timeout=timeout, **kwargs)
-            resp.raise_for_status()
+            resp = BaseApiSession.single_flight.do(("GET", url, params), send, timeout)
         except requests.Timeout:
             logger.critical(f"GET request timed out!")
             if os.environ.get("FLASK_ENV") == "development":
@@ -32,37 +221,122 @@ class BaseApiSession:
                 raise
             return None
 
-        return resp.json()
+        return resp
     
-    def post(self, url, data, timeout=MAX_TIMEOUT, ** kwargs):
+    def post(self, url, data, timeout=MAX_TIMEOUT, coalesce=False, ** kwargs):
         """
         Wrap requests.post() with error handling;
         return response in JSON.
+        With coalesce, concurrent requests with the same url and data share
+        one response; only use it for requests without side effects.
         """
+        def attempt(timeout):
+            return self.send_request("post", url, timeout,
+                                     json=data, **kwargs).json()
+
+        # only retry connection failures; a slow request may have been acted on
+        def send():
+            return self.retry_policy.call(attempt, timeout,
+                                          RetryPolicy.is_connection_error)
+
         try:
-            resp = requests.post(url, json=data, timeout=timeout, **kwargs)
-            resp.raise_for_status()
+            resp = (
+                BaseApiSession.single_flight.do(
+                    ("POST", url, json.dumps(data, sort_keys=True)), send, timeout)
+                if coalesce else
+                send()
+            )
         except requests.Timeout:
             logger.critical(f"POST request timed out!")
             if os.environ.get("FLASK_ENV") == "development":
                 raise
             return None
         except requests.RequestException as e:
-            logger.error(f"POST request: {e} - body: {e.request.body.decode()}")
+            # quota and circuit errors are raised before a request exists
+            logger.error(f"POST request: {e} - body: {json.dumps(data)}")
             if os.environ.get("FLASK_ENV") == "development":
                 raise
             return None
 
-        return resp.json()
+        return resp
     
+    def send_request(self, method, url, timeout, endpoint=None, **kwargs):
+        """
+        Send one request through the circuit breaker and quota of url with
+        the adaptive timeout of endpoint (url by default), capped by timeout;
+        return the response; raise requests.HTTPError for error statuses.
+        """
+        endpoint = url if endpoint is None else endpoint
+        timeout = self.latency.timeout(endpoint, default=timeout, ceiling=timeout)
+
+        with self.circuit_breaker.guard(url):
+            self.spend_quota(url)
+            start = time.monotonic()
+            try:
+                resp = self.http.request(method, url, timeout=timeout, **kwargs)
+            except requests.Timeout:
+                # timeouts count at their length so timeouts can grow back
+                self.latency.record(endpoint, time.monotonic() - start)
+                raise
+            self.latency.record(endpoint, time.monotonic() - start)
+            resp.raise_for_status()
+        return resp
+
+    def hedge(self, endpoint, request, timeout):
+        """
+        Return result of request(timeout); with hedging on, send a second
+        request once the first has been slower than p95 of endpoint and
+        return whichever succeeds first.
+        Note: the slower request is left to finish on its own.
+        """
+        delay = self.latency.hedge_delay(endpoint) if self.hedge_gets else None
+        if delay is None or delay >= timeout:
+            return request(timeout)
+
+        deadline = time.monotonic() + timeout
+        self.hedge_budget.deposit()
+        executor = get_hedge_executor()
+        first = executor.submit(request, timeout)
+        done, _ = wait([first], timeout=delay)
+        if done or not self.hedge_budget.withdraw():
+            return first.result()
+
+        pending = {first, executor.submit(
+            request, max(deadline - time.monotonic(), 0.001))}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # both may finish at once; a success beats the other's error
+            succeeded = [future for future in done if future.exception() is None]
+            if succeeded:
+                return succeeded[0].result()
+            if not pending:
+                return done.pop().result()
+
+    def spend_quota(self, url):
+        """Take a token from the quota bucket of url; raise QuotaExceededError if spent."""
+        bucket = self.quota_buckets.get(url)
+        if self.quota is not None and bucket and not self.quota.acquire(bucket):
+            raise QuotaExceededError(f"Quota budget of {bucket} is spent.")
+
+    def quota_policy(self, policy, url):
+        """
+        Return True if policy is enabled and the quota bucket of url runs low.
+        """
+        return (
+            policy in self.quota_policies
+            and self.quota is not None
+            and self.quota.is_low(self.quota_buckets.get(url))
+        )
+
     def delete(self, url):
         """
         Wrap requests.deletes() with error handling;
         return response in JSON.
         """
         try:
-            resp = requests.delete(url, timeout=MAX_TIMEOUT)
-            resp.raise_for_status()
+            with self.circuit_breaker.guard(url):
+                resp = self.http.delete(url, timeout=MAX_TIMEOUT)
+                resp.raise_for_status()
         except requests.Timeout:
             logger.critical(f"DELETE request timed out!")
             if os.environ.get("FLASK_ENV") == "development":
@@ -76,17 +350,28 @@ class BaseApiSession:
 
         return resp.json()
 
-    def isUrlValid(self, url, timeout=0.5, **kwargs):
+    def isUrlValid(self, url, timeout=HEAD_TIMEOUT, **kwargs):
         """
         Check if url is valid only (not if it is alive);
         return True if it is; otherwise False.
         """
+        return self.check_url(url, timeout, **kwargs) is not False
+
+    def check_url(self, url, timeout=HEAD_TIMEOUT, **kwargs):
+        """
+        Send a HEAD request to url; return True if its host answered,
+        False if the url cannot be reached, and None if that could not be
+        told, e.g. the request timed out.
+        Note: HEAD goes to arbitrary third-party sites, so it skips the
+            circuit breaker, quota, retries and latency tracking of the
+            API sessions and never waits longer than HEAD_TIMEOUT.
+        """
         try:
-            resp = requests.head(url, timeout=timeout,
-                                 **kwargs).raise_for_status()
+            self.head_http.head(url, timeout=min(timeout, HEAD_TIMEOUT),
+                           **kwargs).raise_for_status()
         except requests.Timeout:
             logger.warning(f"HEAD request timed out for {url}")
-            return True
+            return None
         except requests.HTTPError as e:
             logger.warning(f"HEAD request: {e}")
             return True
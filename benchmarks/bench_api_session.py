@@ -0,0 +1,108 @@
+"""Benchmark per-call latency of BaseApiSession against a local HTTPS stub."""
+
+# from newsmart/, run this benchmark like:
+#   python -m benchmarks.bench_api_session
+#   python -m benchmarks.bench_api_session 500
+# Note: requires the openssl CLI to create a throwaway self-signed certificate.
+
+import json
+import os
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from base_api_session import BaseApiSession
+
+PAYLOAD = json.dumps({"status": "ok", "articles": []}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep the connection alive between calls
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately; avoid Nagle/delayed-ACK stalls
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_certificate(directory):
+    """Create a self-signed certificate for localhost; return (cert, key) paths."""
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+         "-keyout", key, "-out", cert, "-days", "1", "-subj", "/CN=localhost",
+         "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1"],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def start_stub(cert, key):
+    """Serve StubHandler over HTTPS on a free local port; return the server."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(call, calls):
+    """Time each call; return a list of latencies in milliseconds."""
+    call()  # warm-up
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(label, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<28} mean={statistics.mean(latencies):7.2f}ms "
+          f"median={statistics.median(latencies):7.2f}ms p95={p95:7.2f}ms")
+
+
+def main(calls=200):
+    with tempfile.TemporaryDirectory() as directory:
+        cert, key = make_certificate(directory)
+        server = start_stub(cert, key)
+        url = f"https://localhost:{server.server_address[1]}/v2/top-headlines"
+        params = {"country": "us", "category": "science"}
+        session = BaseApiSession()
+
+        # before: module-level requests.get; new connection + TLS handshake per call
+        before = measure(
+            lambda: requests.get(url, params, verify=cert).json(), calls)
+        # after: pooled keep-alive session
+        after = measure(lambda: session.get(url, params, verify=cert), calls)
+
+        server.shutdown()
+
+    print(f"{calls} GET calls against {url}")
+    report("requests.get (no pooling)", before)
+    report("BaseApiSession (pooled)", after)
+    print(f"speedup (median): "
+          f"{statistics.median(before) / statistics.median(after):.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,172 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def json_size(value):
+    """Approximate memory footprint of a JSON-like value in bytes."""
+    return len(json.dumps(value, default=str))
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with time-to-live expiry and
+    LRU eviction bounded by entry count and an approximate byte budget.
+    A ttl of None keeps entries until they are evicted. Expired entries
+    are kept for stale_ttl more seconds for get_stale, and dropped when
+    read after that.
+    """
+
+    def __init__(self, ttl=300, max_entries=128, max_bytes=None, sizeof=json_size,
+                 stale_ttl=0):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        # key -> (expires_at, size, value); ordered from least to most recently used
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Return cached value for key if present and not expired;
+        otherwise return default.
+        """
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def get_stale(self, key, default=None):
+        """
+        Return cached value for key even if expired, e.g. when a fresh one
+        cannot be fetched; otherwise return default.
+        Entries expired longer than stale_ttl ago are not returned.
+        """
+        with self._lock:
+            entry = self._live_entry(key)
+            return default if entry is None else entry[2]
+
+    def set(self, key, value, ttl=None):
+        """
+        Store value under key, evicting least recently used entries
+        until the cache fits its entry count and byte budget.
+        Values larger than the whole byte budget are not cached.
+        """
+        size = self.sizeof(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = float("inf") if ttl is None else time.monotonic() + ttl
+
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (expires_at, size, value)
+            self._bytes += size
+            while (len(self._entries) > self.max_entries
+                   or (self.max_bytes and self._bytes > self.max_bytes)):
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return a snapshot of cache counters and usage."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def _live_entry(self, key):
+        """
+        Return entry for key unless it expired longer than stale_ttl ago,
+        in which case drop it; caller must hold the lock.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] + self.stale_ttl <= time.monotonic():
+            self._discard(key)
+            return None
+        return entry
+
+    def _discard(self, key):
+        """Remove key if present; caller must hold the lock."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return (f"<TTLCache: ttl={self.ttl} entries={len(self._entries)} "
+                f"bytes={self._bytes} hits={self.hits} misses={self.misses} "
+                f"evictions={self.evictions}>")
+
+
+class SnapshotStore:
+    """
+    Thread-safe store of the latest snapshot per key, replaced wholesale
+    by a background refresher; readers get the latest value however old
+    and never wait on a refresh.
+    """
+
+    def __init__(self):
+        # key -> (fetched_at, value); replaced, never mutated
+        self._snapshots = dict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return latest snapshot for key, stale or not; otherwise return default."""
+        snapshot = self._snapshots.get(key)
+        return default if snapshot is None else snapshot[1]
+
+    def put(self, key, value, fetched_at=None):
+        """Replace snapshot for key, taken at fetched_at (now by default)."""
+        with self._lock:
+            self._snapshots[key] = (
+                time.time() if fetched_at is None else fetched_at, value)
+
+    def fetched_at(self, key):
+        """Return time snapshot for key was taken; None if missing."""
+        snapshot = self._snapshots.get(key)
+        return None if snapshot is None else snapshot[0]
+
+    def age(self, key):
+        """Return seconds since snapshot for key was taken; None if missing."""
+        snapshot = self._snapshots.get(key)
+        return None if snapshot is None else time.time() - snapshot[0]
+
+    def ages(self):
+        """Return a dictionary of key to snapshot age in seconds."""
+        now = time.time()
+        with self._lock:
+            return {key: now - fetched_at
+                    for key, (fetched_at, _) in self._snapshots.items()}
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+
+    def __len__(self):
+        return len(self._snapshots)
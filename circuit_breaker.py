@@ -0,0 +1,139 @@
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+
+import requests
+
+from logger import logger
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of sending a request to a host whose circuit is open."""
+
+
+class _Circuit:
+    __slots__ = ("state", "failures", "opened_at", "probes",
+                 "rejected", "transitions")
+
+    def __init__(self):
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.probes = 0
+        self.rejected = 0
+        self.transitions = dict()
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker for outbound requests.
+    A circuit opens after failure_threshold consecutive failures (timeouts,
+    connection errors, 5xx and 429 responses) and calls to its host fail
+    right away; after cooldown seconds it lets half_open_calls probes
+    through, closing again on success and reopening on failure.
+    """
+
+    def __init__(self, failure_threshold=5, cooldown=30, half_open_calls=1):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.half_open_calls = half_open_calls
+        self._circuits = dict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def guard(self, url):
+        """
+        Run the block as a call to the host of url;
+        raise CircuitOpenError without running it while the circuit is open.
+        """
+        host = urllib.parse.urlsplit(url).netloc
+        probe = self._enter(host)
+        try:
+            yield
+        except Exception as e:
+            self._exit(host, probe, False if CircuitBreaker.is_failure(e) else None)
+            raise
+        self._exit(host, probe, True)
+
+    @staticmethod
+    def is_failure(error):
+        """Return True if error means the upstream host is unhealthy."""
+        if isinstance(error, requests.HTTPError):
+            status = error.response.status_code if error.response is not None else 0
+            return status >= 500 or status == 429
+        return isinstance(error, (requests.Timeout, requests.ConnectionError))
+
+    def state(self, url_or_host):
+        """Return state of the circuit of a url or host."""
+        host = urllib.parse.urlsplit(url_or_host).netloc or url_or_host
+        with self._lock:
+            circuit = self._circuits.get(host)
+            return circuit.state if circuit else "closed"
+
+    def stats(self):
+        """Return a dictionary of host to circuit state and counters."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                host: {
+                    "state": circuit.state,
+                    "failures": circuit.failures,
+                    "open_for": (round(now - circuit.opened_at, 3)
+                                 if circuit.state != "closed" else None),
+                    "rejected": circuit.rejected,
+                    "transitions": dict(circuit.transitions),
+                }
+                for host, circuit in self._circuits.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._circuits.clear()
+
+    def _enter(self, host):
+        """Admit a call to host; return True if it is a half-open probe."""
+        with self._lock:
+            circuit = self._circuits.setdefault(host, _Circuit())
+            if (circuit.state == "open"
+                    and time.monotonic() - circuit.opened_at >= self.cooldown):
+                self._transition(host, circuit, "half-open")
+            if circuit.state == "half-open" and circuit.probes < self.half_open_calls:
+                circuit.probes += 1
+                return True
+            if circuit.state != "closed":
+                circuit.rejected += 1
+                raise CircuitOpenError(f"Circuit for {host} is {circuit.state}.")
+            return False
+
+    def _exit(self, host, probe, succeeded):
+        """Record outcome of a call; succeeded is None if it says nothing of the host."""
+        with self._lock:
+            circuit = self._circuits.setdefault(host, _Circuit())
+            # a probe outlived by a state change no longer holds a slot
+            probe = probe and circuit.state == "half-open"
+            if probe:
+                circuit.probes -= 1
+            if succeeded is None:
+                return
+            if succeeded:
+                circuit.failures = 0
+                if probe:
+                    self._transition(host, circuit, "closed")
+                return
+            circuit.failures += 1
+            if probe or (circuit.state == "closed"
+                         and circuit.failures >= self.failure_threshold):
+                self._transition(host, circuit, "open")
+
+    def _transition(self, host, circuit, state):
+        # caller holds the lock
+        name = f"{circuit.state}->{state}"
+        circuit.transitions[name] = circuit.transitions.get(name, 0) + 1
+        circuit.state = state
+        if state == "open":
+            circuit.opened_at = time.monotonic()
+        elif state == "closed":
+            circuit.opened_at = None
+        circuit.probes = 0
+        logger.warning(f"Circuit for {host}: {name}")
@@ -0,0 +1,86 @@
+import base64
+import binascii
+import json
+
+# fields of a News API article a feed page can be asked for
+FEED_FIELDS = ("source", "author", "title", "description", "url",
+               "urlToImage", "publishedAt", "content")
+
+
+def encode_cursor(article, position):
+    """Return an opaque cursor pointing just past article at position."""
+    key = json.dumps([article.get('publishedAt'), article['url'], position],
+                     separators=(",", ":"))
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Return (publishedAt, url, position) of the article a cursor points
+    past; raise ValueError if cursor is malformed.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError("Malformed cursor.") from e
+    if (not isinstance(key, list) or len(key) != 3
+            or not isinstance(key[0], (str, type(None)))
+            or not isinstance(key[1], str)
+            or not isinstance(key[2], int) or isinstance(key[2], bool)
+            or key[2] < 0):
+        raise ValueError("Malformed cursor.")
+    return tuple(key)
+
+
+def paginate(articles, cursor=None, limit=10, by_date=True):
+    """
+    Return (page, next cursor) of up to limit articles following cursor,
+    keeping the order of articles; next cursor is None on the last page.
+    Pages are keyed on the last article served rather than an offset, so
+    articles added to or dropped from the front of a feed between requests
+    neither repeat nor get skipped. When that article has since left the
+    feed, the page resumes at the first article published before it if
+    articles are newest first (by_date), otherwise at its old position.
+    """
+    start = 0
+    if cursor is not None:
+        published_at, url, position = decode_cursor(cursor)
+        urls = [article['url'] for article in articles]
+        if url in urls:
+            start = urls.index(url) + 1
+        elif by_date:
+            start = next(
+                (index for index, article in enumerate(articles)
+                 if published_at is not None
+                 and (article.get('publishedAt') or "") < published_at),
+                len(articles))
+        else:
+            # ranked feeds, e.g. search, have no order to resume by;
+            # the article after it has moved up into its position
+            start = min(position, len(articles))
+
+    page = articles[start:start + limit]
+    more = start + limit < len(articles)
+    return page, (encode_cursor(page[-1], start + len(page) - 1)
+                  if page and more else None)
+
+
+def parse_fields(value):
+    """
+    Return a tuple of field names from a comma-separated fields parameter,
+    or None for every field; raise ValueError on an unknown field.
+    """
+    if not value:
+        return None
+    fields = tuple(field.strip() for field in value.split(",") if field.strip())
+    unknown = [field for field in fields if field not in FEED_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}.")
+    return fields
+
+
+def select_fields(article, fields=None):
+    """Return article with only fields, or every field if fields is None."""
+    if fields is None:
+        return article
+    return {field: article.get(field) for field in fields}
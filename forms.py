@@ -97,3 +97,7 @@ class TagsForm(FlaskForm):
         "Article URL",
         validators=[DataRequired(), URL()]
     )
+    article_id = IntegerField(
+        "Article id",
+        validators=[Optional()]
+    )
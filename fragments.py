@@ -0,0 +1,57 @@
+import hashlib
+import json
+
+from flask import g, render_template
+from markupsafe import Markup
+
+from cache import TTLCache
+
+# marks where per-user markup goes in a cached card
+BOOKMARK_SLOT = "<!--bookmark-slot-->"
+
+
+class CardCache:
+    """
+    LRU cache of rendered article cards shared by every user.
+    Cards are keyed by article url, template and a hash of the article's
+    content, so an edited headline renders afresh and its old card ages
+    out; bookmark state differs per user and is rendered separately into
+    the card's bookmark slot.
+    """
+
+    def __init__(self, max_entries=2048, max_bytes=16 * 1024 * 1024,
+                 badge_template="articles/article_bookmark.html"):
+        self.badge_template = badge_template
+        self.cards = TTLCache(ttl=None, max_entries=max_entries,
+                              max_bytes=max_bytes, sizeof=len)
+
+    def render(self, template, article, bookmarks=None):
+        """
+        Return markup of article rendered with template; bookmarks maps
+        bookmarked urls of the current user to bookmark ids.
+        """
+        key = (article['url'], template, CardCache.digest(article))
+        card = self.cards.get(key)
+        if card is None:
+            card = render_template(template, article=article,
+                                   bookmark_slot=Markup(BOOKMARK_SLOT))
+            self.cards.set(key, card)
+
+        badge = ""
+        if g.user:
+            badge = render_template(
+                self.badge_template,
+                bookmark_id=bookmarks.get(article['url']) if bookmarks else None)
+        return Markup(card.replace(BOOKMARK_SLOT, badge, 1))
+
+    @staticmethod
+    def digest(article):
+        """Return a hash of every field of article."""
+        content = json.dumps(article, sort_keys=True, default=str)
+        return hashlib.sha1(content.encode()).hexdigest()
+
+    def stats(self):
+        return self.cards.stats()
+
+    def clear(self):
+        self.cards.clear()
@@ -0,0 +1,207 @@
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from base_api_session import MAX_TIMEOUT
+from logger import logger
+from models import NEWS_CATEGORIES
+from workers import BackgroundWorker
+
+
+class HeadlineRefresher(BackgroundWorker):
+    """
+    Keep headline snapshots of the default country and every news category
+    fresh in a background thread, so pages read the latest snapshot and
+    never wait on newsapi.org; a failed refresh keeps the previous one.
+    Only one worker process on the machine, the holder of lock_path,
+    fetches headlines, on its own thread pool; it writes them to
+    snapshot_path, where the other workers pick them up every
+    sync_interval seconds. Another worker takes over if it exits.
+    Note: every refresh costs one headlines quota token per feed, i.e.
+        (categories + 1) * 86400 / interval a day; the 1800s default
+        spends 384 of the default 1000 a day.
+    """
+    thread_name = "headline-refresher"
+
+    def __init__(self, newsmart, interval=1800, country='us',
+                 categories=NEWS_CATEGORIES, timeout=MAX_TIMEOUT,
+                 lock_path=None, snapshot_path=None, sync_interval=60,
+                 max_workers=2):
+        super().__init__()
+        self.newsmart = newsmart
+        self.interval = interval
+        self.country = country
+        self.categories = categories
+        self.timeout = timeout
+        self.lock_path = lock_path or os.path.join(
+            tempfile.gettempdir(), "newsmart-headlines.lock")
+        self.snapshot_path = snapshot_path or os.path.join(
+            tempfile.gettempdir(), "newsmart-headlines.json")
+        self.sync_interval = sync_interval
+        self.max_workers = max_workers
+        self.failures = 0
+        self.skipped = 0
+        self._lock_file = None
+        self._leader_lock = threading.Lock()
+        self._executor = None
+        self._synced_mtime = None
+        # feed -> monotonic time of its last refresh attempt
+        self._attempted = dict()
+
+    def enabled(self):
+        return self.interval > 0
+
+    def is_leader(self):
+        """
+        Return True if this process fetches headlines for the machine,
+        taking the lock if it is free; otherwise return False.
+        """
+        # the ingester asks from its own thread
+        with self._leader_lock:
+            if self._lock_file is not None:
+                return True
+            lock_file = open(self.lock_path, "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            # held until the process exits
+            self._lock_file = lock_file
+            return True
+
+    def refresh(self):
+        """
+        Refresh every due snapshot concurrently and share them with the
+        other workers; return number of snapshots refreshed.
+        Refreshes are skipped while the headlines quota runs low, keeping
+        the rest of it for pages; the previous snapshots are served meanwhile.
+        """
+        if self.newsmart.quota_policy("stale_cache", self.newsmart.headlines_url):
+            self.skipped += 1
+            logger.warning("Headlines quota runs low; skipped refresh.")
+            return 0
+
+        now = time.monotonic()
+        calls = {
+            category: (self.newsmart.refresh_headlines,
+                       {"country": self.country, "category": category})
+            for category in self.due()
+        }
+        if not calls:
+            return 0
+        self._attempted.update((category, now) for category in calls)
+        results = self.newsmart.run_concurrently(
+            calls, self.timeout, executor=self.executor)
+        refreshed = sum(1 for category in calls if results.get(category))
+        if refreshed < len(calls):
+            self.failures += len(calls) - refreshed
+            logger.warning(
+                f"Refreshed {refreshed} of {len(calls)} headline snapshots.")
+        if refreshed:
+            self.publish()
+        return refreshed
+
+    def publish(self):
+        """Write every snapshot to snapshot_path for the other workers."""
+        snapshots = self.newsmart.headline_snapshots
+        feeds = dict()
+        for category in (None, *self.categories):
+            key = self.newsmart.headlines_key(self.country, category)
+            articles = snapshots.get(key)
+            if articles is not None:
+                feeds[category or "top"] = {
+                    "fetched_at": snapshots.fetched_at(key),
+                    "articles": list(articles),
+                }
+
+        # replace atomically so readers never see a partial file
+        directory = os.path.dirname(self.snapshot_path) or "."
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False) as file:
+            json.dump(feeds, file)
+        os.replace(file.name, self.snapshot_path)
+
+    def sync(self):
+        """
+        Load snapshots newer than this worker's from snapshot_path;
+        return number of snapshots loaded.
+        """
+        try:
+            mtime = os.stat(self.snapshot_path).st_mtime
+            if mtime == self._synced_mtime:
+                return 0
+            with open(self.snapshot_path) as file:
+                feeds = json.load(file)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read headline snapshots: {e}")
+            return 0
+
+        snapshots = self.newsmart.headline_snapshots
+        loaded = 0
+        for category in (None, *self.categories):
+            feed = feeds.get(category or "top")
+            key = self.newsmart.headlines_key(self.country, category)
+            if feed is None or feed['fetched_at'] <= (snapshots.fetched_at(key) or 0):
+                continue
+            snapshots.put(key, tuple(feed['articles']), fetched_at=feed['fetched_at'])
+            # urls of headlines are trusted in every worker, not only the leader
+            self.newsmart.remember_served(feed['articles'])
+            loaded += 1
+        self._synced_mtime = mtime
+        return loaded
+
+    def due(self):
+        """
+        Return a list of feeds, None for top headlines, whose snapshot is
+        missing or older than interval and that were not tried within it.
+        """
+        snapshots = self.newsmart.headline_snapshots
+        now = time.monotonic()
+        due = []
+        for category in (None, *self.categories):
+            age = snapshots.age(self.newsmart.headlines_key(self.country, category))
+            attempted = self._attempted.get(category)
+            if ((age is None or age >= self.interval)
+                    and (attempted is None or now - attempted >= self.interval)):
+                due.append(category)
+        return due
+
+    @property
+    def executor(self):
+        """Thread pool of refreshes, apart from the pool serving pages."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="headlines")
+        return self._executor
+
+    def stats(self):
+        """Return age in seconds of every snapshot, None if not taken yet."""
+        snapshots = self.newsmart.headline_snapshots
+        return {
+            "interval": self.interval,
+            "leader": self._lock_file is not None,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "ages": {
+                category or "top": snapshots.age(
+                    self.newsmart.headlines_key(self.country, category))
+                for category in (None, *self.categories)
+            },
+        }
+
+    def _poll(self):
+        while True:
+            try:
+                # snapshots survive restarts of the leader in snapshot_path
+                self.sync()
+                if self.is_leader():
+                    self.refresh()
+            except Exception as e:
+                logger.error(f"Headline refresher: {e}")
+            time.sleep(min(self.interval, self.sync_interval))
@@ -0,0 +1,74 @@
+import time
+
+from logger import logger
+from models import NEWS_CATEGORIES, Article
+from workers import BackgroundWorker
+
+
+class HeadlineIngester(BackgroundWorker):
+    """
+    Store top headlines of the default country and every news category in
+    the articles table on a schedule, one bulk upsert per feed.
+    Scheduled runs only read the snapshots kept by HeadlineRefresher, so
+    ingesting costs no extra API quota; given is_leader, e.g. the
+    refresher's, only the worker process it returns True in ingests.
+    """
+    thread_name = "headline-ingester"
+
+    def __init__(self, app, newsmart, interval=900, country='us',
+                 categories=NEWS_CATEGORIES, is_leader=None):
+        super().__init__(app)
+        self.newsmart = newsmart
+        self.interval = interval
+        self.country = country
+        self.categories = categories
+        self.is_leader = is_leader
+        self.last_run = None
+
+    def enabled(self):
+        return self.interval > 0
+
+    def run(self, fetch=False):
+        """
+        Upsert headlines of every feed from its snapshot; with fetch,
+        feeds without a snapshot are fetched.
+        Return a dictionary of inserted and updated counts.
+        """
+        totals = {"inserted": 0, "updated": 0}
+        with self._app_context():
+            for category in (None, *self.categories):
+                articles = (
+                    self.newsmart.get_top_articles(country=self.country,
+                                                   category=category)
+                    if fetch else
+                    self.newsmart.headline_snapshot(self.country, category)
+                )
+                if not articles:
+                    continue
+                counts = Article.upsert_many(articles)
+                if counts is None:
+                    logger.error(f"Failed to ingest {category or 'top'} headlines.")
+                    continue
+                for key in totals:
+                    totals[key] += counts[key]
+        self.last_run = time.time()
+        return totals
+
+    def run_if_leader(self):
+        """
+        Upsert headlines of every feed unless another worker process is
+        the leader; return counts as run does, otherwise return None.
+        """
+        if self.is_leader is not None and not self.is_leader():
+            return None
+        return self.run()
+
+    def _poll(self):
+        while True:
+            try:
+                counts = self.run_if_leader()
+                if counts is not None:
+                    logger.info(f"Ingested headlines: {counts}")
+            except Exception as e:
+                logger.error(f"Headline ingester: {e}")
+            time.sleep(self.interval)
@@ -0,0 +1,114 @@
+import bisect
+import threading
+import time
+
+# upper bounds of histogram buckets in seconds, growing by 25% from 5ms to ~60s
+BUCKETS = tuple(0.005 * 1.25 ** index for index in range(43))
+
+
+class LatencyHistogram:
+    """
+    Rolling latency histogram with logarithmic buckets; samples older than
+    about two windows are dropped by rotating between two histograms.
+    """
+
+    def __init__(self, window=300):
+        self.window = window
+        self._current = [0] * (len(BUCKETS) + 1)
+        self._previous = [0] * (len(BUCKETS) + 1)
+        self._rotated_at = time.monotonic()
+
+    def record(self, seconds):
+        self._rotate()
+        self._current[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def count(self):
+        self._rotate()
+        return sum(self._current) + sum(self._previous)
+
+    def percentile(self, q):
+        """
+        Return upper bound of the bucket holding quantile q, capped at the
+        largest bucket; return None if empty.
+        """
+        self._rotate()
+        counts = [current + previous
+                  for current, previous in zip(self._current, self._previous)]
+        total = sum(counts)
+        if not total:
+            return None
+        rank, seen = q * total, 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return BUCKETS[min(index, len(BUCKETS) - 1)]
+
+    def _rotate(self):
+        now = time.monotonic()
+        if now - self._rotated_at >= self.window:
+            # a gap longer than two windows leaves nothing to keep
+            self._previous = (self._current if now - self._rotated_at < 2 * self.window
+                              else [0] * (len(BUCKETS) + 1))
+            self._current = [0] * (len(BUCKETS) + 1)
+            self._rotated_at = now
+
+
+class LatencyTracker:
+    """
+    Per-endpoint rolling latency histograms deriving adaptive timeouts
+    (p99 times factor) and hedging delays (p95) from observed latencies.
+    Until an endpoint has min_samples, its default timeout applies and
+    requests are not hedged.
+    """
+
+    def __init__(self, factor=3.0, floor=0.2, min_samples=20, window=300):
+        self.factor = factor
+        self.floor = floor
+        self.min_samples = min_samples
+        self.window = window
+        self._histograms = dict()
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds):
+        with self._lock:
+            histogram = self._histograms.get(endpoint)
+            if histogram is None:
+                histogram = self._histograms[endpoint] = LatencyHistogram(self.window)
+            histogram.record(seconds)
+
+    def percentile(self, endpoint, q):
+        """Return latency quantile q of endpoint; None until it has min_samples."""
+        with self._lock:
+            histogram = self._histograms.get(endpoint)
+            if histogram is None or histogram.count() < self.min_samples:
+                return None
+            return histogram.percentile(q)
+
+    def timeout(self, endpoint, default, ceiling=None):
+        """
+        Return p99 latency of endpoint times factor, at least floor and at
+        most ceiling; return default until there are enough samples.
+        """
+        p99 = self.percentile(endpoint, 0.99)
+        timeout = default if p99 is None else max(p99 * self.factor, self.floor)
+        return timeout if ceiling is None else min(timeout, ceiling)
+
+    def hedge_delay(self, endpoint):
+        """Return p95 latency of endpoint; None until there are enough samples."""
+        return self.percentile(endpoint, 0.95)
+
+    def stats(self):
+        """Return a dictionary of endpoint to sample count and percentiles."""
+        with self._lock:
+            endpoints = list(self._histograms)
+        stats = dict()
+        for endpoint in endpoints:
+            with self._lock:
+                histogram = self._histograms[endpoint]
+                stats[endpoint] = {
+                    "samples": histogram.count(),
+                    "p50": histogram.percentile(0.5),
+                    "p95": histogram.percentile(0.95),
+                    "p99": histogram.percentile(0.99),
+                }
+        return stats
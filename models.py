@@ -1,11 +1,14 @@
 """Models for NewSmart app."""
 import datetime
+import os
 
 from flask import flash
 from flask_bcrypt import Bcrypt
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR, insert
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
+from cache import TTLCache
 from logger import logger
 
 db = SQLAlchemy()
@@ -24,10 +27,11 @@ class User(db.Model):
     email = db.Column(db.String(50), nullable=False, unique=True)
     first_name = db.Column(db.String(30), nullable=False)
     last_name = db.Column(db.String(30), nullable=False)
+    # bumped whenever cached user context (username, categories) changes
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     saves = db.relationship('Saves', backref='user', passive_deletes=True)
-    articles = db.relationship('Article', secondary="saves", lazy="joined",
-                               backref='users')
+    articles = db.relationship('Article', secondary="saves", backref='users')
     users_categories = db.relationship('UserCategory', backref='user', passive_deletes=True)
     categories = db.relationship('Category', secondary="users_categories", backref='users')
 
@@ -76,6 +80,7 @@ class User(db.Model):
             return None
         
         user.username = new_username
+        user.data_version = User.data_version + 1
 
         try:
             db.session.add(user)
@@ -113,6 +118,14 @@ class User(db.Model):
                 f"first_name={self.first_name} "
                 f"last_name={self.last_name}>")
 
+    @classmethod
+    def bump_version(cls, user_id):
+        """
+        Invalidate cached contexts of user; caller commits with its change.
+        """
+        cls.query.filter(cls.id == user_id).update(
+            {cls.data_version: cls.data_version + 1}, synchronize_session=False)
+
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
@@ -131,6 +144,16 @@ class Article(db.Model):
     img_url = db.Column(db.Text, nullable=False, default=DEFAULT_IMG_URL)
     timestamp = db.Column(db.DateTime, nullable=False,
                           default=datetime.datetime.utcnow())
+    # weighted full-text document, maintained by postgres on every write
+    search_vector = db.deferred(db.Column(TSVECTOR, db.Computed(
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(summary, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(content, '')), 'C')",
+        persisted=True)))
+
+    __table_args__ = (
+        db.Index('ix_articles_search_vector', 'search_vector', postgresql_using='gin'),
+    )
 
     saves = db.relationship('Saves', backref='article', passive_deletes=True)
     articles_tags = db.relationship('ArticleTag', backref='article', passive_deletes=True)
@@ -182,6 +205,104 @@ class Article(db.Model):
             "timestamp": self.timestamp.isoformat(),
         }
 
+    @classmethod
+    def search(cls, phrase, limit=20, days=None):
+        """
+        Return a list of stored articles matching phrase, best ranked first,
+        using the full-text index; with days, only articles published within
+        that many days. Return None if the search failed.
+        """
+        query = db.func.websearch_to_tsquery('english', phrase)
+        search = cls.query.filter(cls.search_vector.op('@@')(query))
+        if days is not None:
+            oldest = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+            search = search.filter(cls.timestamp >= oldest)
+
+        try:
+            return (
+                search.order_by(db.func.ts_rank_cd(cls.search_vector, query).desc(),
+                                cls.timestamp.desc())
+                      .limit(limit).all()
+            )
+        except SQLAlchemyError:
+            logger.critical(f'Failed to search articles for "{phrase}" on database.')
+            db.session.rollback()
+            return None
+
+    @classmethod
+    def from_news_article(cls, article):
+        """
+        Map a News API article onto article column values;
+        return None if it lacks a url or title.
+        """
+        if not article.get('url') or not article.get('title'):
+            return None
+
+        try:
+            timestamp = datetime.datetime.strptime(
+                article.get('publishedAt') or "", "%Y-%m-%dT%H:%M:%SZ")
+        except ValueError:
+            timestamp = datetime.datetime.utcnow()
+
+        return {
+            "title": article['title'],
+            "summary": article.get('description'),
+            "content": article.get('content') or article.get('description') or "",
+            "url": article['url'],
+            "source": (article.get('source') or {}).get('name') or "Unknown",
+            "img_url": article.get('urlToImage') or DEFAULT_IMG_URL,
+            "timestamp": timestamp,
+        }
+
+    @classmethod
+    def upsert_many(cls, articles):
+        """
+        Insert or update News API articles by url in one statement and
+        commit to db; rows whose content did not change are left untouched.
+        Return a dictionary of inserted and updated counts, otherwise None.
+        """
+        rows = {
+            row['url']: row
+            for row in map(cls.from_news_article, articles) if row
+        }
+        if not rows:
+            return {"inserted": 0, "updated": 0}
+
+        stmt = insert(cls.__table__).values(list(rows.values()))
+        columns = ("title", "summary", "content", "img_url")
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['url'],
+            set_={column: stmt.excluded[column] for column in columns},
+            where=db.tuple_(*(cls.__table__.c[column] for column in columns))
+                    .op("IS DISTINCT FROM")(
+                        db.tuple_(*(stmt.excluded[column] for column in columns)))
+        ).returning(db.literal_column("xmax = 0").label("inserted"))
+
+        try:
+            inserted = [row.inserted for row in db.session.execute(stmt)]
+            db.session.commit()
+        except SQLAlchemyError:
+            logger.critical(f'Failed to upsert {len(rows)} articles on database.')
+            db.session.rollback()
+            return None
+
+        return {
+            "inserted": sum(inserted),
+            "updated": len(inserted) - sum(inserted),
+        }
+
+    def to_news_article(self):
+        """Return article in the shape of a News API article for templates."""
+        return {
+            "title": self.title,
+            "description": self.summary,
+            "content": self.content,
+            "url": self.url,
+            "source": {"id": None, "name": self.source},
+            "urlToImage": None if self.img_url == DEFAULT_IMG_URL else self.img_url,
+            "publishedAt": self.timestamp.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+
 
 class Tag(db.Model):
 
@@ -193,6 +314,10 @@ class Tag(db.Model):
     articles_tags = db.relationship('ArticleTag', backref='tag', passive_deletes=True)
     articles = db.relationship('Article', secondary="articles_tags", backref='tags')
 
+    # keyword -> id of existing tags; tags are never renamed or removed by the app
+    id_cache = TTLCache(ttl=None,
+                        max_entries=int(os.environ.get("TAG_ID_CACHE_SIZE", 4096)))
+
     @classmethod
     def new(cls, keyword):
         """
@@ -219,6 +344,68 @@ class Tag(db.Model):
 
         return new_tag
 
+    @classmethod
+    def get_or_create_many(cls, keywords):
+        """
+        Get or create tags for keywords in one upsert round trip and commit
+        to db; cached keywords skip the database entirely.
+        Return a dictionary of keyword to tag id in keyword order,
+        otherwise return None.
+        Note: keywords longer than the keyword column are skipped.
+        """
+        keywords = cls.valid_keywords(keywords)
+
+        tag_ids = dict()
+        missing = []
+        for keyword in keywords:
+            tag_id = cls.id_cache.get(keyword)
+            if tag_id is None:
+                missing.append(keyword)
+            else:
+                tag_ids[keyword] = tag_id
+
+        if missing:
+            stmt = cls.upsert_statement(missing)
+
+            try:
+                rows = db.session.execute(stmt).fetchall()
+                db.session.commit()
+            except SQLAlchemyError:
+                logger.critical(f'Failed to get or create tags {missing} on database.')
+                db.session.rollback()
+                return None
+
+            for tag_id, keyword in rows:
+                cls.id_cache.set(keyword, tag_id)
+                tag_ids[keyword] = tag_id
+
+        return {keyword: tag_ids[keyword] for keyword in keywords}
+
+    @classmethod
+    def valid_keywords(cls, keywords):
+        """
+        Return keywords without blanks, duplicates or keywords too long
+        for the keyword column, in their original order.
+        """
+        max_length = cls.keyword.property.columns[0].type.length
+        return list(dict.fromkeys(
+            keyword for keyword in keywords if keyword and len(keyword) <= max_length
+        ))
+
+    @classmethod
+    def upsert_statement(cls, keywords):
+        """
+        Return an INSERT ... ON CONFLICT statement returning (id, keyword)
+        of every keyword, whether the tag is new or already existed.
+        """
+        stmt = insert(cls.__table__).values(
+            [{"keyword": keyword} for keyword in keywords])
+        # no-op update so existing rows are returned as well
+        return stmt.on_conflict_do_update(
+            index_elements=['keyword'],
+            set_={"keyword": stmt.excluded.keyword}
+        ).returning(cls.id, cls.keyword)
+
     def __repr__(self):
         return (f"<Tag: id={self.id} "
                 f"keyword='{self.keyword}'>")
@@ -305,6 +492,7 @@ class Saves(db.Model):
 
         try:
             db.session.add(new_saves)
+            UserRecommendation.mark_stale(user_id)
             db.session.commit()
         except IntegrityError as e:
             logger.error(
@@ -319,6 +507,81 @@ class Saves(db.Model):
 
         return new_saves
 
+    @classmethod
+    def new_with_article(cls, user_id, article, keywords=(), defer_tags=False):
+        """
+        Bookmark an article for user in one transaction and commit to db:
+        insert the article unless its url exists, create the saves object
+        unless it exists, link tags for keywords, mark user's recommendations
+        stale, and queue a tag job when tagging is deferred.
+        Return a dictionary of article, bookmark, tags and job objects and
+        whether the bookmark was created, otherwise return None.
+        """
+        # let column defaults apply to missing optional fields
+        article = {key: value for key, value in article.items() if value is not None}
+        keywords = Tag.valid_keywords(keywords)
+
+        try:
+            stmt = insert(Article.__table__).values(**article)
+            # no-op update so the id of an existing article is returned
+            article_id = db.session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=['url'], set_={"url": stmt.excluded.url}
+                ).returning(Article.id)
+            ).scalar()
+
+            saves_id = db.session.execute(
+                insert(cls.__table__).values(
+                    user_id=user_id, article_id=article_id,
+                    timestamp=datetime.datetime.utcnow()
+                ).on_conflict_do_nothing(constraint='unique_bookmark')
+                 .returning(cls.id)
+            ).scalar()
+            created = saves_id is not None
+
+            tag_rows = []
+            if keywords:
+                tag_rows = db.session.execute(Tag.upsert_statement(keywords)).fetchall()
+                db.session.execute(
+                    insert(ArticleTag.__table__).values([
+                        {"article_id": article_id, "tag_id": tag_id}
+                        for tag_id, _ in tag_rows
+                    ]).on_conflict_do_nothing()
+                )
+
+            if created or keywords:
+                UserRecommendation.mark_stale(user_id)
+
+            job = None
+            if defer_tags:
+                job = TagJob(user_id=user_id, article_url=article['url'],
+                             article_id=article_id)
+                db.session.add(job)
+
+            db.session.commit()
+        except SQLAlchemyError:
+            logger.critical(
+                f"Failed to bookmark {article.get('url')} for user {user_id} on database.")
+            db.session.rollback()
+            return None
+
+        for tag_id, keyword in tag_rows:
+            Tag.id_cache.set(keyword, tag_id)
+
+        article = Article.query.get(article_id)
+        bookmark = (
+            cls.query.get(saves_id)
+            if created else
+            cls.query.filter(cls.user_id == user_id, cls.article_id == article_id).one()
+        )
+        return {
+            "article": article,
+            "bookmark": bookmark,
+            "tags": article.tags,
+            "job": job,
+            "created": created,
+        }
+
     @classmethod
     def remove(cls, saves_id):
         """
@@ -328,6 +591,7 @@ class Saves(db.Model):
         saves = cls.query.get_or_404(saves_id)
 
         try:
+            UserRecommendation.mark_stale(saves.user_id)
             db.session.delete(saves)
             db.session.commit()
         except SQLAlchemyError:
@@ -373,6 +637,7 @@ class ArticleTag(db.Model):
 
         try:
             db.session.add(new_article_tag)
+            UserRecommendation.mark_article_stale(article_id)
             db.session.commit()
         except IntegrityError:
             logger.error(
@@ -388,6 +653,33 @@ class ArticleTag(db.Model):
 
         return new_article_tag
 
+    @classmethod
+    def new_many(cls, article_id, tag_ids):
+        """
+        Associate specified article with every tag in one statement and
+        commit to db; existing associations are left as is and recommendations
+        of users bookmarking the article are marked stale.
+        Return True if successful, otherwise return False.
+        """
+        if not tag_ids:
+            return True
+
+        stmt = insert(cls.__table__).values(
+            [{"article_id": article_id, "tag_id": tag_id} for tag_id in tag_ids]
+        ).on_conflict_do_nothing()
+
+        try:
+            db.session.execute(stmt)
+            UserRecommendation.mark_article_stale(article_id)
+            db.session.commit()
+        except SQLAlchemyError:
+            logger.critical(
+                f'Failed to link article {article_id} to tags {tag_ids} on database.')
+            db.session.rollback()
+            return False
+
+        return True
+
     def __repr__(self):
         return (f"<Article-Tag: article={self.article_id} tag_id='{self.tag_id}'>")
     
@@ -424,6 +716,7 @@ class UserCategory(db.Model):
 
         try:
             db.session.add(new_user_category)
+            User.bump_version(user_id)
             db.session.commit()
         except IntegrityError:
             logger.error(
@@ -451,6 +744,7 @@ class UserCategory(db.Model):
 
         try:
             db.session.delete(user_category)
+            User.bump_version(user_id)
             db.session.commit()
         except SQLAlchemyError:
             logger.critical(f'Failed to delete {user_category} from database.')
@@ -468,6 +762,7 @@ class UserCategory(db.Model):
         try:
             user_category = cls.query.filter(
                                 UserCategory.user_id == user_id).delete()
+            User.bump_version(user_id)
             db.session.commit()
         except SQLAlchemyError:
             logger.critical(f'Failed to delete {user_category} from database.')
@@ -487,6 +782,391 @@ class UserCategory(db.Model):
         }
 
 
+class NLUAnalysis(db.Model):
+    """
+    Raw NLU analysis of an article page, shared by every user bookmarking it.
+    Serves as the analysis store of NLUApiSession.
+    """
+
+    __tablename__ = "nlu_analyses"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    url = db.Column(db.Text, nullable=False)
+    term_limit = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.String(16), nullable=False)
+    analysis = db.Column(JSONB, nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('url', 'term_limit', 'version', name='unique_nlu_analysis'),
+    )
+
+    @classmethod
+    def lookup(cls, url, limit, version, max_age=None):
+        """
+        Return stored analysis for canonical url and analysis parameters;
+        return None if missing or older than max_age seconds.
+        """
+        query = cls.query.with_entities(cls.analysis).filter(
+            cls.url == url, cls.term_limit == limit, cls.version == version
+        )
+        if max_age is not None:
+            oldest = datetime.datetime.utcnow() - datetime.timedelta(seconds=max_age)
+            query = query.filter(cls.timestamp >= oldest)
+
+        try:
+            row = query.one_or_none()
+        except SQLAlchemyError:
+            logger.critical(f'Failed to look up analysis for {url} on database.')
+            db.session.rollback()
+            return None
+
+        return row.analysis if row else None
+
+    @classmethod
+    def save(cls, url, limit, version, analysis):
+        """
+        Insert or refresh analysis for canonical url and analysis parameters
+        and commit to db.
+        Return True if successful, otherwise return False.
+        """
+        stmt = insert(cls.__table__).values(
+            url=url, term_limit=limit, version=version,
+            analysis=analysis, timestamp=datetime.datetime.utcnow()
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint='unique_nlu_analysis',
+            set_={"analysis": stmt.excluded.analysis,
+                  "timestamp": stmt.excluded.timestamp}
+        )
+
+        try:
+            db.session.execute(stmt)
+            db.session.commit()
+        except SQLAlchemyError:
+            logger.critical(f'Failed to save analysis for {url} on database.')
+            db.session.rollback()
+            return False
+
+        return True
+
+    def __repr__(self):
+        return (f"<NLUAnalysis: id={self.id} "
+                f"url={self.url if len(self.url) < 20 else '...'} "
+                f"term_limit={self.term_limit} version={self.version} "
+                f"timestamp={self.timestamp}>")
+
+
+class TagJob(db.Model):
+    """
+    Queued tag extraction for an article url; the table doubles as a
+    durable job queue so pending jobs survive a process restart.
+    """
+
+    __tablename__ = "tag_jobs"
+
+    STATUSES = ("queued", "running", "done", "failed")
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer,
+                        db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    article_url = db.Column(db.Text, nullable=False)
+    # tags are linked to this article when the job finishes
+    article_id = db.Column(db.Integer,
+                           db.ForeignKey('articles.id', ondelete='CASCADE'))
+    status = db.Column(db.String(16), nullable=False, default="queued", index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # retried jobs are not claimed before this time
+    run_after = db.Column(db.DateTime)
+    tags = db.Column(JSONB)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    @classmethod
+    def new(cls, user_id, article_url, article_id=None):
+        """
+        Create new queued job and commit to db.
+        Return job object if successful, otherwise return None.
+        """
+
+        new_job = cls(user_id=user_id, article_url=article_url, article_id=article_id)
+
+        try:
+            db.session.add(new_job)
+            db.session.commit()
+        except SQLAlchemyError:
+            logger.critical(f'Failed to create {new_job} on database.')
+            db.session.rollback()
+            return None
+
+        return new_job
+
+    @classmethod
+    def claim(cls):
+        """
+        Atomically mark the oldest queued job as running and commit to db;
+        concurrent workers skip rows locked by each other.
+        Return the claimed job id, otherwise return None.
+        """
+        now = datetime.datetime.utcnow()
+        oldest = (
+            db.select([cls.id])
+              .where(cls.status == "queued")
+              .where(db.or_(cls.run_after.is_(None), cls.run_after <= now))
+              .order_by(cls.id)
+              .limit(1)
+              .with_for_update(skip_locked=True)
+              .as_scalar()
+        )
+        stmt = (
+            cls.__table__.update()
+               .where(cls.id == oldest)
+               .values(status="running", attempts=cls.attempts + 1,
+                       updated_at=now)
+               .returning(cls.id)
+        )
+
+        try:
+            job_id = db.session.execute(stmt).scalar()
+            db.session.commit()
+        except SQLAlchemyError:
+            logger.critical('Failed to claim a tag job on database.')
+            db.session.rollback()
+            return None
+
+        return job_id
+
+    @classmethod
+    def requeue_stale(cls, stale_after=300, max_attempts=3):
+        """
+        Put back jobs left running longer than stale_after seconds,
+        e.g. by a worker that was restarted; jobs out of attempts fail.
+        Return number of jobs recovered.
+        """
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=stale_after)
+        stale = cls.query.filter(cls.status == "running", cls.updated_at < cutoff)
+
+        try:
+            stale.filter(cls.attempts >= max_attempts).update(
+                {"status": "failed", "error": "Too many attempts.",
+                 "updated_at": datetime.datetime.utcnow()},
+                synchronize_session=False)
+            count = stale.update(
+                {"status": "queued", "updated_at": datetime.datetime.utcnow()},
+                synchronize_session=False)
+            db.session.commit()
+        except SQLAlchemyError:
+            logger.critical('Failed to requeue stale tag jobs on database.')
+            db.session.rollback()
+            return 0
+
+        return count
+
+    def retry(self, error, max_attempts=3, delay=60):
+        """
+        Put the job back in the queue after a failed attempt and commit to
+        db; it is claimed again after delay seconds, doubled per attempt,
+        so an upstream outage can pass. A job out of attempts fails with
+        error instead.
+        Return True if successful, otherwise return False.
+        """
+        if self.attempts >= max_attempts:
+            return self.finish("failed", error=error)
+
+        now = datetime.datetime.utcnow()
+        self.status = "queued"
+        self.error = error
+        self.run_after = now + datetime.timedelta(
+            seconds=delay * 2 ** max(self.attempts - 1, 0))
+        self.updated_at = now
+
+        try:
+            db.session.add(self)
+            db.session.commit()
+        except SQLAlchemyError:
+            logger.critical(f'Failed to update {self} on database.')
+            db.session.rollback()
+            return False
+
+        return True
+
+    def finish(self, status, tags=None, error=None):
+        """
+        Record job outcome and commit to db.
+        Return True if successful, otherwise return False.
+        """
+        assert status in ("done", "failed")
+
+        self.status = status
+        self.tags = tags
+        self.error = error
+        self.updated_at = datetime.datetime.utcnow()
+
+        try:
+            db.session.add(self)
+            db.session.commit()
+        except SQLAlchemyError:
+            logger.critical(f'Failed to update {self} on database.')
+            db.session.rollback()
+            return False
+
+        return True
+
+    def __repr__(self):
+        return (f"<TagJob: id={self.id} user_id={self.user_id} "
+                f"article_id={self.article_id} status={self.status}>")
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "article_url": self.article_url,
+            "article_id": self.article_id,
+            "status": self.status,
+            "tags": self.tags,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+        }
+
+
+class UserRecommendation(db.Model):
+    """
+    Materialized recommendation feed of a user, refreshed in the background
+    by RecommendationRefresher so pages never wait on article searches.
+    Bookmark changes mark the feed stale and bump its version; a refresh
+    that raced with a newer change leaves the feed stale.
+    """
+
+    __tablename__ = "user_recommendations"
+
+    user_id = db.Column(db.Integer,
+                        db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    articles = db.Column(JSONB, nullable=False, default=list)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    stale = db.Column(db.Boolean, nullable=False, default=True, index=True)
+    refreshed_at = db.Column(db.DateTime)
+    claimed_at = db.Column(db.DateTime)
+
+    @classmethod
+    def get_articles(cls, user_id):
+        """
+        Return stored list of recommended articles for user;
+        return None if user has no feed yet or lookup failed.
+        """
+        try:
+            row = (cls.query.with_entities(cls.articles)
+                      .filter(cls.user_id == user_id).one_or_none())
+        except SQLAlchemyError:
+            logger.critical(f'Failed to look up recommendations of user {user_id} on database.')
+            db.session.rollback()
+            return None
+
+        return row.articles if row else None
+
+    @classmethod
+    def mark_stale(cls, user_id):
+        """
+        Queue feed of user for refresh, creating an empty one if missing;
+        caller commits with its change.
+        """
+        stmt = insert(cls.__table__).values(
+            user_id=user_id, articles=[], version=1, stale=True
+        )
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={"stale": True, "version": cls.__table__.c.version + 1}
+        ))
+
+    @classmethod
+    def mark_article_stale(cls, article_id):
+        """
+        Queue feeds of every user bookmarking article for refresh,
+        e.g. after its tags changed; caller commits with its change.
+        """
+        bookmarkers = (
+            db.select([Saves.user_id, db.literal([], JSONB), db.literal(1), db.true()])
+              .where(Saves.article_id == article_id)
+        )
+        stmt = insert(cls.__table__).from_select(
+            ['user_id', 'articles', 'version', 'stale'], bookmarkers
+        )
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={"stale": True, "version": cls.__table__.c.version + 1}
+        ))
+
+    @classmethod
+    def claim_due(cls, max_age, lease=300, limit=8):
+        """
+        Atomically claim up to limit feeds that are stale or older than
+        max_age seconds and commit to db; feeds claimed by another worker
+        within lease seconds are skipped.
+        Return a list of (user_id, version) tuples, otherwise an empty list.
+        """
+        now = datetime.datetime.utcnow()
+        oldest = now - datetime.timedelta(seconds=max_age)
+        lease_cutoff = now - datetime.timedelta(seconds=lease)
+        due = (
+            db.select([cls.user_id])
+              .where(db.or_(cls.stale.is_(True), cls.refreshed_at < oldest))
+              .where(db.or_(cls.claimed_at.is_(None), cls.claimed_at < lease_cutoff))
+              .order_by(cls.stale.desc(), cls.refreshed_at.nullsfirst())
+              .limit(limit)
+              .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            cls.__table__.update()
+               .where(cls.user_id.in_(due))
+               .values(claimed_at=now)
+               .returning(cls.user_id, cls.version)
+        )
+
+        try:
+            claimed = db.session.execute(stmt).fetchall()
+            db.session.commit()
+        except SQLAlchemyError:
+            logger.critical('Failed to claim recommendation feeds on database.')
+            db.session.rollback()
+            return []
+
+        return [(user_id, version) for user_id, version in claimed]
+
+    @classmethod
+    def store(cls, user_id, articles, version):
+        """
+        Save refreshed feed of user built as of version and commit to db;
+        the feed stays stale if it was marked stale again meanwhile.
+        Return True if successful, otherwise return False.
+        """
+        stmt = insert(cls.__table__).values(
+            user_id=user_id, articles=articles, version=version, stale=False,
+            refreshed_at=datetime.datetime.utcnow()
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={"articles": stmt.excluded.articles,
+                  "refreshed_at": stmt.excluded.refreshed_at,
+                  "claimed_at": None,
+                  "stale": cls.__table__.c.version != version}
+        )
+
+        try:
+            db.session.execute(stmt)
+            db.session.commit()
+        except SQLAlchemyError:
+            logger.critical(f'Failed to save recommendations of user {user_id} on database.')
+            db.session.rollback()
+            return False
+
+        return True
+
+    def __repr__(self):
+        return (f"<UserRecommendation: user_id={self.user_id} "
+                f"version={self.version} stale={self.stale} "
+                f"refreshed_at={self.refreshed_at}>")
+
+
 def connect_db(app):
     """
     Connect this database to provided Flask app.
@@ -1,18 +1,37 @@
 import os
 import datetime
 
-from base_api_session import BaseApiSession
+from base_api_session import MAX_TIMEOUT, BaseApiSession
+from cache import SnapshotStore, TTLCache
 
 
 class NewsApiSession(BaseApiSession):
     news_key = os.environ["NEWS_API_KEY"]    # raise exception if not set
     headlines_url = "https://newsapi.org/v2/top-headlines"
     articles_url = "https://newsapi.org/v2/everything"
+    # top headlines are identical for every user asking the same parameters
+    headlines_cache = TTLCache(
+        ttl=int(os.environ.get("HEADLINES_CACHE_TTL", 300)),
+        max_entries=int(os.environ.get("HEADLINES_CACHE_MAX_ENTRIES", 64)),
+        max_bytes=int(os.environ.get("HEADLINES_CACHE_MAX_BYTES", 8 * 1024 * 1024)),
+        # expired headlines are served while the quota runs low or requests fail
+        stale_ttl=int(os.environ.get("HEADLINES_CACHE_STALE_TTL", 24 * 60 * 60)),
+    )
+    # urls of articles fetched recently; trusted without a HEAD request
+    served_urls = TTLCache(
+        ttl=int(os.environ.get("SERVED_URLS_TTL", 60 * 60)),
+        max_entries=int(os.environ.get("SERVED_URLS_MAX_ENTRIES", 10000)),
+    )
+    # latest headlines kept fresh by HeadlineRefresher; served however old
+    headline_snapshots = SnapshotStore()
+    snapshot_size = 20
 
-    def get_top_articles(self, country='us', category=None, size=None, sources=[]):
+    def get_top_articles(self, country='us', category=None, size=None, sources=[],
+                         timeout=MAX_TIMEOUT):
         """
         Send API request to newsapi.org;
         return a list of article objects.
+        Headlines kept in a snapshot are served from it without a request.
         Note: No query search for this url since results are limited.
         article = {
             "source": {
@@ -28,6 +47,71 @@ class NewsApiSession(BaseApiSession):
             "content",
         }
         """
+        articles = NewsApiSession.headline_snapshot(country, category, size, sources)
+        if articles is not None:
+            return articles
+
+        key = NewsApiSession.headlines_key(country, category, size, sources)
+        articles = NewsApiSession.headlines_cache.get(key)
+        if articles is not None:
+            return list(articles)
+
+        # expired headlines beat spending the last of the quota
+        serve_stale = self.quota_policy("stale_cache", NewsApiSession.headlines_url)
+        stale = NewsApiSession.headlines_cache.get_stale(key)
+        if serve_stale and stale is not None:
+            return list(stale)
+
+        params = NewsApiSession.headlines_params(country, category, size, sources)
+        resp = self.get(NewsApiSession.headlines_url, params, timeout=timeout)
+        articles = resp.get("articles") if resp else resp
+
+        # do not cache failed requests
+        if articles is not None:
+            NewsApiSession.headlines_cache.set(key, articles)
+            NewsApiSession.remember_served(articles)
+            return list(articles)
+
+        if "stale_cache" in self.quota_policies and stale is not None:
+            return list(stale)
+        return articles
+
+    @staticmethod
+    def headline_snapshot(country='us', category=None, size=None, sources=[]):
+        """
+        Return a list of articles from the latest headline snapshot,
+        however old, without a request; return None if there is none.
+        """
+        # smaller pages are the head of the full snapshot
+        if size and size > NewsApiSession.snapshot_size:
+            return None
+        articles = NewsApiSession.headline_snapshots.get(
+            NewsApiSession.headlines_key(country, category, None, sources))
+        if articles is None:
+            return None
+        return list(articles[:size] if size else articles)
+
+    def refresh_headlines(self, country='us', category=None, timeout=MAX_TIMEOUT):
+        """
+        Fetch top headlines from newsapi.org into their snapshot;
+        return True if successful, otherwise return False and keep
+        serving the previous snapshot.
+        """
+        params = NewsApiSession.headlines_params(
+            country, category, NewsApiSession.snapshot_size)
+        resp = self.get(NewsApiSession.headlines_url, params, timeout=timeout)
+        articles = resp.get("articles") if resp else resp
+        if articles is None:
+            return False
+
+        NewsApiSession.remember_served(articles)
+        NewsApiSession.headline_snapshots.put(
+            NewsApiSession.headlines_key(country, category), tuple(articles))
+        return True
+
+    @staticmethod
+    def headlines_params(country='us', category=None, size=None, sources=[]):
+        """Return query parameters for a top headlines request."""
         params = {"apiKey": NewsApiSession.news_key, "country": country}
         if category:
             params.update({"category": category})
@@ -36,13 +120,25 @@ class NewsApiSession(BaseApiSession):
         if sources:
             params.update({"sources": ",".join(sources)})
             del params['country']
-        
-        resp = self.get(NewsApiSession.headlines_url, params)
+        return params
 
-        return resp.get("articles") if resp else resp
+    @staticmethod
+    def headlines_key(country='us', category=None, size=None, sources=[]):
+        """
+        Normalize top headline parameters into a hashable cache key;
+        country is ignored when sources are given, as in the API request.
+        """
+        sources = tuple(sorted({source.strip().lower() for source in sources}))
+        return (
+            None if sources else (country or "").lower(),
+            category.lower() if category else None,
+            int(size) if size else None,
+            sources,
+        )
 
     def search_articles(self, phrase, size=None, sort="popularity",
-                        language="en", days=7, exclude_domains=[]):
+                        language="en", days=7, exclude_domains=[],
+                        timeout=MAX_TIMEOUT):
         """
         Search for articles for specified phrase;
         return a list of article objects.
@@ -52,6 +148,26 @@ class NewsApiSession(BaseApiSession):
         if not phrase:
             return []
 
+        params = NewsApiSession.search_params(phrase, size, sort, language,
+                                              days, exclude_domains)
+        resp = self.get(NewsApiSession.articles_url, params, timeout=timeout)
+        articles = resp.get("articles") if resp else resp
+
+        if articles:
+            NewsApiSession.remember_served(articles)
+        return articles
+
+    @staticmethod
+    def remember_served(articles):
+        """Remember urls of articles fetched from newsapi.org as trusted."""
+        for article in articles:
+            if article.get('url'):
+                NewsApiSession.served_urls.set(article['url'], True)
+
+    @staticmethod
+    def search_params(phrase, size=None, sort="popularity",
+                      language="en", days=7, exclude_domains=[]):
+        """Return query parameters for an article search request."""
         params = {
             "apiKey": NewsApiSession.news_key, "language": language,
             "q": phrase, "sortBy": sort,
@@ -64,7 +180,4 @@ class NewsApiSession(BaseApiSession):
             params.update({"pageSize": size})
         if exclude_domains:
             params.update({"excludeDomains" : ",".join(exclude_domains)})
-        
-        resp = self.get(NewsApiSession.articles_url, params)
-
-        return resp.get("articles") if resp else resp
+        return params
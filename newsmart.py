@@ -1,71 +1,419 @@
+import datetime
+import os
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, wait
+from types import MappingProxyType
+
 from flask import g
+from sqlalchemy.orm import joinedload
 
-from models import Saves
+from base_api_session import MAX_TIMEOUT
+from cache import TTLCache
+from logger import logger
+from models import (Article, ArticleTag, NLUAnalysis, Saves, Tag,
+                    UserRecommendation, db)
 from news_api_session import NewsApiSession
 from nlu_api_session import NLUApiSession
+from quota import QuotaLimiter
+from tag_index import TagIndex
 
 
 class NewSmart(NewsApiSession, NLUApiSession):
     max_terms = 4
-    
-    def get_user_category_articles(self, limit=10):
+    analysis_store = NLUAnalysis
+    # bounded pool shared by all requests for concurrent outbound calls
+    max_workers = int(os.environ.get("NEWSMART_MAX_WORKERS", 8))
+    # seconds a page may spend waiting on outbound calls
+    page_budget = float(os.environ.get("NEWSMART_PAGE_BUDGET", MAX_TIMEOUT))
+    # local content-based recommendations; searches only top these up
+    tag_index = TagIndex(
+        rebuild_interval=int(os.environ.get("TAG_INDEX_REBUILD_INTERVAL", 600)))
+    recommendation_size = 12
+    profile_size = 20
+    # local search answers alone with this many hits, the newest within max age
+    search_min_hits = int(os.environ.get("SEARCH_MIN_LOCAL_HITS", 5))
+    search_max_age = float(os.environ.get("SEARCH_MAX_AGE_HOURS", 24))
+    # results per phrase, so every page of a search is cut from one list
+    search_results = TTLCache(
+        ttl=int(os.environ.get("SEARCH_RESULTS_TTL", 900)),
+        max_entries=int(os.environ.get("SEARCH_RESULTS_MAX_ENTRIES", 256)),
+        max_bytes=int(os.environ.get("SEARCH_RESULTS_MAX_BYTES", 8 * 1024 * 1024)),
+    )
+    # upstream quotas shared by every worker process on this machine
+    quota = QuotaLimiter.from_env()
+    quota_buckets = {
+        NewsApiSession.headlines_url: "headlines",
+        NewsApiSession.articles_url: "articles",
+        NLUApiSession.analytics_url: "analytics",
+    }
+    quota_policies = frozenset(
+        policy.strip()
+        for policy in os.environ.get(
+            "QUOTA_POLICIES", "stale_cache,skip_searches").split(",")
+        if policy.strip()
+    )
+    _executor = None
+    _executor_pid = None
+    _executor_lock = threading.Lock()
+
+    @property
+    def executor(self):
+        """Thread pool for outbound calls; recreated after a fork."""
+        pid = os.getpid()
+        if NewSmart._executor is None or NewSmart._executor_pid != pid:
+            with NewSmart._executor_lock:
+                if NewSmart._executor is None or NewSmart._executor_pid != pid:
+                    NewSmart._executor = ThreadPoolExecutor(
+                        max_workers=NewSmart.max_workers,
+                        thread_name_prefix="newsmart")
+                    NewSmart._executor_pid = pid
+        return NewSmart._executor
+
+    def run_concurrently(self, calls, timeout=MAX_TIMEOUT, executor=None):
         """
-        Return a dictionary of category name as key and list of article objects as value
-        from categories that user has saved.
+        Run calls concurrently on executor, the shared pool by default,
+        under one deadline;
+        calls is a dictionary of key to (function, kwargs).
+        Each function receives the remaining budget as its timeout argument
+        when it starts, so queued calls never outlive the deadline.
+        Return a dictionary of key to result for the calls that finished
+        in time; calls that failed or missed the deadline are left out.
+        Note: functions run outside of the request context; do not use g.
         """
-        category_map = dict()
-        if g.user:
-            category_map = {
-                category.name: self.get_top_articles(
-                    category=category.name, size=limit)
-                for category in g.user.categories
-            }
-        return category_map
+        deadline = time.monotonic() + timeout
+        executor = self.executor if executor is None else executor
+        futures = {
+            key: executor.submit(
+                NewSmart._call_with_deadline, function, kwargs, deadline)
+            for key, (function, kwargs) in calls.items()
+        }
+        done, _ = wait(futures.values(), timeout=timeout)
+
+        results = dict()
+        for key, future in futures.items():
+            if future not in done:
+                future.cancel()
+                logger.warning(f"Call for {key} missed the {timeout}s deadline")
+                continue
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                logger.error(f"Call for {key} failed: {e}")
+        return results
 
-    def get_recommended_articles(self):
+    @staticmethod
+    def _call_with_deadline(function, kwargs, deadline):
+        """Call function with the time left before deadline as its timeout."""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("deadline passed before call started")
+        return function(**kwargs, timeout=remaining)
+
+    def get_home_sections(self, category_limit=12, budget=None):
         """
-        Return a list of articles recommended based on user's bookmarks.
+        Fetch the home page sections concurrently under one request-wide
+        deadline; return a dictionary with top_articles, category_map and
+        related_articles.
+        Related articles are read from the user's stored recommendation feed
+        and headlines from their snapshots when available.
+        A section is None when it missed the deadline; categories that
+        missed it are dropped from their section.
         """
-        related_articles = []
+        budget = NewSmart.page_budget if budget is None else budget
+        deadline = time.monotonic() + budget
+
+        calls = {"top": (self.get_top_articles, {})}
+        names, related_articles = [], []
         if g.user:
-            # 4 most recent articles saved by user
-            saves = (
-                Saves.query.filter(Saves.user_id == g.user.id)
-                        .order_by(Saves.timestamp.desc())
-                        .limit(4).all()
-            )
-            batch_size = 3 if len(saves) > 2 else 4
-            for save in saves:
-                # extract tags
-                tags = [tag.keyword for tag in save.article.tags]
-                if len(tags) > NewSmart.max_terms:
-                    # truncate words
-                    tags = tags[:NewSmart.max_terms]
-                # compose a phrase; tags include concepts followed by keywords
-                phrase = " ".join(tags)
-                # search articles based on phrase
-                articles = self.search_articles(phrase, size=batch_size,
-                                                exclude_domains=NewSmart.video_urls) or []
-                related_articles.extend(articles)
+            names = list(g.user.category_names)
+            related_articles = UserRecommendation.get_articles(g.user.id) or []
+            calls.update(self._category_calls(names, category_limit))
+
+        # sections with a headline snapshot need no outbound call
+        results = dict()
+        for key, (function, kwargs) in list(calls.items()):
+            articles = self.headline_snapshot(**kwargs)
+            if articles is not None:
+                results[key] = articles
+                del calls[key]
+        if calls:
+            results.update(self.run_concurrently(
+                calls, max(deadline - time.monotonic(), 0)))
+
+        category_map = {
+            name: results[("category", name)] or []
+            for name in names
+            if ("category", name) in results
+        }
+        return {
+            "top_articles": results.get("top"),
+            "category_map": (
+                category_map if category_map or not names else None
+            ),
+            "related_articles": related_articles,
+        }
+    
+    def get_feed(self, section, phrase=None, exclude_domains=[]):
+        """
+        Return every article of a feed section: top headlines, a news
+        category, the user's related articles or search results for phrase;
+        return None if the section could not be fetched.
+        Pages are cut from this list by the feed API, so it comes from
+        snapshots, caches and stored articles whenever they have it.
+        """
+        if section == "top":
+            return self.get_top_articles()
+        if section == "related":
+            return (UserRecommendation.get_articles(g.user.id) or []) if g.user else []
+        if section == "search":
+            return self.get_search_results(phrase, exclude_domains)
+        return self.get_top_articles(category=section)
+
+    def _category_calls(self, names, limit):
+        """Return concurrent calls fetching top articles for each category."""
+        return {
+            ("category", name): (self.get_top_articles,
+                                 {"category": name, "size": limit})
+            for name in names
+        }
+
+    def build_recommended_articles(self, user_id, timeout=MAX_TIMEOUT):
+        """
+        Return a list of articles recommended based on bookmarks of user:
+        stored articles sharing tags with recent bookmarks first, topped up
+        by related searches when there are fewer than recommendation_size;
+        return None if there were none and every related search failed or
+        was skipped to save quota.
+        Note: does not use g; safe to call outside of a request.
+        """
+        related_articles = self.get_local_recommendations(user_id)
+        if len(related_articles) >= NewSmart.recommendation_size:
+            return related_articles
+        # keep the search quota for pages users asked for
+        if self.quota_policy("skip_searches", NewSmart.articles_url):
+            return related_articles or None
+
+        phrases = self.get_recommendation_phrases(user_id)
+        calls = self._related_calls(phrases)
+        results = self.run_concurrently(calls, timeout)
+        if calls and not results and not related_articles:
+            return None
+
+        urls = {article['url'] for article in related_articles}
+        for article in self._merge_related(phrases, results):
+            if len(related_articles) >= NewSmart.recommendation_size:
+                break
+            if article['url'] not in urls:
+                urls.add(article['url'])
+                related_articles.append(article)
         return related_articles
 
+    def get_local_recommendations(self, user_id, limit=None):
+        """
+        Return a list of stored articles most similar by tags to the user's
+        recent bookmarks, in News API article shape, best match first;
+        articles the user bookmarked are left out.
+        """
+        limit = NewSmart.recommendation_size if limit is None else limit
+        article_ids = [
+            article_id for article_id, in
+            db.session.query(Saves.article_id)
+                      .filter(Saves.user_id == user_id)
+                      .order_by(Saves.timestamp.desc())
+        ]
+        matches = self.tag_index.similar(
+            article_ids[:NewSmart.profile_size], limit, exclude=article_ids)
+        if not matches:
+            return []
+
+        articles = {
+            article.id: article
+            for article in Article.query.filter(
+                Article.id.in_([article_id for article_id, _ in matches]))
+        }
+        return [
+            articles[article_id].to_news_article()
+            for article_id, _ in matches if article_id in articles
+        ]
+
+    def get_recommendation_phrases(self, user_id, limit=4):
+        """
+        Return a list of search phrases composed from the tags of the
+        user's most recent bookmarks; saves, articles and tag keywords
+        are loaded in a single query.
+        """
+        saves = (
+            Saves.query.options(
+                joinedload(Saves.article).load_only("id")
+                .joinedload(Article.tags).load_only("keyword"))
+            .filter(Saves.user_id == user_id)
+            .order_by(Saves.timestamp.desc())
+            .limit(limit).all()
+        )
+        # compose a phrase; tags include concepts followed by keywords
+        # truncate words to at most max_terms tags
+        return [
+            " ".join(tag.keyword for tag in save.article.tags[:NewSmart.max_terms])
+            for save in saves
+        ]
+
+    def _related_calls(self, phrases):
+        """Return concurrent calls searching articles for each phrase."""
+        batch_size = 3 if len(phrases) > 2 else 4
+        return {
+            ("related", index): (self.search_articles,
+                                 {"phrase": phrase, "size": batch_size,
+                                  "exclude_domains": NewSmart.video_urls})
+            for index, phrase in enumerate(phrases)
+            if phrase
+        }
+
+    @staticmethod
+    def _merge_related(phrases, results):
+        """Merge related search results in phrase order, dropping duplicate urls."""
+        related_articles, urls = [], set()
+        for index in range(len(phrases)):
+            for article in results.get(("related", index)) or []:
+                if article['url'] not in urls:
+                    urls.add(article['url'])
+                    related_articles.append(article)
+        return related_articles
+
+    def get_search_results(self, phrase, exclude_domains=[]):
+        """
+        Return a list of articles matching phrase as search does, kept for
+        search_results ttl seconds so loading more pages neither searches
+        again nor pages through a list that changed under the cursor;
+        return None if the search failed.
+        """
+        key = (phrase, tuple(sorted(exclude_domains)))
+        articles = NewSmart.search_results.get(key)
+        if articles is None:
+            articles = self.search(phrase, exclude_domains=exclude_domains)
+            # do not cache failed searches
+            if articles is None:
+                return None
+            articles = tuple(articles)
+            NewSmart.search_results.set(key, articles)
+        return list(articles)
+
+    def search(self, phrase, size=20, days=7, exclude_domains=[],
+               timeout=MAX_TIMEOUT):
+        """
+        Return a list of articles matching phrase, stored articles ranked by
+        the full-text index first; search newsapi.org only when there are
+        fewer than search_min_hits local hits or the newest is older than
+        search_max_age hours, appending and storing its results.
+        Return None if there were no local hits and the search failed.
+        """
+        local = [
+            article for article in Article.search(phrase, size, days) or []
+            if not NewSmart.in_domains(article.url, exclude_domains)
+        ]
+        articles = [article.to_news_article() for article in local]
+        newest = max((article.timestamp for article in local), default=None)
+        # newest is None without local hits, e.g. when search_min_hits is 0
+        if (newest is not None and len(local) >= NewSmart.search_min_hits
+                and datetime.datetime.utcnow() - newest
+                    <= datetime.timedelta(hours=NewSmart.search_max_age)):
+            return articles
+
+        found = self.search_articles(phrase, size, days=days,
+                                     exclude_domains=exclude_domains,
+                                     timeout=timeout)
+        if found is None:
+            return articles or None
+
+        # later searches for the phrase can be answered locally
+        Article.upsert_many(found)
+        urls = {article['url'] for article in articles}
+        articles.extend(article for article in found if article['url'] not in urls)
+        return articles[:size]
+
+    @staticmethod
+    def in_domains(url, domains):
+        """Return True if url is on one of domains or their subdomains."""
+        host = (urllib.parse.urlsplit(url).hostname or "").lower()
+        return any(host == domain or host.endswith(f".{domain}") for domain in domains)
+
+    def save_tags(self, terms_map):
+        """
+        Get or create tags from up to max_terms relevant terms, concepts first;
+        return a list of serialized tags, including ones that already existed;
+        return None if tags could not be saved.
+        """
+        terms = terms_map['concepts'] + terms_map['keywords']
+        tag_ids = Tag.get_or_create_many(terms[:NewSmart.max_terms])
+        if tag_ids is None:
+            return None
+        return [
+            {"id": tag_id, "keyword": keyword} for keyword, tag_id in tag_ids.items()
+        ]
+
+    def link_tags(self, article_id, tag_ids):
+        """
+        Associate tags with specified article;
+        return True if successful, otherwise return False.
+        """
+        if not ArticleTag.new_many(article_id, tag_ids):
+            return False
+        self.tag_index.add(article_id, tag_ids)
+        return True
+
+    def get_bookmark_index(self, urls=None):
+        """
+        Return a read-only map of bookmarked article url to bookmark id;
+        the user's full index is loaded with one query once per request.
+        With urls, only check those urls (e.g. articles on the current page)
+        unless the full index was already loaded.
+        """
+        if not g.user:
+            return MappingProxyType({})
+
+        if "bookmark_index" in g:
+            index = g.bookmark_index
+        elif urls is None:
+            index = g.bookmark_index = MappingProxyType(
+                dict(self._bookmark_query(g.user.id))
+            )
+        else:
+            urls = set(urls)
+            return MappingProxyType(
+                dict(self._bookmark_query(g.user.id).filter(Article.url.in_(urls)))
+                if urls else
+                {}
+            )
+
+        if urls is None:
+            return index
+        return MappingProxyType({url: index[url] for url in urls if url in index})
+
+    @staticmethod
+    def _bookmark_query(user_id):
+        """Return query of (url, saves id) pairs bookmarked by user."""
+        return (
+            db.session.query(Article.url, Saves.id)
+                      .join(Saves, Saves.article_id == Article.id)
+                      .filter(Saves.user_id == user_id)
+        )
+
+    @staticmethod
+    def article_urls(*article_lists):
+        """Return a set of urls of articles in every list; None lists are skipped."""
+        return {
+            article['url']
+            for articles in article_lists if articles
+            for article in articles
+        }
 
     def get_bookmarked_urls(self):
         """Return a set of article urls that user has bookmarked"""
-        bookmarked_urls = (
-            {article.url for article in g.user.articles}
-            if g.user else
-            {}
-        )
-        return bookmarked_urls
+        return frozenset(self.get_bookmark_index())
     
     def get_bookmark_url_to_id(self):
         """
         Return a map of bookmarked article url to bookmark id.
         """
-        bookmark_map = (
-            {saves.article.url: saves.id for saves in g.user.saves}
-            if g.user else
-            {}
-        )
-        return bookmark_map
+        return self.get_bookmark_index()
@@ -1,11 +1,22 @@
 import os
 
 from base_api_session import BaseApiSession
+from util import canonical_url
 
 
 class NLUApiSession(BaseApiSession):
     nlu_key = os.environ["NLU_API_KEY"]    # raise exception if not set
-    analytics_url = f"{os.environ['NLU_URL']}/v1/analyze?version=2019-07-12"
+    nlu_version = "2019-07-12"
+    analytics_url = f"{os.environ['NLU_URL']}/v1/analyze?version={nlu_version}"
+    # optional store of raw analyses keyed by canonical url, limit and version;
+    # must provide lookup(url, limit, version, max_age) and save(url, limit, version, analysis)
+    analysis_store = None
+    # seconds before a stored analysis is requested again; None keeps it forever
+    analysis_max_age = (
+        int(os.environ["NLU_ANALYSIS_MAX_AGE"])
+        if os.environ.get("NLU_ANALYSIS_MAX_AGE") else
+        None
+    )
     # Need a way to avoid using NLP on non-textual webpages...
     # For now, youtube.com seems to be the only source of video news in NewsAPI
     video_urls = {"youtube.com"}
@@ -15,44 +26,83 @@ class NLUApiSession(BaseApiSession):
         Request IBM Watson NLU instance to extract sentiment, keywords, concepts
         for specified url; return lists of sentiment, keyword, concept objects.
         """
-        json = {
-            "url": url,
-            "features": {
-                "sentiment": {},
-                "concepts": {
-                    "limit": limit
-                },
-                "keywords": {
-                    "limit": limit,
-                    "sentiment": True
-                }
-            }
-        }
+        json = NLUApiSession.analyze_payload(url, limit)
+        # analyses have no side effects; concurrent bookmarks of a url share one
         resp = self.post(NLUApiSession.analytics_url,
-                        json, auth=('apiKey', NLUApiSession.nlu_key))
+                        json, auth=('apiKey', NLUApiSession.nlu_key), coalesce=True)
         
         return resp
+
+    def get_analysis(self, url, limit=10):
+        """
+        Return the analysis for specified url from the analysis store if
+        available; otherwise request it and keep it in the store.
+        """
+        store = self.analysis_store
+        if store is None:
+            return self.analyze_url(url, limit)
+
+        key = canonical_url(url)
+        resp = store.lookup(key, limit, NLUApiSession.nlu_version,
+                            max_age=NLUApiSession.analysis_max_age)
+        if resp is None:
+            resp = self.analyze_url(url, limit)
+            if resp:
+                store.save(key, limit, NLUApiSession.nlu_version, resp)
+        return resp
     
     def get_relevant_terms(self, url, limit=5,
                            keyword_relevance=0.7, concept_relevance=0.9):
         """
         Request and extract keywords and concepts for specified url;
         return an object consists of keywords and concepts filtered
-        based on relevance.
+        based on relevance, or None if the analysis failed.
         Note: keywords indicate more specific events or mentioning;
         concepts indicate more generic terms or categories.
+        Stored analyses are reused; relevance thresholds are applied locally.
         return_object = {
             "keywords": [],
             "concepts": []
         }
         """
-        resp = (
-            None
-            # do not use NLP on video urls
-            if any(video_url in url for video_url in NLUApiSession.video_urls) else
-            self.analyze_url(url, limit)
-        )
+        # do not use NLP on video urls
+        if NLUApiSession.is_video_url(url):
+            return NLUApiSession.extract_terms(None)
+
+        resp = self.get_analysis(url, limit)
+        if not resp:
+            return None
+
+        return NLUApiSession.extract_terms(resp, keyword_relevance, concept_relevance)
+
+    @staticmethod
+    def analyze_payload(url, limit=10):
+        """Return request body for a sentiment, keyword and concept analysis."""
+        return {
+            "url": url,
+            "features": {
+                "sentiment": {},
+                "concepts": {
+                    "limit": limit
+                },
+                "keywords": {
+                    "limit": limit,
+                    "sentiment": True
+                }
+            }
+        }
+
+    @staticmethod
+    def is_video_url(url):
+        """Return True if url belongs to a known video source."""
+        return any(video_url in url for video_url in NLUApiSession.video_urls)
 
+    @staticmethod
+    def extract_terms(resp, keyword_relevance=0.7, concept_relevance=0.9):
+        """
+        Filter keywords and concepts of an analysis response by relevance;
+        return an object of keyword and concept texts.
+        """
         if not resp:
             return {"keywords": [], "concepts": []}
 
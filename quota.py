@@ -0,0 +1,166 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import requests
+
+from logger import logger
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+class QuotaExceededError(requests.RequestException):
+    """Raised instead of sending a request the quota budget cannot afford."""
+
+
+class QuotaLimiter:
+    """
+    Token buckets of upstream API quotas shared by every worker process
+    on this machine through a SQLite file; each acquire refills and spends
+    tokens in one immediate transaction, so workers never overspend.
+    buckets maps a bucket name to (requests per day, burst capacity).
+    """
+
+    def __init__(self, path, buckets, low_watermark=0.2):
+        self.path = path
+        self.buckets = dict(buckets)
+        self.low_watermark = low_watermark
+        self._local = threading.local()
+        self._setup()
+
+    def acquire(self, name, cost=1):
+        """
+        Spend cost tokens from bucket name if it has them;
+        return True if granted, otherwise return False.
+        Unknown buckets are not limited; a broken quota file grants every call.
+        """
+        if name not in self.buckets:
+            return True
+
+        try:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                tokens = self._refilled(db, name)
+                granted = tokens >= cost
+                db.execute(
+                    "UPDATE buckets SET tokens = ?, updated_at = ?, "
+                    "granted = granted + ?, denied = denied + ? WHERE name = ?",
+                    (tokens - cost if granted else tokens, time.time(),
+                     int(granted), int(not granted), name))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.error(f"Quota bucket {name}: {e}")
+            return True
+
+        return granted
+
+    def remaining(self, name):
+        """Return fraction of bucket name left, 1.0 for unknown buckets."""
+        if name not in self.buckets:
+            return 1.0
+        try:
+            tokens = self._refilled(self._connection(), name)
+        except sqlite3.Error as e:
+            logger.error(f"Quota bucket {name}: {e}")
+            return 1.0
+        return tokens / self.buckets[name][1]
+
+    def is_low(self, name):
+        """Return True if bucket name is below the low watermark."""
+        return self.remaining(name) < self.low_watermark
+
+    def report(self):
+        """Return a dictionary of bucket name to its budget and consumption."""
+        try:
+            rows = self._connection().execute(
+                "SELECT name, granted, denied FROM buckets").fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Quota report: {e}")
+            return {}
+
+        return {
+            name: {
+                "per_day": self.buckets[name][0],
+                "capacity": self.buckets[name][1],
+                "remaining": round(self.remaining(name), 4),
+                "granted": granted,
+                "denied": denied,
+            }
+            for name, granted, denied in rows if name in self.buckets
+        }
+
+    def reset(self):
+        """Refill every bucket and clear its counters."""
+        with self._connection() as db:
+            db.executemany(
+                "UPDATE buckets SET tokens = ?, updated_at = ?, "
+                "granted = 0, denied = 0 WHERE name = ?",
+                [(capacity, time.time(), name)
+                 for name, (_, capacity) in self.buckets.items()])
+
+    def _refilled(self, db, name):
+        """Return tokens of bucket name as of now."""
+        tokens, updated_at = db.execute(
+            "SELECT tokens, updated_at FROM buckets WHERE name = ?", (name,)
+        ).fetchone()
+        per_day, capacity = self.buckets[name]
+        elapsed = max(time.time() - updated_at, 0)
+        return min(capacity, tokens + elapsed * per_day / SECONDS_PER_DAY)
+
+    def _connection(self):
+        """Return the SQLite connection of this thread; reopened after a fork."""
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            self._local.db = sqlite3.connect(
+                self.path, timeout=1.0, isolation_level=None)
+            self._local.pid = pid
+        return self._local.db
+
+    def _setup(self):
+        with self._connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "name TEXT PRIMARY KEY, tokens REAL NOT NULL, "
+                "updated_at REAL NOT NULL, granted INTEGER NOT NULL DEFAULT 0, "
+                "denied INTEGER NOT NULL DEFAULT 0)")
+            db.executemany(
+                "INSERT OR IGNORE INTO buckets (name, tokens, updated_at) "
+                "VALUES (?, ?, ?)",
+                [(name, capacity, time.time())
+                 for name, (_, capacity) in self.buckets.items()])
+            # a smaller capacity takes effect right away
+            db.executemany(
+                "UPDATE buckets SET tokens = MIN(tokens, ?) WHERE name = ?",
+                [(capacity, name) for name, (_, capacity) in self.buckets.items()])
+
+    @classmethod
+    def from_env(cls):
+        """
+        Return a limiter configured by QUOTA_* environment variables, e.g.
+        QUOTA_HEADLINES_PER_DAY and QUOTA_HEADLINES_BURST.
+        """
+        defaults = {
+            "headlines": (1000, 100),
+            "articles": (1000, 100),
+            "analytics": (1000, 50),
+        }
+        buckets = {
+            name: (
+                float(os.environ.get(f"QUOTA_{name.upper()}_PER_DAY", per_day)),
+                float(os.environ.get(f"QUOTA_{name.upper()}_BURST", burst)),
+            )
+            for name, (per_day, burst) in defaults.items()
+        }
+        return cls(
+            os.environ.get(
+                "QUOTA_DB_PATH",
+                os.path.join(tempfile.gettempdir(), "newsmart-quota.sqlite3")),
+            buckets,
+            low_watermark=float(os.environ.get("QUOTA_LOW_WATERMARK", 0.2)),
+        )
@@ -0,0 +1,93 @@
+import threading
+
+from base_api_session import MAX_TIMEOUT
+from logger import logger
+from models import Saves, UserRecommendation, db
+from workers import BackgroundWorker
+
+
+class RecommendationRefresher(BackgroundWorker):
+    """
+    Rebuild stored recommendation feeds in a background thread.
+    Feeds marked stale by bookmark changes are refreshed first, then feeds
+    older than max_age seconds; every process may poll the same table
+    since claiming a feed skips the ones claimed by other workers.
+    """
+    thread_name = "recommendation-refresher"
+
+    def __init__(self, app, newsmart, max_age=1800, poll_interval=60,
+                 batch_size=8, lease=300, timeout=MAX_TIMEOUT):
+        super().__init__(app)
+        self.newsmart = newsmart
+        self.max_age = max_age
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.lease = lease
+        self.timeout = timeout
+        self._wakeup = threading.Event()
+
+    def enabled(self):
+        return self.poll_interval > 0
+
+    def notify(self):
+        """Wake up the refresher after a feed was marked stale."""
+        self._wakeup.set()
+
+    def run_pending(self):
+        """
+        Claim and refresh due feeds in the calling thread until none are left;
+        return number of feeds refreshed.
+        """
+        count = 0
+        with self._app_context():
+            while True:
+                claimed = UserRecommendation.claim_due(
+                    self.max_age, self.lease, self.batch_size)
+                if not claimed:
+                    return count
+                for user_id, version in claimed:
+                    count += self.refresh(user_id, version)
+
+    def refresh(self, user_id, version):
+        """
+        Rebuild and store the feed of user as of version;
+        return True if successful, otherwise return False.
+        A feed whose searches all failed keeps its articles and is retried
+        once its claim expires.
+        """
+        with self._app_context():
+            try:
+                articles = self.newsmart.build_recommended_articles(
+                    user_id, self.timeout)
+            except Exception as e:
+                logger.error(f"Recommendations for user {user_id} failed: {e}")
+                db.session.rollback()
+                return False
+            if articles is None:
+                logger.warning(f"Recommendations for user {user_id} unavailable.")
+                return False
+            return UserRecommendation.store(user_id, articles, version)
+
+    def mark_all_stale(self):
+        """
+        Queue feeds of every user with bookmarks for refresh and commit to db;
+        return number of feeds queued.
+        """
+        with self._app_context():
+            user_ids = [
+                user_id for user_id, in
+                db.session.query(Saves.user_id).distinct()
+            ]
+            for user_id in user_ids:
+                UserRecommendation.mark_stale(user_id)
+            db.session.commit()
+        return len(user_ids)
+
+    def _poll(self):
+        while True:
+            try:
+                self.run_pending()
+            except Exception as e:
+                logger.error(f"Recommendation refresher: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
@@ -0,0 +1,113 @@
+import asyncio
+import random
+import threading
+import time
+
+import requests
+
+from circuit_breaker import CircuitBreaker
+
+
+class RetryBudget:
+    """
+    Cap retries to a fraction of traffic: every call deposits ratio of a
+    token and every retry withdraws a whole one, so retries never exceed
+    about ratio of all calls beyond a small reserve for quiet periods.
+    """
+
+    def __init__(self, ratio=0.1, reserve=10):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.retries = 0
+        self.exhausted = 0
+        self._balance = float(reserve)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._balance = min(self.reserve, self._balance + self.ratio)
+
+    def withdraw(self):
+        """Return True if a retry is affordable, spending it; otherwise False."""
+        with self._lock:
+            if self._balance < 1:
+                self.exhausted += 1
+                return False
+            self._balance -= 1
+            self.retries += 1
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "balance": round(self._balance, 2),
+                "retries": self.retries,
+                "exhausted": self.exhausted,
+            }
+
+
+class RetryPolicy:
+    """
+    Retry failed calls up to retries times with full-jitter exponential
+    backoff, as long as the retry budget allows and the backoff and next
+    attempt fit in the caller's deadline.
+    """
+
+    def __init__(self, retries=2, base_delay=0.1, max_delay=1.0, budget=None):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = RetryBudget() if budget is None else budget
+
+    def call(self, attempt, timeout, retryable):
+        """
+        Return result of attempt(timeout=remaining), retrying errors for which
+        retryable(error) is True; raise the last error once out of retries,
+        budget or time.
+        """
+        deadline = time.monotonic() + timeout
+        self.budget.deposit()
+        for retry in range(self.retries + 1):
+            try:
+                return attempt(timeout=max(deadline - time.monotonic(), 0.001))
+            except Exception as e:
+                delay = self.backoff(retry)
+                # leave the next attempt at least as long as the backoff
+                if (retry == self.retries or not retryable(e)
+                        or time.monotonic() + 2 * delay >= deadline
+                        or not self.budget.withdraw()):
+                    raise
+            time.sleep(delay)
+
+    async def call_async(self, attempt, timeout, retryable):
+        """Coroutine counterpart of call; attempt is a coroutine function."""
+        deadline = time.monotonic() + timeout
+        self.budget.deposit()
+        for retry in range(self.retries + 1):
+            try:
+                return await attempt(timeout=max(deadline - time.monotonic(), 0.001))
+            except Exception as e:
+                delay = self.backoff(retry)
+                # leave the next attempt at least as long as the backoff
+                if (retry == self.retries or not retryable(e)
+                        or time.monotonic() + 2 * delay >= deadline
+                        or not self.budget.withdraw()):
+                    raise
+            await asyncio.sleep(delay)
+
+    def backoff(self, retry):
+        """Return a random delay before the retry after attempt number retry."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    @staticmethod
+    def is_transient(error):
+        """Return True if an idempotent call failing with error may succeed again."""
+        return CircuitBreaker.is_failure(error)
+
+    @staticmethod
+    def is_connection_error(error):
+        """
+        Return True if error is a connection-level failure, e.g. a refused
+        or reset connection, rather than a slow or failed response.
+        """
+        return isinstance(error, requests.ConnectionError)
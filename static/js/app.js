@@ -6,6 +6,7 @@ $(function (){
   const $categoryForm = $('#category-form');
   const $categoryBtn = $('#category-btn');
   const $bookmarkDiv = $('#saved-articles');
+  const $feedAreas = $('.load-more-area[data-feed-url]');
   const newsmart = new NewSmartSession();
   
   console.log('CONNECTED');
@@ -15,6 +16,13 @@ $(function (){
   $relatedDiv.on("click", "a.btn-bookmark", bookmarkHandler);
   $searchDiv.on("click", "a.btn-bookmark", bookmarkHandler);
   $categoryForm.on("submit", putCategoryHandler);
+  // pages ship the first page of a feed; later pages load on demand
+  $feedAreas.each(function () {
+    const $area = $(this);
+    if ($area.attr('data-cursor')) {
+      $area.find('.loadmore').addClass('active').on('click', loadFeedHandler);
+    }
+  });
   $categoryForm.on("click", ".category-check", function() {
     // revert submit button back
     $categoryBtn.removeClass('btn-success').addClass('btn-primary');
@@ -50,6 +58,89 @@ $(function (){
     $categoryBtn.removeClass('btn-primary').addClass('btn-success');
   }
 
+  async function loadFeedHandler(event) {
+    event.preventDefault();
+    const $this = $(this);
+    const $area = $this.closest('.load-more-area');
+    if ($this.hasClass('disabled')) {
+      return;
+    }
+    $this.addClass('disabled');   // disable button while loading
+
+    const page = await newsmart.getFeedPage(
+      $area.attr('data-feed-url'), $area.attr('data-cursor'), $area.attr('data-fields')
+    );
+    if (page) {
+      const $target = $($area.attr('data-target'));
+      for (const article of page.articles) {
+        $('<div>').addClass($area.attr('data-column'))
+          .append(renderArticle(article, $area.attr('data-style'), page.bookmarks))
+          .hide().appendTo($target).fadeIn(600);
+      }
+      $area.attr('data-cursor', page.cursor || '');
+      if (!page.cursor) {
+        $this.removeClass('active').off('click', loadFeedHandler);
+        $area.find('.no-posts').addClass('active');
+      }
+    }
+    $this.removeClass('disabled');
+  }
+
+  function renderArticle(article, style, bookmarks) {
+    // mirrors templates/articles/article_base.html; bookmarks is only
+    // present for logged-in users
+    const source = article.source ? article.source.name : '';
+    const timestamp = article.publishedAt || '';
+    const $article = $('<article>')
+      .addClass(`post hentry ${style === 'grid' ? 'post-grid' : 'post-list'}`)
+      .attr({
+        'data-title': article.title, 'data-content': article.content || '',
+        'data-url': article.url, 'data-source': source,
+        'data-summary': article.description || '',
+        'data-img-url': article.urlToImage || '', 'data-timestamp': timestamp
+      });
+
+    const $figure = $('<figure>').addClass('thumb-wrap').append(
+      $('<a>').attr('href', article.url).append(
+        $('<img>').attr({src: article.urlToImage || '/static/images/question-mark.jpg', alt: 'post'})
+      )
+    );
+    if (bookmarks) {
+      const bookmarkId = bookmarks[article.url];
+      const $bookmark = $('<a>').addClass('trending btn-bookmark').attr('href', '#');
+      if (bookmarkId) {
+        $bookmark.attr('data-bookmark-id', bookmarkId)
+          .append('<span class="fas fa-bookmark"></span>');
+      } else {
+        $bookmark.append('<span class="far fa-bookmark"></span>');
+      }
+      $figure.append($('<div>').addClass('featured-badge-list').append($bookmark));
+    }
+
+    const $wrap = $('<div>').addClass('content-entry-wrap').append(
+      $('<div>').addClass('entry-content').append(
+        $('<h3>').addClass('entry-title').append(
+          $('<a>').attr('href', article.url).text(article.title)
+        )
+      ),
+      $('<div>').addClass('entry-meta-content').append(
+        $('<div>').addClass('entry-date').append(
+          $('<span>').text(timestamp.replace('T', ' ').replace('Z', ' UTC'))
+        ),
+        $('<div>').addClass('entry-meta-author').append(
+          $('<div>').addClass('entry-author-name').append($('<span>').text(source))
+        )
+      )
+    );
+    if (style !== 'grid') {
+      $wrap.append($('<div>').addClass('entry-summary').append(
+        $('<p>').text(article.description || '')
+      ));
+    }
+
+    return $article.append($('<div>').addClass('entry-thumb').append($figure), $wrap);
+  }
+
   async function bookmarkHandler(event) {
     event.preventDefault();
     const $this = $(this);
@@ -59,9 +150,12 @@ $(function (){
     if (typeof hasBookmarked !== typeof undefined && hasBookmarked !== false) {
       const bookmark = await newsmart.removeBookmark($this.attr('data-bookmark-id'));
 
-      $this.empty();  // remove bookmark icon
-      // update bookmark icon
-      $this.removeAttr('data-bookmark-id').append('<span class="far fa-bookmark"></span>');
+      // keep bookmark icon if removal failed
+      if (bookmark) {
+        $this.empty();  // remove bookmark icon
+        // update bookmark icon
+        $this.removeAttr('data-bookmark-id').append('<span class="far fa-bookmark"></span>');
+      }
     } else {
       $this.empty();    // remove bookmark icon
       // add spinner
@@ -77,47 +171,25 @@ $(function (){
       );
       
       $this.empty();    // remove spinner
-      // update bookmark icon
-      $this.attr('data-bookmark-id', bookmark.id).append('<span class="fas fa-bookmark"></span>');
+      // update bookmark icon; restore it if saving failed
+      if (bookmark) {
+        $this.attr('data-bookmark-id', bookmark.id).append('<span class="fas fa-bookmark"></span>');
+      } else {
+        $this.append('<span class="far fa-bookmark"></span>');
+      }
     }
     // enable button
     $this.removeClass('disabled');
   }
 
-  async function addArticleAndTags(title, summary, content, url, img_url, source, timestamp) {
-    const savedArticle = await newsmart.getArticle(url);
-    // check if article url exists in db
-    if (!savedArticle) {
-      // save article
-      const articleRequest = newsmart.saveArticle(
-        title, summary, content, url, img_url, source, timestamp
-      );
-
-      // extract and save tags
-      const tagsRequest = newsmart.saveTags(url);
-
-      // join the two requests
-      const [article, tags] = await Promise.all([articleRequest, tagsRequest]);
-
-      // create article-tag associations
-      for (const tag of tags) {
-        await newsmart.saveArticleTagLink(article.id, tag.id);
-      }
-      
-      return article;
-    }
-
-    return savedArticle;
-  }
-
   async function addBookmark(title, summary, content, url, img_url, source, timestamp) {
-    const savedArticle = await addArticleAndTags(
+    // article, bookmark and tags are saved in one request;
+    // tags are extracted in the background
+    const result = await newsmart.saveArticleBookmark(
       title, summary, content, url, img_url, source, timestamp
     );
-
-    // save bookmark
-    const bookmark = await newsmart.saveBookmark(savedArticle.id);
-    return bookmark;
+    // failed requests resolve to null
+    return result ? result.bookmark : null;
   }
 
 });
\ No newline at end of file
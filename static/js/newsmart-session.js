@@ -2,6 +2,7 @@ class NewSmartSession {
   constructor() {
     this.articlesUrl = "/api/articles";
     this.savesUrl = "/api/saves";
+    this.bookmarksUrl = "/api/bookmarks";
     this.tagsUrl = "/api/tags";
     this.articleTagUrl = "/api/articletag";
     this.userCategoryUrl = "/api/usercategory"
@@ -52,6 +53,26 @@ class NewSmartSession {
     return null;
   }
 
+  async saveArticleBookmark(title, summary, content, url, img_url, source, timestamp,
+                            deferTags = true) {
+    // save article, bookmark and tags in one request
+    try {
+      const data = {title, summary, content, url, img_url, source, timestamp};
+      Object.keys(data).forEach(function (key) {
+        if (!data[key]) {
+          delete data[key];
+        }
+      });
+      const response = await axios.post(this.bookmarksUrl, {
+        ...data, defer_tags: deferTags
+      });
+      return response.data;
+    } catch (error) {
+      axiosErrorHandler(error);
+    }
+    return null;
+  }
+
   async removeBookmark(bookmarkId) {
     try {
       const response = await axios.delete(`${this.savesUrl}/${bookmarkId}`);
@@ -85,6 +106,24 @@ class NewSmartSession {
     return null;
   }
 
+  async getFeedPage(feedUrl, cursor, fields, limit = 10) {
+    // feedUrl may already carry query parameters, e.g. q for search
+    try {
+      const params = {limit};
+      if (cursor) {
+        params.cursor = cursor;
+      }
+      if (fields) {
+        params.fields = fields;
+      }
+      const response = await axios.get(feedUrl, {params});
+      return response.data;
+    } catch (error) {
+      axiosErrorHandler(error);
+    }
+    return null;
+  }
+
   async updateUserCategories(categoryIds) {
     try {
       const response = await axios.put(this.userCategoryUrl, { category_ids: categoryIds });
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy.exc import SQLAlchemyError
+
+from logger import logger
+from models import ArticleTag, db
+
+
+class TagIndex:
+    """
+    In-memory sparse article-by-tag matrix over stored articles for
+    content-based recommendations without external calls.
+    Rows are tf-idf weighted and L2-normalized so a matrix-vector product
+    scores every article by cosine similarity in one step.
+    Tags linked in this process are added incrementally; links made by
+    other processes are picked up by a full reload every rebuild_interval
+    seconds.
+    """
+
+    def __init__(self, rebuild_interval=600):
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.Lock()
+        self._tags = dict()         # article id -> set of tag ids
+        self._loaded_at = None
+        self._matrix = None
+        self._article_ids = None    # row -> article id
+        self._rows = None           # article id -> row
+
+    def load(self):
+        """
+        Reload every article-tag association from db;
+        return True if successful, otherwise return False.
+        """
+        try:
+            pairs = db.session.query(ArticleTag.article_id, ArticleTag.tag_id).all()
+        except SQLAlchemyError:
+            logger.critical("Failed to load article tags for tag index on database.")
+            db.session.rollback()
+            return False
+
+        tags = dict()
+        for article_id, tag_id in pairs:
+            tags.setdefault(article_id, set()).add(tag_id)
+
+        with self._lock:
+            self._tags = tags
+            self._matrix = None
+            self._loaded_at = time.monotonic()
+        return True
+
+    def add(self, article_id, tag_ids):
+        """Add tags linked to article; the matrix is rebuilt on next query."""
+        if not tag_ids:
+            return
+        with self._lock:
+            self._tags.setdefault(article_id, set()).update(tag_ids)
+            self._matrix = None
+
+    def similar(self, article_ids, limit=12, exclude=()):
+        """
+        Return a list of (article id, score) tuples of up to limit articles
+        most similar to the given articles, best first; articles in
+        article_ids or exclude and articles sharing no tags are left out.
+        """
+        self._ensure_loaded()
+        matrix, ids, rows = self._state()
+        profile_rows = [rows[article_id] for article_id in article_ids
+                        if article_id in rows]
+        if not profile_rows or limit < 1:
+            return []
+
+        profile = np.asarray(matrix[profile_rows].sum(axis=0)).ravel()
+        norm = np.linalg.norm(profile)
+        if not norm:
+            return []
+        scores = matrix @ (profile / norm)
+
+        skipped = [rows[article_id] for article_id in (*article_ids, *exclude)
+                   if article_id in rows]
+        scores[skipped] = 0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(ids[row]), float(scores[row])) for row in candidates]
+
+    def _ensure_loaded(self):
+        if (self._loaded_at is None
+                or time.monotonic() - self._loaded_at > self.rebuild_interval):
+            self.load()
+
+    def _state(self):
+        """Return (matrix, row to article id, article id to row), rebuilt if needed."""
+        with self._lock:
+            if self._matrix is None:
+                self._build()
+            return self._matrix, self._article_ids, self._rows
+
+    def _build(self):
+        # caller holds the lock
+        if not self._tags:
+            self._matrix = sparse.csr_matrix((0, 0))
+            self._article_ids, self._rows = np.empty(0, dtype=np.int64), dict()
+            return
+
+        article_ids = np.fromiter(sorted(self._tags), dtype=np.int64,
+                                  count=len(self._tags))
+        columns = dict()
+        row_index, col_index = [], []
+        for row, article_id in enumerate(article_ids):
+            for tag_id in self._tags[article_id]:
+                row_index.append(row)
+                col_index.append(columns.setdefault(tag_id, len(columns)))
+
+        shape = (len(article_ids), len(columns))
+        matrix = sparse.csr_matrix(
+            (np.ones(len(row_index)), (row_index, col_index)), shape=shape)
+
+        # rare tags say more about an article than common ones
+        frequency = np.bincount(col_index, minlength=shape[1])
+        idf = np.log((1 + shape[0]) / (1 + frequency)) + 1
+        matrix = matrix @ sparse.diags(idf)
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        self._matrix = sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+        self._article_ids = article_ids
+        self._rows = {int(article_id): row for row, article_id in enumerate(article_ids)}
@@ -0,0 +1,105 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from logger import logger
+from models import TagJob
+from workers import BackgroundWorker
+
+
+class TagJobWorker(BackgroundWorker):
+    """
+    Run queued tag extraction jobs from the tag_jobs table on a background pool.
+    Every process may poll the same table; claiming a job skips rows locked
+    by other workers, and queued jobs are picked up again after a restart.
+    """
+    thread_name = "tag-job-poller"
+
+    def __init__(self, app, newsmart, max_workers=2, poll_interval=5,
+                 stale_after=300, max_attempts=3, retry_delay=60):
+        super().__init__(app)
+        self.newsmart = newsmart
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._wakeup = threading.Event()
+        self._slots = threading.Semaphore(max_workers)
+
+    def enabled(self):
+        return self.max_workers >= 1
+
+    def notify(self):
+        """Wake up the poller after a job was queued."""
+        self._wakeup.set()
+
+    def run_pending(self):
+        """
+        Claim and run queued jobs in the calling thread until none are left;
+        return number of jobs run.
+        """
+        count = 0
+        with self._app_context():
+            while True:
+                job_id = TagJob.claim()
+                if job_id is None:
+                    return count
+                self.run_job(job_id)
+                count += 1
+
+    def run_job(self, job_id):
+        """
+        Extract and save tags for a claimed job, link them to the job's
+        article if any, and record the outcome on the job.
+        A failed analysis puts the job back in the queue, to be retried
+        after retry_delay seconds, doubled per attempt, until it runs out
+        of attempts.
+        """
+        with self._app_context():
+            job = TagJob.query.get(job_id)
+            try:
+                terms_map = self.newsmart.get_relevant_terms(job.article_url)
+                if terms_map is None:
+                    logger.warning(f"Tag job {job_id}: analysis failed.")
+                    job.retry("Failed to analyze article.", self.max_attempts,
+                              self.retry_delay)
+                    return
+                tags = self.newsmart.save_tags(terms_map)
+                if tags is None:
+                    raise RuntimeError("Failed to save tags.")
+                if job.article_id and not self.newsmart.link_tags(
+                        job.article_id, [tag['id'] for tag in tags]):
+                    raise RuntimeError("Failed to link tags to article.")
+            except Exception as e:
+                logger.error(f"Tag job {job_id} failed: {e}")
+                job.finish("failed", error=str(e))
+                return
+            job.finish("done", tags=tags)
+
+    def _poll(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="tag-job")
+        while True:
+            try:
+                self._dispatch()
+            except Exception as e:
+                logger.error(f"Tag job poller: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _dispatch(self):
+        """Claim queued jobs while the pool has free workers."""
+        with self.app.app_context():
+            TagJob.requeue_stale(self.stale_after, self.max_attempts)
+            while self._slots.acquire(blocking=False):
+                job_id = TagJob.claim()
+                if job_id is None:
+                    self._slots.release()
+                    return
+                future = self._executor.submit(self.run_job, job_id)
+                future.add_done_callback(self._job_done)
+
+    def _job_done(self, future):
+        # free the slot and look for more queued jobs right away
+        self._slots.release()
+        self._wakeup.set()
@@ -0,0 +1,155 @@
+"""One-shot bookmark API tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/api/test_bookmarks_api.py
+#   python -m unittest discover tests/api/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import os
+import copy
+import datetime
+import logging
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+
+from circuit_breaker import CircuitBreaker
+from util import CURR_USER_KEY
+
+# BEFORE we import our app, let's set an environmental variable
+# to use a different database for tests (we need to do this
+# before we import our app, since that will have already
+# connected to the database
+os.environ['DATABASE_URL'] = "postgresql:///newsmart-test"
+
+# Now we can import app
+from app import app, newsmart, url_validator
+from models import Article, Saves, Tag, TagJob, User, db
+from newsmart import NewSmart
+
+# Create our tables (we do this here, so we only create the tables
+# once for all tests --- in each test, we'll delete the data
+# and create fresh new clean test data
+
+db.create_all()
+
+app.testing = True
+
+logging.disable(logging.CRITICAL)   # Disable logging
+
+TERMS = {"keywords": ["Batman", "Gotham"], "concepts": ["Superhero"]}
+
+
+class BookmarksApiTestCase(TestCase):
+
+    def setUp(self):
+        """Create test client, add sample data."""
+
+        Tag.query.delete()
+        Tag.id_cache.clear()
+        url_validator.hosts.clear()
+        Article.query.delete()
+        User.query.delete()
+
+        user = User.register(
+            "test", "raw_password", "test@test.com",
+            "Test", "User"
+        )
+
+        # keep track of id reference instead of db reference
+        # db session may get refreshed after modifying session...
+        self.user_id = user.id
+        self.json = {
+            "title": "Test Article",
+            "summary": "Short summary",
+            "content": "Some content",
+            "url": "http://www.test.com",
+            "source": "Google-News",
+            "img_url": "https://source.unsplash.com/daily",
+            "timestamp": datetime.datetime.today().isoformat(),
+        }
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def post_bookmark(self, json):
+        with app.test_client() as client:
+            with client.session_transaction() as sess:
+                sess[CURR_USER_KEY] = self.user_id
+            return client.post("/api/bookmarks", json=json)
+
+    @patch.object(newsmart, "check_url", return_value=True)
+    def test_create_bookmark(self, check_url):
+        with patch.object(newsmart, "get_relevant_terms", return_value=TERMS):
+            resp = self.post_bookmark(self.json)
+
+        self.assertEqual(resp.status_code, 201)
+        self.assertTrue(resp.is_json)
+        json_resp = resp.get_json()
+        article_id = json_resp['article'].pop('id')
+        self.assertDictEqual(self.json, json_resp['article'])
+        self.assertEqual(json_resp['bookmark']['article_id'], article_id)
+        self.assertEqual(json_resp['bookmark']['user_id'], self.user_id)
+        self.assertEqual(
+            sorted(tag['keyword'] for tag in json_resp['tags']),
+            ["Batman", "Gotham", "Superhero"]
+        )
+        self.assertIsNone(json_resp['job'])
+        self.assertEqual(
+            Saves.query.filter(Saves.user_id == self.user_id).count(), 1)
+
+        with self.subTest("Bookmark already exists"):
+            with patch.object(newsmart, "get_relevant_terms") as get_relevant_terms:
+                resp = self.post_bookmark(self.json)
+                # tags of existing article are reused
+                get_relevant_terms.assert_not_called()
+
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.get_json()['article']['id'], article_id)
+            self.assertEqual(resp.get_json()['bookmark'], json_resp['bookmark'])
+            self.assertEqual(len(resp.get_json()['tags']), 3)
+
+    @patch.object(newsmart, "check_url", return_value=True)
+    def test_create_bookmark_nlu_circuit_open(self, check_url):
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+        with self.assertRaises(requests.ConnectionError):
+            with breaker.guard(newsmart.analytics_url):
+                raise requests.ConnectionError("down")
+
+        with patch.object(NewSmart, "circuit_breaker", breaker), \
+                patch.object(newsmart.http, "request") as post:
+            resp = self.post_bookmark(self.json)
+        post.assert_not_called()
+
+        # bookmarked without tags instead of failing
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.get_json()['tags'], [])
+
+    @patch.object(newsmart, "check_url", return_value=True)
+    def test_create_bookmark_defer_tags(self, check_url):
+        with patch.object(newsmart, "get_relevant_terms") as get_relevant_terms:
+            resp = self.post_bookmark({**self.json, "defer_tags": True})
+            get_relevant_terms.assert_not_called()
+
+        self.assertEqual(resp.status_code, 201)
+        json_resp = resp.get_json()
+        self.assertEqual(json_resp['tags'], [])
+        self.assertEqual(json_resp['job']['status'], "queued")
+        self.assertEqual(json_resp['job']['article_id'], json_resp['article']['id'])
+        self.assertEqual(TagJob.query.count(), 1)
+
+    @patch.object(newsmart, "check_url", return_value=True)
+    def test_create_bookmark_invalid(self, check_url):
+        for key in ("title", "content", "url", "source"):
+            temp = copy.deepcopy(self.json)
+            del temp[key]   # remove one of the parameter
+
+            with self.subTest(f"Missing {key}"):
+                resp = self.post_bookmark(temp)
+
+                self.assertEqual(resp.status_code, 400)
+                self.assertTrue(resp.is_json)
+                self.assertIn(key, resp.get_json()['errors'])
+
+        self.assertEqual(Article.query.count(), 0)
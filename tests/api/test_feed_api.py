@@ -0,0 +1,195 @@
+"""Feed API tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/api/test_feed_api.py
+#   python -m unittest discover tests/api/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import os
+import logging
+from unittest import TestCase
+from unittest.mock import patch
+
+from util import CURR_USER_KEY
+
+# BEFORE we import our app, let's set an environmental variable
+# to use a different database for tests (we need to do this
+# before we import our app, since that will have already
+# connected to the database
+os.environ['DATABASE_URL'] = "postgresql:///newsmart-test"
+
+# Now we can import app
+from app import app, newsmart
+from feed import decode_cursor, encode_cursor, paginate
+from models import Article, Saves, User, db
+
+# Create our tables (we do this here, so we only create the tables
+# once for all tests --- in each test, we'll delete the data
+# and create fresh new clean test data
+
+db.create_all()
+
+app.testing = True
+
+logging.disable(logging.CRITICAL)   # Disable logging
+
+
+def make_articles(count):
+    """Return count News API articles, newest first."""
+    return [
+        {
+            "source": {"id": None, "name": "Test"},
+            "author": None,
+            "title": f"Article {index}",
+            "description": f"Summary {index}",
+            "url": f"http://www.test.com/{index}",
+            "urlToImage": None,
+            "publishedAt": f"2020-05-{30 - index:02d}T12:00:00Z",
+            "content": f"Content {index}",
+        }
+        for index in range(count)
+    ]
+
+
+class FeedApiTestCase(TestCase):
+
+    def setUp(self):
+        """Create test client, add sample data."""
+
+        Article.query.delete()
+        User.query.delete()
+        newsmart.search_results.clear()
+
+        user = User.register(
+            "test", "raw_password", "test@test.com",
+            "Test", "User"
+        )
+        # keep track of id reference instead of db reference
+        self.user_id = user.id
+        self.articles = make_articles(12)
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def get_feed(self, url, user_id=None):
+        with app.test_client() as client:
+            if user_id:
+                with client.session_transaction() as sess:
+                    sess[CURR_USER_KEY] = user_id
+            return client.get(url)
+
+    def test_pages_follow_cursor(self):
+        with patch.object(newsmart, "get_top_articles", return_value=self.articles):
+            resp = self.get_feed("/api/feed/top?limit=5")
+            self.assertEqual(resp.status_code, 200)
+            first = resp.json
+            resp = self.get_feed(f"/api/feed/top?limit=5&cursor={first['cursor']}")
+            second = resp.json
+            resp = self.get_feed(f"/api/feed/top?limit=5&cursor={second['cursor']}")
+            third = resp.json
+
+        urls = [article['url']
+                for page in (first, second, third) for article in page['articles']]
+        self.assertEqual(urls, [article['url'] for article in self.articles])
+        self.assertIsNone(third['cursor'])
+        self.assertNotIn("bookmarks", first)
+
+    def test_cursor_survives_new_articles(self):
+        first, cursor = paginate(self.articles, limit=5)
+        # two fresh headlines arrive before the next page is asked for
+        shifted = make_articles(2) + self.articles
+        for article in shifted[:2]:
+            article['url'] += "/new"
+        with patch.object(newsmart, "get_top_articles", return_value=shifted):
+            resp = self.get_feed(f"/api/feed/sports?limit=5&cursor={cursor}")
+
+        self.assertEqual([article['url'] for article in resp.json['articles']],
+                         [article['url'] for article in self.articles[5:10]])
+
+    def test_cursor_of_dropped_article(self):
+        cursor = encode_cursor(self.articles[4], 4)
+        self.assertEqual(decode_cursor(cursor),
+                         (self.articles[4]['publishedAt'], self.articles[4]['url'], 4))
+
+        remaining = self.articles[:4] + self.articles[6:]
+        page, _ = paginate(remaining, cursor, limit=3)
+        self.assertEqual(page, self.articles[6:9])
+
+        with self.subTest("Ranked feed resumes at position"):
+            # ranked articles are not in date order
+            ranked = self.articles[::-1]
+            cursor = encode_cursor(ranked[4], 4)
+            remaining = ranked[:4] + ranked[5:]
+            page, _ = paginate(remaining, cursor, limit=3, by_date=False)
+            self.assertEqual(page, ranked[5:8])
+
+    def test_dropped_article_per_section(self):
+        # articles 8 to 11 first, then 0 to 7: date order broken after the
+        # first page, as when search appends newsapi.org hits to local ones
+        ranked = self.articles[8:] + self.articles[:8]
+        sections = {
+            "top": ("get_top_articles", self.articles),
+            "sports": ("get_top_articles", self.articles),
+            "search": ("search", ranked),
+            "related": ("get_feed", ranked),
+        }
+        for section, (method, articles) in sections.items():
+            with self.subTest(section):
+                query = "q=test&" if section == "search" else ""
+                with patch.object(newsmart, method, return_value=articles):
+                    first = self.get_feed(
+                        f"/api/feed/{section}?{query}limit=4", self.user_id).json
+                # last article of the first page leaves the feed
+                remaining = articles[:3] + articles[4:]
+                with patch.object(newsmart, method, return_value=remaining):
+                    second = self.get_feed(
+                        f"/api/feed/{section}?{query}limit=4&cursor={first['cursor']}",
+                        self.user_id).json
+
+                self.assertEqual(second['articles'], articles[4:8])
+
+    def test_sparse_fields(self):
+        with patch.object(newsmart, "get_top_articles", return_value=self.articles):
+            resp = self.get_feed("/api/feed/top?limit=2&fields=title,url")
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json['articles'][0],
+                         {"title": "Article 0", "url": "http://www.test.com/0"})
+
+    def test_bad_parameters(self):
+        with patch.object(newsmart, "get_top_articles", return_value=self.articles):
+            self.assertEqual(self.get_feed("/api/feed/top?fields=secret").status_code, 400)
+            self.assertEqual(self.get_feed("/api/feed/top?limit=500").status_code, 400)
+            self.assertEqual(self.get_feed("/api/feed/top?cursor=%%%").status_code, 400)
+        self.assertEqual(self.get_feed("/api/feed/unknown").status_code, 404)
+        self.assertEqual(self.get_feed("/api/feed/search").status_code, 400)
+        self.assertEqual(self.get_feed("/api/feed/related").status_code, 401)
+
+    def test_bookmarks_of_page(self):
+        article = Article.new(
+            "Article 1", "Content 1", self.articles[1]['url'], "Test")
+        bookmark = Saves.new(self.user_id, article.id)
+        bookmark_id = bookmark.id
+
+        with patch.object(newsmart, "get_top_articles", return_value=self.articles):
+            resp = self.get_feed("/api/feed/top?limit=3", self.user_id)
+
+        self.assertEqual(resp.json['bookmarks'], {self.articles[1]['url']: bookmark_id})
+
+    def test_search_feed(self):
+        with patch.object(newsmart, "search", return_value=self.articles) as search:
+            resp = self.get_feed("/api/feed/search?q=test&limit=4")
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json['articles']), 4)
+        self.assertEqual(search.call_args[0][0], "test")
+
+        with self.subTest("Later pages reuse the results"):
+            # newsapi.org hits would be merged in on a new search
+            with patch.object(newsmart, "search",
+                              return_value=self.articles[6:] + self.articles[:6]) as search:
+                resp = self.get_feed(
+                    f"/api/feed/search?q=test&limit=4&cursor={resp.json['cursor']}")
+
+            search.assert_not_called()
+            self.assertEqual(resp.json['articles'], self.articles[4:8])
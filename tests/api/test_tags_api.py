@@ -0,0 +1,205 @@
+"""Tags API tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/api/test_tags_api.py
+#   python -m unittest discover tests/api/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import os
+import datetime
+import logging
+from unittest import TestCase
+from unittest.mock import patch
+
+from util import CURR_USER_KEY
+
+# BEFORE we import our app, let's set an environmental variable
+# to use a different database for tests (we need to do this
+# before we import our app, since that will have already
+# connected to the database
+os.environ['DATABASE_URL'] = "postgresql:///newsmart-test"
+
+# Now we can import app
+from app import app, newsmart, tag_job_worker
+from models import Article, Tag, TagJob, User, db
+
+# Create our tables (we do this here, so we only create the tables
+# once for all tests --- in each test, we'll delete the data
+# and create fresh new clean test data
+
+db.create_all()
+
+app.testing = True
+
+logging.disable(logging.CRITICAL)   # Disable logging
+
+TERMS = {"keywords": ["Batman", "Gotham"], "concepts": ["Superhero"]}
+
+
+class TagsApiTestCase(TestCase):
+
+    def setUp(self):
+        """Create test client, add sample data."""
+
+        Tag.query.delete()
+        Tag.id_cache.clear()
+        Article.query.delete()
+        User.query.delete()
+
+        article = Article.new(
+            "Secret", "Bruce Wayne is the Batman",
+            "http://www.google.com",
+            "The Joker"
+        )
+        user = User.register(
+            "test", "raw_password", "test@test.com",
+            "Test", "User"
+        )
+
+        # keep track of id reference instead of db reference
+        # db session may get refreshed after modifying session...
+        self.article_id = article.id
+        self.article_url = article.url
+        self.user_id = user.id
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def test_create_tags(self):
+        with patch.object(newsmart, "get_relevant_terms", return_value=TERMS):
+            with app.test_client() as client:
+                with client.session_transaction() as sess:
+                    sess[CURR_USER_KEY] = self.user_id
+                resp = client.post("/api/tags", json={"article_url": self.article_url})
+
+        self.assertEqual(resp.status_code, 201)
+        self.assertTrue(resp.is_json)
+        self.assertEqual(
+            [tag['keyword'] for tag in resp.get_json()['tags']],
+            ["Superhero", "Batman", "Gotham"]
+        )
+
+        with self.subTest("Existing tags are returned"):
+            with patch.object(newsmart, "get_relevant_terms", return_value=TERMS):
+                with app.test_client() as client:
+                    with client.session_transaction() as sess:
+                        sess[CURR_USER_KEY] = self.user_id
+                    resp_again = client.post(
+                        "/api/tags", json={"article_url": self.article_url})
+
+            self.assertEqual(resp_again.status_code, 201)
+            self.assertEqual(resp_again.get_json()['tags'], resp.get_json()['tags'])
+            self.assertEqual(Tag.query.count(), 3)
+
+    def test_create_tags_job(self):
+        with app.test_client() as client:
+            with client.session_transaction() as sess:
+                sess[CURR_USER_KEY] = self.user_id
+            resp = client.post(
+                "/api/tags", query_string={"mode": "job"},
+                json={"article_url": self.article_url, "article_id": self.article_id}
+            )
+        self.assertEqual(resp.status_code, 202)
+        self.assertTrue(resp.is_json)
+        job = resp.get_json()['job']
+        self.assertEqual(job['status'], "queued")
+        self.assertEqual(job['article_id'], self.article_id)
+        self.assertIn(f"/api/tags/jobs/{job['id']}", resp.headers['Location'])
+
+        with patch.object(newsmart, "get_relevant_terms", return_value=TERMS):
+            self.assertEqual(tag_job_worker.run_pending(), 1)
+
+        with app.test_client() as client:
+            with client.session_transaction() as sess:
+                sess[CURR_USER_KEY] = self.user_id
+            resp = client.get(f"/api/tags/jobs/{job['id']}")
+        self.assertEqual(resp.status_code, 200)
+        job = resp.get_json()['job']
+        self.assertEqual(job['status'], "done")
+        self.assertEqual(
+            [tag['keyword'] for tag in job['tags']],
+            ["Superhero", "Batman", "Gotham"]
+        )
+        self.assertEqual(
+            sorted(tag.keyword for tag in Article.query.get(self.article_id).tags),
+            ["Batman", "Gotham", "Superhero"]
+        )
+
+        with self.subTest("Job of another user"):
+            other_id = User.register(
+                "other", "raw_password", "other@test.com", "Other", "User").id
+            with app.test_client() as client:
+                with client.session_transaction() as sess:
+                    sess[CURR_USER_KEY] = other_id
+                resp = client.get(f"/api/tags/jobs/{job['id']}")
+            self.assertEqual(resp.status_code, 404)
+
+        with self.subTest("Missing article_url"):
+            with app.test_client() as client:
+                with client.session_transaction() as sess:
+                    sess[CURR_USER_KEY] = self.user_id
+                resp = client.post("/api/tags", query_string={"mode": "job"}, json={})
+            self.assertEqual(resp.status_code, 400)
+            self.assertIn("article_url", resp.get_json()['errors'])
+
+    def test_failed_job(self):
+        job_id = TagJob.new(self.user_id, self.article_url).id
+
+        with patch.object(newsmart, "get_relevant_terms", side_effect=KeyError("keywords")):
+            tag_job_worker.run_pending()
+
+        job = TagJob.query.get(job_id)
+        self.assertEqual(job.status, "failed")
+        self.assertIsNotNone(job.error)
+
+    def run_retry_now(self, job_id):
+        """Make job due for its retry and run pending jobs."""
+        TagJob.query.filter_by(id=job_id).update(
+            {"run_after": datetime.datetime.utcnow()})
+        db.session.commit()
+        return tag_job_worker.run_pending()
+
+    def test_failed_analysis_is_retried(self):
+        job_id = TagJob.new(self.user_id, self.article_url).id
+
+        with patch.object(newsmart, "get_analysis", return_value=None):
+            self.assertEqual(tag_job_worker.run_pending(), 1)
+
+            # never recorded as done without tags, nor retried right away
+            job = TagJob.query.get(job_id)
+            self.assertEqual(job.status, "queued")
+            self.assertGreater(
+                job.run_after,
+                datetime.datetime.utcnow() + datetime.timedelta(
+                    seconds=tag_job_worker.retry_delay - 5))
+            self.assertIsNone(TagJob.claim())
+
+            with self.subTest("Out of attempts"):
+                while self.run_retry_now(job_id):
+                    pass
+                job = TagJob.query.get(job_id)
+                self.assertEqual(job.status, "failed")
+                self.assertEqual(job.attempts, tag_job_worker.max_attempts)
+                self.assertIsNone(job.tags)
+
+        with self.subTest("Analysis succeeds on a retry"):
+            job_id = TagJob.new(self.user_id, self.article_url).id
+            with patch.object(newsmart, "get_relevant_terms",
+                              side_effect=[None, TERMS]):
+                tag_job_worker.run_pending()
+                self.run_retry_now(job_id)
+
+            job = TagJob.query.get(job_id)
+            self.assertEqual(job.status, "done")
+            self.assertEqual(job.attempts, 2)
+            self.assertEqual(len(job.tags), 3)
+
+    def test_create_tags_failed_analysis(self):
+        with patch.object(newsmart, "get_analysis", return_value=None):
+            with app.test_client() as client:
+                with client.session_transaction() as sess:
+                    sess[CURR_USER_KEY] = self.user_id
+                resp = client.post("/api/tags", json={"article_url": self.article_url})
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(Tag.query.count(), 0)
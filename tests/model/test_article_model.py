@@ -20,7 +20,7 @@ os.environ['DATABASE_URL'] = "postgresql:///newsmart-test"
 
 # Now we can import app
 from app import app
-from models import User, Saves, Article, Tag, ArticleTag, db
+from models import DEFAULT_IMG_URL, User, Saves, Article, Tag, ArticleTag, db
 
 # Create our tables (we do this here, so we only create the tables
 # once for all tests --- in each test, we'll delete the data
@@ -128,3 +128,44 @@ class ArticleModelTestCase(TestCase):
                 "timestamp": self.article.timestamp.isoformat(),
             }
         )
+
+    def test_from_news_article(self):
+        article = Article.from_news_article({
+            "source": {"id": None, "name": "Gotham Times"},
+            "title": "Batman returns",
+            "description": "Short summary",
+            "content": None,
+            "url": "http://www.gotham.com",
+            "urlToImage": None,
+            "publishedAt": "2020-05-11T21:15:18Z",
+        })
+
+        self.assertDictEqual(article, {
+            "title": "Batman returns",
+            "summary": "Short summary",
+            "content": "Short summary",
+            "url": "http://www.gotham.com",
+            "source": "Gotham Times",
+            "img_url": DEFAULT_IMG_URL,
+            "timestamp": datetime.datetime(2020, 5, 11, 21, 15, 18),
+        })
+        self.assertIsNone(Article.from_news_article({"title": "No url"}))
+
+    def test_upsert_many(self):
+        articles = [
+            {"title": "Updated Article", "content": "Some content",
+             "url": self.article.url, "source": {"name": "Google-News"}},
+            {"title": "New Article", "url": "http://www.gotham.com"},
+            {"title": "Duplicate", "url": "http://www.gotham.com"},
+            {"title": "No url"},
+        ]
+        article_id = self.article.id
+
+        self.assertDictEqual(Article.upsert_many(articles),
+                             {"inserted": 1, "updated": 1})
+        self.assertEqual(Article.query.get(article_id).title, "Updated Article")
+        self.assertEqual(Article.query.count(), 2)
+
+        with self.subTest("Unchanged rows are left untouched"):
+            self.assertDictEqual(Article.upsert_many(articles),
+                                 {"inserted": 0, "updated": 0})
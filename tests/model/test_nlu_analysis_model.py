@@ -0,0 +1,92 @@
+"""NLU analysis model tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/model/test_nlu_analysis_model.py
+#   python -m unittest discover tests/model/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import os
+import datetime
+import logging
+from unittest import TestCase
+from unittest.mock import patch
+
+# BEFORE we import our app, let's set an environmental variable
+# to use a different database for tests (we need to do this
+# before we import our app, since that will have already
+# connected to the database
+os.environ['DATABASE_URL'] = "postgresql:///newsmart-test"
+
+# Now we can import app
+from app import app, newsmart
+from models import NLUAnalysis, db
+
+# Create our tables (we do this here, so we only create the tables
+# once for all tests --- in each test, we'll delete the data
+# and create fresh new clean test data
+
+db.create_all()
+
+app.testing = True
+
+logging.disable(logging.CRITICAL)   # Disable logging
+
+ANALYSIS = {
+    "keywords": [
+        {"text": "Batman", "relevance": 0.95},
+        {"text": "Gotham", "relevance": 0.5},
+    ],
+    "concepts": [
+        {"text": "Superhero", "relevance": 0.92},
+    ],
+}
+
+
+class NLUAnalysisModelTestCase(TestCase):
+
+    def setUp(self):
+        """Remove existing analyses"""
+
+        NLUAnalysis.query.delete()
+        db.session.commit()
+
+        self.url = "https://www.dc.com/batman"
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def test_lookup_save(self):
+        self.assertIsNone(NLUAnalysis.lookup(self.url, 5, "2019-07-12"))
+
+        self.assertTrue(NLUAnalysis.save(self.url, 5, "2019-07-12", ANALYSIS))
+        self.assertDictEqual(NLUAnalysis.lookup(self.url, 5, "2019-07-12"), ANALYSIS)
+
+        with self.subTest("Different analysis parameters"):
+            self.assertIsNone(NLUAnalysis.lookup(self.url, 10, "2019-07-12"))
+            self.assertIsNone(NLUAnalysis.lookup(self.url, 5, "2020-01-01"))
+
+        with self.subTest("Save refreshes existing analysis"):
+            self.assertTrue(NLUAnalysis.save(self.url, 5, "2019-07-12", {"keywords": []}))
+            self.assertDictEqual(NLUAnalysis.lookup(self.url, 5, "2019-07-12"),
+                                 {"keywords": []})
+            self.assertEqual(NLUAnalysis.query.count(), 1)
+
+    def test_lookup_max_age(self):
+        NLUAnalysis.save(self.url, 5, "2019-07-12", ANALYSIS)
+        analysis = NLUAnalysis.query.one()
+        analysis.timestamp = datetime.datetime.utcnow() - datetime.timedelta(hours=2)
+        db.session.commit()
+
+        self.assertIsNone(NLUAnalysis.lookup(self.url, 5, "2019-07-12", max_age=3600))
+        self.assertDictEqual(
+            NLUAnalysis.lookup(self.url, 5, "2019-07-12", max_age=3 * 3600), ANALYSIS)
+
+    def test_relevant_terms_use_store(self):
+        with patch.object(newsmart, "analyze_url", return_value=ANALYSIS) as analyze:
+            terms = newsmart.get_relevant_terms(f"{self.url}/?utm_source=feed")
+            # same article through a different link is served from the store
+            same_terms = newsmart.get_relevant_terms(self.url)
+
+        self.assertEqual(analyze.call_count, 1)
+        self.assertDictEqual(terms, {"keywords": ["Batman"], "concepts": ["Superhero"]})
+        self.assertDictEqual(terms, same_terms)
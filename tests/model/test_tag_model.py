@@ -39,6 +39,7 @@ class ArticleModelTestCase(TestCase):
         """Remove existing tables, create sample user"""
 
         Tag.query.delete()
+        Tag.id_cache.clear()
         Article.query.delete()
         # intermediate tables should have been removed due to on delete cascade
 
@@ -80,6 +81,20 @@ class ArticleModelTestCase(TestCase):
             dup_tag = Tag.new("DC")
             self.assertIsNone(dup_tag)
 
+    def test_get_or_create_many_method(self):
+        tag_ids = Tag.get_or_create_many(["DC", "testing", "DC", "x" * 33])
+
+        # duplicates and keywords too long for the column are skipped
+        self.assertEqual(list(tag_ids), ["DC", "testing"])
+        self.assertEqual(tag_ids["testing"], self.tag.id)
+        self.assertEqual(tag_ids["DC"], Tag.query.filter_by(keyword="DC").one().id)
+
+        with self.subTest("Cached keywords"):
+            stats = Tag.id_cache.stats()
+            self.assertDictEqual(Tag.get_or_create_many(["testing", "DC"]),
+                                 {"testing": self.tag.id, "DC": tag_ids["DC"]})
+            self.assertEqual(Tag.id_cache.stats()['hits'], stats['hits'] + 2)
+
     def test_serialize_method(self):
         data = self.tag.serialize()
 
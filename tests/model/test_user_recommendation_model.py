@@ -0,0 +1,162 @@
+"""UserRecommendation model tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/model/test_user_recommendation_model.py
+#   python -m unittest discover tests/model/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import os
+import datetime
+import logging
+from unittest import TestCase
+from unittest.mock import patch
+
+# BEFORE we import our app, let's set an environmental variable
+# to use a different database for tests (we need to do this
+# before we import our app, since that will have already
+# connected to the database
+os.environ['DATABASE_URL'] = "postgresql:///newsmart-test"
+
+# Now we can import app
+from sqlalchemy import event
+
+from app import app, newsmart, recommendation_refresher
+from models import (Article, ArticleTag, Saves, Tag, User, UserRecommendation,
+                    db)
+
+# Create our tables (we do this here, so we only create the tables
+# once for all tests --- in each test, we'll delete the data
+# and create fresh new clean test data
+
+db.create_all()
+
+app.testing = True
+
+logging.disable(logging.CRITICAL)   # Disable logging
+
+FEED = [{"url": "http://www.related.com", "title": "Related"}]
+
+
+class UserRecommendationModelTestCase(TestCase):
+
+    def setUp(self):
+        """Remove existing data, create sample user and article."""
+
+        Article.query.delete()
+        User.query.delete()
+        Tag.query.delete()
+        Tag.id_cache.clear()
+
+        user = User.register(
+            "test", "raw_password", "test@test.com",
+            "Test", "User"
+        )
+        article = Article.new(
+            "Secret", "Bruce Wayne is the Batman",
+            "http://www.google.com", "The Joker"
+        )
+
+        # keep track of id reference instead of db reference
+        self.user_id = user.id
+        self.article_id = article.id
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def get_feed(self):
+        return UserRecommendation.query.get(self.user_id)
+
+    def test_bookmarks_mark_stale(self):
+        self.assertIsNone(UserRecommendation.get_articles(self.user_id))
+
+        saves = Saves.new(self.user_id, self.article_id)
+        feed = self.get_feed()
+        self.assertTrue(feed.stale)
+        self.assertEqual(feed.version, 1)
+        self.assertEqual(UserRecommendation.get_articles(self.user_id), [])
+
+        tag = Tag.new("Batman")
+        ArticleTag.new(self.article_id, tag.id)
+        self.assertEqual(self.get_feed().version, 2)
+
+        Saves.remove(saves.id)
+        self.assertEqual(self.get_feed().version, 3)
+
+    def test_refresh(self):
+        Saves.new(self.user_id, self.article_id)
+
+        with patch.object(newsmart, "build_recommended_articles",
+                          return_value=FEED) as build:
+            self.assertEqual(recommendation_refresher.run_pending(), 1)
+            # fresh feeds are not claimed again
+            self.assertEqual(recommendation_refresher.run_pending(), 0)
+
+        build.assert_called_once()
+        feed = self.get_feed()
+        self.assertFalse(feed.stale)
+        self.assertIsNotNone(feed.refreshed_at)
+        self.assertEqual(UserRecommendation.get_articles(self.user_id), FEED)
+
+    def test_store_after_newer_change(self):
+        Saves.new(self.user_id, self.article_id)
+        [(user_id, version)] = UserRecommendation.claim_due(max_age=1800)
+
+        # bookmark changed while the feed was being built
+        UserRecommendation.mark_stale(user_id)
+        db.session.commit()
+
+        self.assertTrue(UserRecommendation.store(user_id, FEED, version))
+        feed = self.get_feed()
+        self.assertTrue(feed.stale)
+        self.assertEqual(feed.articles, FEED)
+        self.assertIsNone(feed.claimed_at)
+
+    def test_failed_refresh_keeps_feed(self):
+        Saves.new(self.user_id, self.article_id)
+        UserRecommendation.store(self.user_id, FEED, 0)
+
+        with patch.object(newsmart, "build_recommended_articles",
+                          return_value=None):
+            self.assertEqual(recommendation_refresher.run_pending(), 0)
+
+        feed = self.get_feed()
+        self.assertTrue(feed.stale)
+        self.assertEqual(feed.articles, FEED)
+        # claimed feeds wait for their lease to expire
+        self.assertEqual(UserRecommendation.claim_due(max_age=1800), [])
+
+    def test_recommendation_phrases_single_query(self):
+        keywords = [["Batman", "Gotham"], ["Superman"], ["Flash", "Speed", "Lab"]]
+        now = datetime.datetime.utcnow()
+        for index, words in enumerate(keywords):
+            article = Article.new(f"Story {index}", "Content",
+                                  f"http://www.story{index}.com", "Source")
+            for word in words:
+                ArticleTag.new(article.id, Tag.new(word).id)
+            Saves.new(self.user_id, article.id,
+                      timestamp=now + datetime.timedelta(minutes=index))
+        db.session.expire_all()
+
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", count)
+        try:
+            phrases = newsmart.get_recommendation_phrases(self.user_id)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count)
+        self.assertEqual(len(statements), 1)
+
+        # same phrases as lazily loading each bookmark's article and tags
+        db.session.expire_all()
+        saves = (Saves.query.filter(Saves.user_id == self.user_id)
+                 .order_by(Saves.timestamp.desc()).limit(4).all())
+        expected = [
+            " ".join(tag.keyword for tag in save.article.tags[:newsmart.max_terms])
+            for save in saves
+        ]
+        self.assertEqual([sorted(phrase.split()) for phrase in phrases],
+                         [sorted(phrase.split()) for phrase in expected])
+        self.assertEqual(sorted(phrases[0].split()), ["Flash", "Lab", "Speed"])
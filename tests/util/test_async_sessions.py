@@ -0,0 +1,221 @@
+"""asyncio API session tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/util/test_async_sessions.py
+#   python -m unittest discover tests/util/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import os
+import asyncio
+import logging
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import aiohttp
+import requests
+
+# BEFORE we import our app, let's set an environmental variable
+# to use a different database for tests (we need to do this
+# before we import our app, since that will have already
+# connected to the database
+os.environ['DATABASE_URL'] = "postgresql:///newsmart-test"
+
+# Now we can import app
+from app import app, newsmart
+from async_base_api_session import AsyncBaseApiSession
+from async_news_api_session import AsyncNewsApiSession
+from async_nlu_api_session import AsyncNLUApiSession
+from base_api_session import BaseApiSession
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from models import NLUAnalysis, db
+from quota import QuotaExceededError, QuotaLimiter
+from retry import RetryPolicy
+
+app.testing = True
+
+logging.disable(logging.CRITICAL)   # Disable logging
+
+URL = "https://newsapi.org/v2/top-headlines"
+ARTICLE_URL = "http://www.test.com/batman"
+ANALYSIS = {
+    "keywords": [{"text": "Batman", "relevance": 0.95}],
+    "concepts": [{"text": "Superhero", "relevance": 0.95}],
+}
+
+
+class FakeResponse:
+
+    def __init__(self, status=200, json=None):
+        self.status = status
+        self.reason = "Error" if status >= 400 else "OK"
+        self.url = URL
+        self._json = json
+
+    async def json(self, content_type=None):
+        return self._json
+
+
+class FakeRequest:
+
+    def __init__(self, outcome):
+        self.outcome = outcome
+
+    async def __aenter__(self):
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class FakeHttp:
+    """Stand-in for the pooled aiohttp session; answers with outcomes in order."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, str(url)))
+        return FakeRequest(self.outcomes.pop(0))
+
+
+def sync_response(status, json=None):
+    resp = MagicMock(status_code=status)
+    resp.json.return_value = json
+    if status >= 400:
+        resp.raise_for_status.side_effect = requests.HTTPError(response=resp)
+    return resp
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class AsyncSessionTestCase(TestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+        self.policy = RetryPolicy(retries=2, base_delay=0.001, max_delay=0.002)
+        self.guards = patch.multiple(BaseApiSession, circuit_breaker=self.breaker,
+                                     retry_policy=self.policy)
+        self.guards.start()
+        self.session = BaseApiSession()
+        self.async_session = AsyncBaseApiSession(self.session)
+        newsmart.headlines_cache.clear()
+        newsmart.headline_snapshots.clear()
+
+    def tearDown(self):
+        self.guards.stop()
+        db.session.rollback()
+
+    def async_get(self, http, url=URL):
+        with patch.object(AsyncBaseApiSession, "http", http):
+            return run(self.async_session.get(url, {"q": "batman"}))
+
+    def test_get(self):
+        http = FakeHttp(FakeResponse(json={"articles": []}))
+        self.assertEqual(self.async_get(http), {"articles": []})
+        self.assertEqual(http.calls, [("get", f"{URL}?q=batman")])
+
+    def test_errors_match_sync(self):
+        # (sync outcome, async outcome, error raised in development)
+        cases = {
+            "timeout": (requests.ReadTimeout("slow"), asyncio.TimeoutError(),
+                        requests.Timeout),
+            "connection": (requests.ConnectionError("reset"),
+                           aiohttp.ClientConnectionError("reset"),
+                           requests.ConnectionError),
+            "status": (sync_response(404), FakeResponse(404), requests.HTTPError),
+        }
+        for name, (sync_outcome, async_outcome, error) in cases.items():
+            with self.subTest(name), \
+                    patch.multiple(BaseApiSession, retry_policy=RetryPolicy(retries=0),
+                                   circuit_breaker=CircuitBreaker()):
+                with patch.object(self.session.http, "request",
+                                  side_effect=[sync_outcome]):
+                    self.assertIsNone(self.session.get(URL, {}))
+                self.assertIsNone(self.async_get(FakeHttp(async_outcome)))
+
+                with patch.dict(os.environ, {"FLASK_ENV": "development"}):
+                    with patch.object(self.session.http, "request",
+                                      side_effect=[sync_outcome]), \
+                            self.assertRaises(error):
+                        self.session.get(URL, {})
+                    with self.assertRaises(error):
+                        self.async_get(FakeHttp(async_outcome))
+
+    def test_retries_transient_errors(self):
+        http = FakeHttp(aiohttp.ClientConnectionError("reset"), FakeResponse(503),
+                        FakeResponse(json={"articles": []}))
+        self.assertEqual(self.async_get(http), {"articles": []})
+        self.assertEqual(len(http.calls), 3)
+
+        with self.subTest("POST only retries connection errors"):
+            http = FakeHttp(FakeResponse(503), FakeResponse(json={}))
+            with patch.object(AsyncBaseApiSession, "http", http):
+                self.assertIsNone(run(self.async_session.post(URL, {"url": "x"})))
+            self.assertEqual(len(http.calls), 1)
+
+    def test_shares_circuit_breaker(self):
+        # failures of async calls open the circuit of sync calls too
+        http = FakeHttp(*[aiohttp.ClientConnectionError("reset")] * 3)
+        self.assertIsNone(self.async_get(http))
+        self.assertEqual(self.breaker.state(URL), "open")
+
+        with patch.object(self.session.http, "request") as get:
+            self.assertIsNone(self.session.get(URL, {}))
+        get.assert_not_called()
+
+        with self.subTest("Open circuit fails fast"), \
+                patch.dict(os.environ, {"FLASK_ENV": "development"}), \
+                self.assertRaises(CircuitOpenError):
+            self.async_get(FakeHttp())
+
+    def test_spends_shared_quota(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # refills one token per day, i.e. not during a test
+            quota = QuotaLimiter(os.path.join(tmpdir, "quota.sqlite3"),
+                                 {"headlines": (1, 1)})
+            session = AsyncNewsApiSession(newsmart)
+            http = FakeHttp(FakeResponse(json={"articles": [{"url": ARTICLE_URL}]}))
+            with patch.object(newsmart, "quota", quota), \
+                    patch.object(AsyncBaseApiSession, "http", http):
+                articles = run(session.get_top_articles(category="sports"))
+                self.assertEqual(articles, [{"url": ARTICLE_URL}])
+                self.assertTrue(newsmart.served_urls.get(ARTICLE_URL))
+
+                # spent; the request is not sent
+                self.assertIsNone(run(session.get_top_articles(category="science")))
+                self.assertEqual(len(http.calls), 1)
+
+                with patch.dict(os.environ, {"FLASK_ENV": "development"}), \
+                        self.assertRaises(QuotaExceededError):
+                    run(session.get_top_articles(category="science"))
+
+    def test_relevant_terms_use_store(self):
+        NLUAnalysis.query.delete()
+        db.session.commit()
+        session = AsyncNLUApiSession(newsmart)
+        http = FakeHttp(FakeResponse(json=ANALYSIS))
+
+        with patch.object(AsyncBaseApiSession, "http", http):
+            terms = run(session.get_relevant_terms(f"{ARTICLE_URL}/?utm_source=feed"))
+            same_terms = run(session.get_relevant_terms(ARTICLE_URL))
+            # stored by the async session, read by the sync one
+            with patch.object(newsmart, "analyze_url") as analyze_url:
+                sync_terms = newsmart.get_relevant_terms(ARTICLE_URL)
+            analyze_url.assert_not_called()
+
+        self.assertEqual(len(http.calls), 1)
+        self.assertDictEqual(terms, {"keywords": ["Batman"], "concepts": ["Superhero"]})
+        self.assertDictEqual(terms, same_terms)
+        self.assertDictEqual(terms, sync_terms)
+
+        with self.subTest("Failed analysis"):
+            with patch.object(AsyncBaseApiSession, "http",
+                              FakeHttp(FakeResponse(500))):
+                self.assertIsNone(run(session.get_relevant_terms(
+                    "http://www.test.com/joker")))
@@ -0,0 +1,92 @@
+"""Bookmark index tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/util/test_bookmark_index.py
+#   python -m unittest discover tests/util/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import os
+import logging
+from unittest import TestCase
+
+from flask import g
+
+# BEFORE we import our app, let's set an environmental variable
+# to use a different database for tests (we need to do this
+# before we import our app, since that will have already
+# connected to the database
+os.environ['DATABASE_URL'] = "postgresql:///newsmart-test"
+
+# Now we can import app
+from app import app, newsmart
+from models import Article, Saves, User, db
+from user_context import load_current_user
+
+# Create our tables (we do this here, so we only create the tables
+# once for all tests --- in each test, we'll delete the data
+# and create fresh new clean test data
+
+db.create_all()
+
+app.testing = True
+
+logging.disable(logging.CRITICAL)   # Disable logging
+
+
+class BookmarkIndexTestCase(TestCase):
+
+    def setUp(self):
+        """Remove existing users and articles, create sample bookmarks"""
+
+        Article.query.delete()
+        User.query.delete()
+
+        user = User.register(
+            "test", "raw_password", "test@test.com",
+            "Test", "User"
+        )
+        articles = [
+            Article.new("Secret", "Bruce Wayne is the Batman",
+                        f"http://www.test{index}.com", "The Joker")
+            for index in range(3)
+        ]
+        saves = [Saves.new(user.id, article.id) for article in articles[:2]]
+
+        # keep track of id reference instead of db reference
+        self.user_id = user.id
+        self.bookmark_map = {
+            articles[index].url: saves[index].id for index in range(2)
+        }
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def test_full_index(self):
+        with app.test_request_context():
+            g.user = load_current_user(self.user_id)
+            index = newsmart.get_bookmark_index()
+
+            self.assertDictEqual(dict(index), self.bookmark_map)
+            # computed once per request
+            self.assertIs(newsmart.get_bookmark_url_to_id(), index)
+            self.assertEqual(newsmart.get_bookmarked_urls(), set(self.bookmark_map))
+            with self.assertRaises(TypeError):
+                index["http://www.test2.com"] = 1
+
+    def test_page_index(self):
+        urls = ["http://www.test1.com", "http://www.test2.com", "http://www.other.com"]
+        with app.test_request_context():
+            g.user = load_current_user(self.user_id)
+            index = newsmart.get_bookmark_index(urls)
+
+            self.assertDictEqual(
+                dict(index),
+                {"http://www.test1.com": self.bookmark_map["http://www.test1.com"]}
+            )
+            self.assertNotIn("bookmark_index", g)
+
+    def test_anonymous_user(self):
+        with app.test_request_context():
+            g.user = None
+            self.assertDictEqual(dict(newsmart.get_bookmark_index()), {})
+            self.assertEqual(newsmart.get_bookmarked_urls(), set())
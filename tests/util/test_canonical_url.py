@@ -0,0 +1,22 @@
+"""Canonical url tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/util/test_canonical_url.py
+#   python -m unittest discover tests/util/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+from unittest import TestCase
+
+from util import canonical_url
+
+
+class CanonicalUrlTestCase(TestCase):
+
+    def test_canonical_url(self):
+        self.assertEqual(
+            canonical_url("HTTP://WWW.Test.com:80/news/?b=2&utm_source=x&a=1#top"),
+            "http://www.test.com/news?a=1&b=2")
+
+    def test_malformed_port(self):
+        self.assertEqual(canonical_url("http://a.com:99999/story/"),
+                         "http://a.com:99999/story")
@@ -0,0 +1,85 @@
+"""Article card fragment cache tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/util/test_card_cache.py
+#   python -m unittest discover tests/util/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import os
+import logging
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from flask import g
+
+# BEFORE we import our app, let's set an environmental variable
+# to use a different database for tests (we need to do this
+# before we import our app, since that will have already
+# connected to the database
+os.environ['DATABASE_URL'] = "postgresql:///newsmart-test"
+
+# Now we can import app
+from app import app
+from fragments import BOOKMARK_SLOT, CardCache
+
+app.testing = True
+
+logging.disable(logging.CRITICAL)   # Disable logging
+
+ARTICLE = {
+    "source": {"id": None, "name": "Test"},
+    "title": "Batman <returns>",
+    "description": "Summary",
+    "url": "http://www.test.com/batman",
+    "urlToImage": None,
+    "publishedAt": "2020-05-30T12:00:00Z",
+    "content": "Content",
+}
+
+
+class CardCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.cache = CardCache(max_entries=2)
+
+    def render(self, article, template="articles/article_post.html",
+               user=None, bookmarks=None):
+        with app.test_request_context():
+            g.user = user
+            return self.cache.render(template, article, bookmarks)
+
+    def test_cards_are_shared(self):
+        first = self.render(ARTICLE)
+        second = self.render(ARTICLE)
+
+        self.assertEqual(first, second)
+        self.assertIn("Batman &lt;returns&gt;", first)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_key_includes_template_and_content(self):
+        self.render(ARTICLE)
+        self.render(ARTICLE, template="articles/article_grid.html")
+        edited = self.render({**ARTICLE, "title": "Batman begins"})
+
+        self.assertIn("Batman begins", edited)
+        self.assertEqual(self.cache.stats()['misses'], 3)
+        # least recently used card was evicted
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_bookmark_state_per_user(self):
+        anonymous = self.render(ARTICLE)
+        user = MagicMock(id=1)
+        bookmarked = self.render(ARTICLE, user=user,
+                                 bookmarks={ARTICLE['url']: 42})
+        not_bookmarked = self.render(ARTICLE, user=user, bookmarks={})
+
+        self.assertNotIn("btn-bookmark", anonymous)
+        self.assertIn('data-bookmark-id="42"', bookmarked)
+        self.assertIn("far fa-bookmark", not_bookmarked)
+        self.assertNotIn("data-bookmark-id", not_bookmarked)
+        self.assertNotIn(BOOKMARK_SLOT, bookmarked)
+        # one card serves every user
+        self.assertEqual(self.cache.stats()['entries'], 1)
+        for card in self.cache.cards._entries.values():
+            self.assertNotIn("bookmark-id", card[2])
@@ -0,0 +1,98 @@
+"""Circuit breaker tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/util/test_circuit_breaker.py
+#   python -m unittest discover tests/util/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import logging
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from base_api_session import BaseApiSession
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from retry import RetryPolicy
+
+logging.disable(logging.CRITICAL)   # Disable logging
+
+URL = "https://newsapi.org/v2/top-headlines"
+
+
+class CircuitBreakerTestCase(TestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05)
+
+    def call(self, error=None):
+        with self.breaker.guard(URL):
+            if error is not None:
+                raise error
+
+    def fail(self, error=requests.ConnectionError("down")):
+        with self.assertRaises(type(error)):
+            self.call(error)
+
+    def test_opens_after_threshold(self):
+        self.fail()
+        self.assertEqual(self.breaker.state(URL), "closed")
+        self.fail()
+        self.assertEqual(self.breaker.state("newsapi.org"), "open")
+
+        with self.assertRaises(CircuitOpenError):
+            self.call()
+        self.assertEqual(self.breaker.stats()["newsapi.org"]['rejected'], 1)
+
+    def test_client_errors_do_not_count(self):
+        response = MagicMock(status_code=404)
+        for _ in range(3):
+            self.fail(requests.HTTPError(response=response))
+        self.assertEqual(self.breaker.state(URL), "closed")
+
+        self.fail(requests.HTTPError(response=MagicMock(status_code=503)))
+        self.call()
+        self.assertEqual(self.breaker.stats()["newsapi.org"]['failures'], 0)
+
+    def test_half_open(self):
+        self.fail()
+        self.fail()
+        time.sleep(0.06)
+
+        with self.subTest("Failed probe reopens circuit"):
+            self.fail()
+            self.assertEqual(self.breaker.state(URL), "open")
+
+        time.sleep(0.06)
+        with self.subTest("Successful probe closes circuit"):
+            self.call()
+            self.assertEqual(self.breaker.state(URL), "closed")
+
+        self.assertDictEqual(
+            self.breaker.stats()["newsapi.org"]['transitions'],
+            {"closed->open": 1, "open->half-open": 2,
+             "half-open->open": 1, "half-open->closed": 1}
+        )
+
+    def test_session_fails_fast(self):
+        session = BaseApiSession()
+        with patch.multiple(BaseApiSession, circuit_breaker=self.breaker,
+                            retry_policy=RetryPolicy(retries=0)), \
+                patch.object(session.http, "request",
+                             side_effect=requests.ConnectTimeout("slow")) as get:
+            for _ in range(4):
+                self.assertIsNone(session.get(URL, {}))
+
+        self.assertEqual(get.call_count, 2)
+
+    def test_open_circuit_fails_post(self):
+        session = BaseApiSession()
+        self.fail()
+        self.fail()
+
+        with patch.multiple(BaseApiSession, circuit_breaker=self.breaker), \
+                patch.object(session.http, "request") as post:
+            self.assertIsNone(session.post(URL, {"url": "http://www.test.com"}))
+        post.assert_not_called()
+        self.assertEqual(self.breaker.stats()["newsapi.org"]['rejected'], 1)
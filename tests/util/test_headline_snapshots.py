@@ -0,0 +1,164 @@
+"""Headline snapshot tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/util/test_headline_snapshots.py
+#   python -m unittest discover tests/util/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import os
+import logging
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+# BEFORE we import our app, let's set an environmental variable
+# to use a different database for tests (we need to do this
+# before we import our app, since that will have already
+# connected to the database
+os.environ['DATABASE_URL'] = "postgresql:///newsmart-test"
+
+# Now we can import app
+from app import app, newsmart
+from headlines import HeadlineRefresher
+from ingestion import HeadlineIngester
+from models import NEWS_CATEGORIES, Article
+
+app.testing = True
+
+logging.disable(logging.CRITICAL)   # Disable logging
+
+ARTICLES = [{"url": f"http://www.test{index}.com"} for index in range(20)]
+
+
+class HeadlineSnapshotTestCase(TestCase):
+
+    def setUp(self):
+        newsmart.headline_snapshots.clear()
+        newsmart.headlines_cache.clear()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.refresher = self.new_refresher()
+
+    def tearDown(self):
+        newsmart.headline_snapshots.clear()
+        newsmart.headlines_cache.clear()
+        self.tmpdir.cleanup()
+
+    def new_refresher(self):
+        """Return a refresher sharing lock and snapshots with this test's others."""
+        return HeadlineRefresher(
+            newsmart,
+            lock_path=os.path.join(self.tmpdir.name, "headlines.lock"),
+            snapshot_path=os.path.join(self.tmpdir.name, "headlines.json"))
+
+    def test_refresh(self):
+        with patch.object(newsmart, "get", return_value={"articles": ARTICLES}) as get:
+            self.assertEqual(self.refresher.refresh(), len(NEWS_CATEGORIES) + 1)
+            get.reset_mock()
+
+            self.assertEqual(newsmart.get_top_articles(), ARTICLES)
+            self.assertEqual(
+                newsmart.get_top_articles(category="sports", size=12), ARTICLES[:12])
+            get.assert_not_called()
+
+            # pages larger than the snapshot still go to the API
+            newsmart.get_top_articles(size=50)
+            get.assert_called_once()
+
+        ages = self.refresher.stats()['ages']
+        self.assertEqual(set(ages), {"top", *NEWS_CATEGORIES})
+        self.assertTrue(all(age < 60 for age in ages.values()))
+
+    def test_failed_refresh_keeps_snapshot(self):
+        with patch.object(newsmart, "get", return_value={"articles": ARTICLES}):
+            self.refresher.refresh()
+        with patch.object(newsmart, "get", return_value=None):
+            self.assertEqual(self.refresher.refresh(), 0)
+            self.assertEqual(newsmart.get_top_articles(), ARTICLES)
+
+    def test_refresh_due_feeds(self):
+        with patch.object(newsmart, "get", return_value={"articles": ARTICLES}) as get:
+            self.refresher.refresh()
+            get.reset_mock()
+            # snapshots are fresh; nothing is fetched again
+            self.assertEqual(self.refresher.refresh(), 0)
+            get.assert_not_called()
+
+        newsmart.headline_snapshots.clear()
+        refresher = self.new_refresher()
+        with patch.object(newsmart, "get", return_value=None) as get:
+            # a failing feed is retried after interval, not on every poll
+            self.assertEqual(refresher.refresh(), 0)
+            self.assertEqual(refresher.refresh(), 0)
+            self.assertEqual(get.call_count, len(NEWS_CATEGORIES) + 1)
+
+    def test_refresh_own_executor(self):
+        with patch.object(newsmart, "run_concurrently", return_value={}) as run:
+            self.refresher.refresh()
+        self.assertIs(run.call_args[1]['executor'], self.refresher.executor)
+        self.assertIsNot(self.refresher.executor, newsmart.executor)
+
+    def test_refresh_skipped_on_low_quota(self):
+        with patch.object(newsmart, "quota_policy", return_value=True), \
+                patch.object(newsmart, "get") as get:
+            self.assertEqual(self.refresher.refresh(), 0)
+        get.assert_not_called()
+        self.assertEqual(self.refresher.stats()['skipped'], 1)
+
+    def test_one_leader_shares_snapshots(self):
+        follower = self.new_refresher()
+        self.assertTrue(self.refresher.is_leader())
+        self.assertFalse(follower.is_leader())
+
+        with patch.object(newsmart, "get", return_value={"articles": ARTICLES}):
+            self.refresher.refresh()
+        fetched_at = newsmart.headline_snapshots.fetched_at(newsmart.headlines_key())
+
+        # the follower's process has no snapshots of its own
+        newsmart.headline_snapshots.clear()
+        newsmart.served_urls.clear()
+        self.assertEqual(follower.sync(), len(NEWS_CATEGORIES) + 1)
+        self.assertTrue(newsmart.served_urls.get(ARTICLES[0]['url']))
+        self.assertEqual(newsmart.get_top_articles(category="sports"), ARTICLES)
+        self.assertEqual(
+            newsmart.headline_snapshots.fetched_at(newsmart.headlines_key()), fetched_at)
+        # unchanged file is not read again
+        self.assertEqual(follower.sync(), 0)
+
+    def test_only_leader_ingests(self):
+        leader = self.new_refresher()
+        follower = self.new_refresher()
+        self.assertTrue(leader.is_leader())
+        newsmart.headline_snapshots.put(newsmart.headlines_key(), tuple(ARTICLES))
+
+        with patch.object(Article, "upsert_many",
+                          return_value={"inserted": 1, "updated": 0}) as upsert_many:
+            self.assertIsNone(HeadlineIngester(
+                app, newsmart, is_leader=follower.is_leader).run_if_leader())
+            upsert_many.assert_not_called()
+
+            counts = HeadlineIngester(
+                app, newsmart, is_leader=leader.is_leader).run_if_leader()
+        self.assertEqual(counts, {"inserted": 1, "updated": 0})
+        upsert_many.assert_called_once_with(ARTICLES)
+
+    def test_metrics(self):
+        with app.test_client() as client:
+            resp = client.get("/api/metrics")
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertIsNone(resp.get_json()['headlines']['ages']['top'])
+        # quota, latency and circuits of upstream urls stay private
+        self.assertEqual(list(resp.get_json()), ["headlines"])
+        self.assertEqual(list(resp.get_json()['headlines']), ["ages"])
+
+        with self.subTest("Full report with token"), \
+                patch.dict(app.config, {"METRICS_TOKEN": "secret"}):
+            with app.test_client() as client:
+                denied = client.get("/api/metrics",
+                                    headers={"Authorization": "Bearer wrong"})
+                resp = client.get("/api/metrics",
+                                  headers={"Authorization": "Bearer secret"})
+
+            self.assertNotIn("quota", denied.get_json())
+            self.assertIn("quota", resp.get_json())
+            self.assertIn("leader", resp.get_json()['headlines'])
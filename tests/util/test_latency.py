@@ -0,0 +1,99 @@
+"""Adaptive timeout and hedging tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/util/test_latency.py
+#   python -m unittest discover tests/util/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import logging
+import threading
+from unittest import TestCase
+from concurrent.futures import ALL_COMPLETED, wait
+from unittest.mock import patch
+
+import requests
+
+from base_api_session import BaseApiSession
+from latency import LatencyTracker
+from retry import RetryBudget
+
+logging.disable(logging.CRITICAL)   # Disable logging
+
+URL = "https://newsapi.org/v2/top-headlines"
+
+
+class LatencyTrackerTestCase(TestCase):
+
+    def setUp(self):
+        self.tracker = LatencyTracker(factor=2, floor=0.1, min_samples=10)
+
+    def test_adaptive_timeout(self):
+        self.assertEqual(self.tracker.timeout(URL, default=10), 10)
+
+        for _ in range(99):
+            self.tracker.record(URL, 0.05)
+        self.tracker.record(URL, 1.0)
+
+        p99 = self.tracker.percentile(URL, 0.99)
+        self.assertGreaterEqual(p99, 0.05)
+        self.assertLess(p99, 0.07)
+        self.assertAlmostEqual(self.tracker.timeout(URL, default=10), 2 * p99)
+        self.assertEqual(self.tracker.timeout(URL, default=10, ceiling=0.05), 0.05)
+        self.assertGreaterEqual(self.tracker.percentile(URL, 1), 1.0)
+
+    def test_floor(self):
+        for _ in range(10):
+            self.tracker.record(URL, 0.001)
+        self.assertEqual(self.tracker.timeout(URL, default=10), 0.1)
+
+
+class HedgeTestCase(TestCase):
+
+    def setUp(self):
+        self.session = BaseApiSession()
+        self.tracker = LatencyTracker(min_samples=1)
+        self.tracker.record(URL, 0.01)
+        self.release = threading.Event()
+        self.calls = 0
+
+    def request(self, timeout):
+        # first request hangs, the hedge answers right away
+        self.calls += 1
+        if self.calls == 1:
+            self.release.wait(timeout)
+            return "slow"
+        return "fast"
+
+    def test_hedge_slow_request(self):
+        with patch.multiple(BaseApiSession, latency=self.tracker, hedge_gets=True,
+                            hedge_budget=RetryBudget()):
+            self.assertEqual(self.session.hedge(URL, self.request, 5), "fast")
+        self.release.set()
+        self.assertEqual(self.calls, 2)
+
+    def test_hedging_off(self):
+        with patch.multiple(BaseApiSession, latency=self.tracker, hedge_gets=False):
+            self.assertEqual(self.session.hedge(URL, self.request, 0.01), "slow")
+        self.assertEqual(self.calls, 1)
+
+    def test_hedge_prefers_success(self):
+        def request(timeout):
+            # first request fails as the hedge answers
+            self.calls += 1
+            if self.calls == 1:
+                self.release.wait(timeout)
+                raise requests.ConnectionError("reset")
+            self.release.set()
+            return "fast"
+
+        def wait_both(futures, timeout=None, return_when=ALL_COMPLETED):
+            # both requests finish before the hedge looks at them,
+            # the failed one listed first
+            done, pending = wait(futures, timeout=timeout, return_when=ALL_COMPLETED)
+            return sorted(done, key=lambda future: future.exception() is None), pending
+
+        with patch.multiple(BaseApiSession, latency=self.tracker, hedge_gets=True,
+                            hedge_budget=RetryBudget()), \
+                patch("base_api_session.wait", side_effect=wait_both):
+            self.assertEqual(self.session.hedge(URL, request, 5), "fast")
+        self.assertEqual(self.calls, 2)
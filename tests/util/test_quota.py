@@ -0,0 +1,90 @@
+"""Quota limiter tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/util/test_quota.py
+#   python -m unittest discover tests/util/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import os
+import logging
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+# BEFORE we import our app, let's set an environmental variable
+# to use a different database for tests (we need to do this
+# before we import our app, since that will have already
+# connected to the database
+os.environ['DATABASE_URL'] = "postgresql:///newsmart-test"
+
+# Now we can import app
+from app import app, newsmart
+from quota import QuotaLimiter
+
+app.testing = True
+
+logging.disable(logging.CRITICAL)   # Disable logging
+
+ARTICLES = [{"url": "http://www.test.com"}]
+
+
+class QuotaLimiterTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "quota.sqlite3")
+        # refills one token per day, i.e. not during a test
+        self.quota = QuotaLimiter(self.path, {"headlines": (1, 3)},
+                                  low_watermark=0.5)
+        newsmart.headlines_cache.clear()
+        newsmart.headline_snapshots.clear()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        newsmart.headlines_cache.clear()
+
+    def test_acquire(self):
+        self.assertEqual(
+            [self.quota.acquire("headlines") for _ in range(4)],
+            [True, True, True, False]
+        )
+        self.assertTrue(self.quota.acquire("unknown"))
+
+        report = self.quota.report()['headlines']
+        self.assertEqual((report['granted'], report['denied']), (3, 1))
+        self.assertTrue(self.quota.is_low("headlines"))
+
+    def test_shared_by_workers(self):
+        other_worker = QuotaLimiter(self.path, {"headlines": (1, 3)})
+        self.quota.acquire("headlines", cost=2)
+
+        self.assertTrue(other_worker.acquire("headlines"))
+        self.assertFalse(self.quota.acquire("headlines"))
+
+        self.quota.reset()
+        self.assertTrue(other_worker.acquire("headlines"))
+
+    def test_spent_quota_serves_stale_headlines(self):
+        key = newsmart.headlines_key(category="sports")
+        newsmart.headlines_cache.set(key, ARTICLES, ttl=0)
+        for _ in range(3):
+            self.quota.acquire("headlines")
+
+        with patch.object(newsmart, "quota", self.quota), \
+                patch.object(newsmart.http, "request") as get:
+            self.assertEqual(newsmart.get_top_articles(category="sports"), ARTICLES)
+
+            # no stale copy either; the request is not sent
+            self.assertIsNone(newsmart.get_top_articles(category="science"))
+            get.assert_not_called()
+
+    def test_spent_quota_fails_post(self):
+        for _ in range(3):
+            self.quota.acquire("headlines")
+
+        with patch.object(newsmart, "quota", self.quota), \
+                patch.object(newsmart, "quota_buckets",
+                             {newsmart.analytics_url: "headlines"}), \
+                patch.object(newsmart.http, "request") as post:
+            self.assertIsNone(newsmart.post(newsmart.analytics_url, {"url": "x"}))
+            post.assert_not_called()
@@ -0,0 +1,80 @@
+"""Retry policy tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/util/test_retry.py
+#   python -m unittest discover tests/util/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import logging
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from base_api_session import BaseApiSession
+from circuit_breaker import CircuitBreaker
+from retry import RetryBudget, RetryPolicy
+
+logging.disable(logging.CRITICAL)   # Disable logging
+
+URL = "https://newsapi.org/v2/top-headlines"
+
+
+def response(status, json=None):
+    resp = MagicMock(status_code=status)
+    resp.json.return_value = json
+    if status >= 400:
+        resp.raise_for_status.side_effect = requests.HTTPError(response=resp)
+    return resp
+
+
+class RetryPolicyTestCase(TestCase):
+
+    def setUp(self):
+        self.policy = RetryPolicy(retries=2, base_delay=0.001, max_delay=0.002)
+        self.session = BaseApiSession()
+
+    def patch_session(self, side_effect):
+        return patch.multiple(BaseApiSession, retry_policy=self.policy,
+                              circuit_breaker=CircuitBreaker()), \
+            patch.object(self.session.http, "request", side_effect=side_effect)
+
+    def test_get_retries_transient_errors(self):
+        policy, http = self.patch_session(
+            [requests.ConnectTimeout(), response(503),
+                    response(200, {"articles": []})])
+        with policy, http as get:
+            self.assertEqual(self.session.get(URL, {}), {"articles": []})
+
+        self.assertEqual(get.call_count, 3)
+        self.assertEqual(self.policy.budget.stats()['retries'], 2)
+
+    def test_get_does_not_retry_client_errors(self):
+        policy, http = self.patch_session([response(401)])
+        with policy, http as get:
+            self.assertIsNone(self.session.get(URL, {}))
+        self.assertEqual(get.call_count, 1)
+
+    def test_post_retries_connection_errors_only(self):
+        policy, http = self.patch_session(
+            [requests.ConnectionError(), requests.ReadTimeout()])
+        with policy, http as post:
+            self.assertIsNone(self.session.post(URL, {}))
+        self.assertEqual(post.call_count, 2)
+
+    def test_retries_stay_inside_deadline(self):
+        self.policy.base_delay = self.policy.max_delay = 1
+        attempt = MagicMock(side_effect=requests.ConnectTimeout())
+        with patch("retry.random.uniform", return_value=1):
+            with self.assertRaises(requests.ConnectTimeout):
+                self.policy.call(attempt, 0.5, RetryPolicy.is_transient)
+        attempt.assert_called_once()
+
+    def test_budget(self):
+        budget = RetryBudget(ratio=0.5, reserve=2)
+        self.assertEqual([budget.withdraw() for _ in range(3)], [True, True, False])
+        budget.deposit()
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+        self.assertDictEqual(budget.stats(),
+                             {"balance": 0, "retries": 3, "exhausted": 1})
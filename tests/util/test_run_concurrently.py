@@ -0,0 +1,113 @@
+"""Concurrent outbound call tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/util/test_run_concurrently.py
+#   python -m unittest discover tests/util/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import os
+import logging
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from flask import g
+
+# BEFORE we import our app, let's set an environmental variable
+# to use a different database for tests (we need to do this
+# before we import our app, since that will have already
+# connected to the database
+os.environ['DATABASE_URL'] = "postgresql:///newsmart-test"
+
+# Now we can import app
+from app import app, newsmart
+from models import UserRecommendation
+
+app.testing = True
+
+logging.disable(logging.CRITICAL)   # Disable logging
+
+ARTICLES = [{"url": "http://www.test.com", "title": "Test"}]
+
+
+def sleep_then(seconds, result):
+    """Return a call sleeping for seconds, then returning result."""
+    def call(timeout):
+        time.sleep(seconds)
+        return result
+    return call
+
+
+def fail(*args, **kwargs):
+    raise RuntimeError("upstream failed")
+
+
+class RunConcurrentlyTestCase(TestCase):
+
+    def setUp(self):
+        newsmart.headline_snapshots.clear()
+        newsmart.headlines_cache.clear()
+
+    def test_calls_run_in_parallel(self):
+        # every call waits for the others; sequential calls would time out
+        barrier = threading.Barrier(3, timeout=1)
+
+        def call(timeout):
+            barrier.wait()
+            return True
+
+        start = time.monotonic()
+        results = newsmart.run_concurrently(
+            {index: (call, {}) for index in range(3)}, timeout=2)
+
+        self.assertEqual(results, {0: True, 1: True, 2: True})
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_deadline_drops_slow_and_failed_calls(self):
+        start = time.monotonic()
+        results = newsmart.run_concurrently({
+            "fast": (sleep_then(0, "fast"), {}),
+            "slow": (sleep_then(1, "slow"), {}),
+            "failed": (fail, {}),
+        }, timeout=0.2)
+
+        self.assertEqual(results, {"fast": "fast"})
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_calls_get_remaining_budget(self):
+        timeouts = []
+
+        def call(timeout):
+            timeouts.append(timeout)
+
+        newsmart.run_concurrently({"call": (call, {})}, timeout=0.5)
+        self.assertTrue(0 < timeouts[0] <= 0.5)
+
+    def test_home_sections_without_failed_section(self):
+        user = MagicMock(id=1, category_names=["business", "sports", "science"])
+
+        def get_top_articles(category=None, size=None, timeout=None):
+            if category == "science":
+                raise RuntimeError("upstream failed")
+            if category == "sports":
+                time.sleep(1)
+            return ARTICLES
+
+        with app.test_request_context(), \
+                patch.object(newsmart, "get_top_articles", side_effect=get_top_articles), \
+                patch.object(UserRecommendation, "get_articles", return_value=None):
+            g.user = user
+            sections = newsmart.get_home_sections(budget=0.2)
+
+        self.assertEqual(sections['top_articles'], ARTICLES)
+        # the failed and the late category are left out
+        self.assertEqual(sections['category_map'], {"business": ARTICLES})
+        self.assertEqual(sections['related_articles'], [])
+
+    def test_home_page_without_failed_section(self):
+        with patch.object(newsmart, "get_top_articles", side_effect=fail):
+            with app.test_client() as client:
+                resp = client.get("/")
+
+        self.assertEqual(resp.status_code, 200)
@@ -0,0 +1,103 @@
+"""Local full-text search tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/util/test_search.py
+#   python -m unittest discover tests/util/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import os
+import datetime
+import logging
+from unittest import TestCase
+from unittest.mock import patch
+
+# BEFORE we import our app, let's set an environmental variable
+# to use a different database for tests (we need to do this
+# before we import our app, since that will have already
+# connected to the database
+os.environ['DATABASE_URL'] = "postgresql:///newsmart-test"
+
+# Now we can import app
+from app import app, newsmart
+from models import Article, db
+from newsmart import NewSmart
+
+# Create our tables (we do this here, so we only create the tables
+# once for all tests --- in each test, we'll delete the data
+# and create fresh new clean test data
+
+db.create_all()
+
+app.testing = True
+
+logging.disable(logging.CRITICAL)   # Disable logging
+
+FOUND = [
+    {"title": "Gotham elects a new mayor", "description": "Batman approves",
+     "url": "http://www.found.com", "source": {"name": "Daily Planet"},
+     "publishedAt": "2020-05-11T21:15:18Z"},
+]
+
+
+class SearchTestCase(TestCase):
+
+    def setUp(self):
+        """Remove existing articles, create sample articles."""
+
+        Article.query.delete()
+
+        now = datetime.datetime.utcnow()
+        Article.new("Batman saves Gotham", "The Joker is caught again.",
+                    "http://www.title.com", "Gotham Times", timestamp=now)
+        Article.new("Weather report", "Batman was seen in the rain.",
+                    "http://www.content.com", "Gotham Times", timestamp=now)
+        Article.new("Batman begins", "An old story.",
+                    "http://www.old.com", "Gotham Times",
+                    timestamp=now - datetime.timedelta(days=30))
+        Article.new("Batman on video", "Watch now.",
+                    "http://www.youtube.com/watch", "YouTube", timestamp=now)
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def test_article_search(self):
+        self.assertEqual(
+            [article.url for article in Article.search("batman", days=7)],
+            ["http://www.title.com", "http://www.youtube.com/watch",
+             "http://www.content.com"]
+        )
+        self.assertEqual(len(Article.search("batman")), 4)
+        self.assertEqual(
+            [article.url for article in Article.search("joker -batman")], [])
+
+    def test_enough_local_hits(self):
+        with patch.object(NewSmart, "search_min_hits", 2), \
+                patch.object(newsmart, "search_articles") as search_articles:
+            articles = newsmart.search("batman", exclude_domains=["youtube.com"])
+
+        search_articles.assert_not_called()
+        self.assertEqual([article['url'] for article in articles],
+                         ["http://www.title.com", "http://www.content.com"])
+
+    def test_no_local_hits_without_minimum(self):
+        with patch.object(NewSmart, "search_min_hits", 0), \
+                patch.object(newsmart, "search_articles", return_value=FOUND):
+            articles = newsmart.search("mayor")
+
+        self.assertEqual([article['url'] for article in articles],
+                         ["http://www.found.com"])
+
+    def test_fallback(self):
+        with patch.object(newsmart, "search_articles", return_value=FOUND):
+            articles = newsmart.search("batman", exclude_domains=["youtube.com"])
+
+        self.assertEqual(
+            [article['url'] for article in articles],
+            ["http://www.title.com", "http://www.content.com", "http://www.found.com"]
+        )
+        # fallback results are stored for later searches
+        self.assertEqual(Article.search("mayor")[0].url, "http://www.found.com")
+
+        with self.subTest("Failed fallback keeps local hits"):
+            with patch.object(newsmart, "search_articles", return_value=None):
+                self.assertEqual(len(newsmart.search("batman", days=7)), 3)
@@ -0,0 +1,78 @@
+"""Single-flight tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/util/test_single_flight.py
+#   python -m unittest discover tests/util/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+import requests
+
+from base_api_session import SingleFlight
+
+
+class SingleFlightTestCase(TestCase):
+
+    def setUp(self):
+        self.single_flight = SingleFlight()
+        self.release = threading.Event()
+        self.count = 0
+
+    def slow_call(self):
+        self.count += 1
+        self.release.wait(5)
+        return {"articles": []}
+
+    def run_callers(self, function, callers=5, key="key", timeout=5):
+        with ThreadPoolExecutor(max_workers=callers) as executor:
+            futures = [
+                executor.submit(self.single_flight.do, key, function, timeout)
+                for _ in range(callers)
+            ]
+            # wait until every caller joined the flight
+            while self.single_flight.stats()['calls'] < callers:
+                pass
+            self.release.set()
+        return futures
+
+    def test_collapse(self):
+        futures = self.run_callers(self.slow_call)
+
+        results = [future.result() for future in futures]
+        self.assertEqual(self.count, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertDictEqual(
+            self.single_flight.stats(),
+            {"calls": 5, "collapsed": 4, "in_flight": 0}
+        )
+
+    def test_error_shared(self):
+        def failing_call():
+            self.release.wait(5)
+            raise requests.ConnectionError("down")
+
+        futures = self.run_callers(failing_call, callers=3)
+
+        for future in futures:
+            with self.assertRaises(requests.ConnectionError):
+                future.result()
+
+        with self.subTest("Next call is not collapsed into a finished flight"):
+            self.assertEqual(self.single_flight.do("key", lambda: 1), 1)
+
+    def test_waiting_caller_timeout(self):
+        leader = threading.Thread(
+            target=self.single_flight.do, args=("key", self.slow_call))
+        leader.start()
+        while self.single_flight.stats()['in_flight'] < 1:
+            pass
+
+        with self.assertRaises(requests.Timeout):
+            self.single_flight.do("key", self.slow_call, timeout=0.01)
+
+        self.release.set()
+        leader.join()
+        self.assertEqual(self.count, 1)
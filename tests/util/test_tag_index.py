@@ -0,0 +1,115 @@
+"""Tag index tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/util/test_tag_index.py
+#   python -m unittest discover tests/util/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import os
+import logging
+from unittest import TestCase
+from unittest.mock import patch
+
+# BEFORE we import our app, let's set an environmental variable
+# to use a different database for tests (we need to do this
+# before we import our app, since that will have already
+# connected to the database
+os.environ['DATABASE_URL'] = "postgresql:///newsmart-test"
+
+# Now we can import app
+from app import app, newsmart
+from models import Article, ArticleTag, Saves, Tag, User, db
+from tag_index import TagIndex
+
+# Create our tables (we do this here, so we only create the tables
+# once for all tests --- in each test, we'll delete the data
+# and create fresh new clean test data
+
+db.create_all()
+
+app.testing = True
+
+logging.disable(logging.CRITICAL)   # Disable logging
+
+ARTICLE_TAGS = {
+    "http://www.batman.com": ["Batman", "Gotham", "Joker"],
+    "http://www.robin.com": ["Batman", "Gotham"],
+    "http://www.joker.com": ["Joker"],
+    "http://www.superman.com": ["Superman"],
+}
+
+
+class TagIndexTestCase(TestCase):
+
+    def setUp(self):
+        """Remove existing data, create tagged sample articles."""
+
+        Article.query.delete()
+        User.query.delete()
+        Tag.query.delete()
+        Tag.id_cache.clear()
+
+        user = User.register(
+            "test", "raw_password", "test@test.com",
+            "Test", "User"
+        )
+        self.user_id = user.id
+
+        # keep track of id reference instead of db reference
+        self.article_ids = dict()
+        for url, keywords in ARTICLE_TAGS.items():
+            article = Article.new("Title", "Content", url, "Source")
+            self.article_ids[url] = article.id
+            tag_ids = Tag.get_or_create_many(keywords)
+            ArticleTag.new_many(article.id, list(tag_ids.values()))
+
+        self.index = TagIndex()
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def test_similar(self):
+        ids = self.article_ids
+        matches = self.index.similar([ids["http://www.batman.com"]])
+
+        self.assertEqual(
+            [article_id for article_id, _ in matches],
+            [ids["http://www.robin.com"], ids["http://www.joker.com"]]
+        )
+        self.assertTrue(all(0 < score <= 1 for _, score in matches))
+
+        self.assertEqual(
+            self.index.similar([ids["http://www.batman.com"]],
+                               exclude=[ids["http://www.robin.com"]])[0][0],
+            ids["http://www.joker.com"]
+        )
+        self.assertEqual(self.index.similar([ids["http://www.superman.com"]]), [])
+
+    def test_incremental_add(self):
+        ids = self.article_ids
+        self.index.similar([ids["http://www.superman.com"]])
+
+        article = Article.new("Title", "Content", "http://www.krypton.com", "Source")
+        tag_ids = Tag.get_or_create_many(["Superman"])
+        self.index.add(article.id, list(tag_ids.values()))
+
+        self.assertEqual(
+            [article_id for article_id, _ in
+             self.index.similar([ids["http://www.superman.com"]])],
+            [article.id]
+        )
+
+    def test_local_recommendations(self):
+        ids = self.article_ids
+        Saves.new(self.user_id, ids["http://www.batman.com"])
+        Saves.new(self.user_id, ids["http://www.joker.com"])
+
+        with patch.object(newsmart, "tag_index", self.index), \
+                patch.object(newsmart, "search_articles", return_value=[]) as search:
+            articles = newsmart.build_recommended_articles(self.user_id)
+
+        self.assertEqual([article['url'] for article in articles],
+                         ["http://www.robin.com"])
+        self.assertEqual(articles[0]['source']['name'], "Source")
+        # too few local matches, so searches top them up
+        search.assert_called()
@@ -0,0 +1,76 @@
+"""TTL cache tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/util/test_ttl_cache.py
+#   python -m unittest discover tests/util/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import time
+from unittest import TestCase
+
+from cache import TTLCache
+
+
+class TTLCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.cache = TTLCache(ttl=60, max_entries=3, max_bytes=100)
+
+    def test_get_set(self):
+        self.assertIsNone(self.cache.get("missing"))
+        self.cache.set("key", ["value"])
+        self.assertEqual(self.cache.get("key"), ["value"])
+        self.assertDictEqual(
+            self.cache.stats(),
+            {"hits": 1, "misses": 1, "evictions": 0, "entries": 1, "bytes": 9}
+        )
+
+    def test_ttl_expiry(self):
+        self.cache.set("key", "value", ttl=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+        with self.subTest("Expired entry is dropped on read"):
+            self.assertEqual(self.cache.stats()['entries'], 0)
+            self.assertEqual(self.cache.stats()['bytes'], 0)
+            self.assertIsNone(self.cache.get_stale("key"))
+
+    def test_stale_ttl(self):
+        cache = TTLCache(ttl=60, stale_ttl=0.05)
+        cache.set("key", "value", ttl=0.01)
+        time.sleep(0.02)
+
+        # expired, but kept for get_stale
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.get_stale("key"), "value")
+        self.assertEqual(len(cache), 1)
+
+        time.sleep(0.05)
+        self.assertIsNone(cache.get_stale("key"))
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_eviction_by_entries(self):
+        for key in ("a", "b", "c"):
+            self.cache.set(key, key)
+        # touch "a" so "b" becomes least recently used
+        self.cache.get("a")
+        self.cache.set("d", "d")
+
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), "a")
+        self.assertEqual(self.cache.get("d"), "d")
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_lru_eviction_by_bytes(self):
+        self.cache.set("a", "x" * 40)
+        self.cache.set("b", "x" * 40)
+        self.cache.set("c", "x" * 40)
+
+        self.assertIsNone(self.cache.get("a"))
+        self.assertLessEqual(self.cache.stats()['bytes'], 100)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+        with self.subTest("Value larger than budget is not cached"):
+            self.cache.set("big", "x" * 200)
+            self.assertIsNone(self.cache.get("big"))
@@ -0,0 +1,98 @@
+"""URL validator tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/util/test_url_validator.py
+#   python -m unittest discover tests/util/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import os
+import logging
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+
+# BEFORE we import our app, let's set an environmental variable
+# to use a different database for tests (we need to do this
+# before we import our app, since that will have already
+# connected to the database
+os.environ['DATABASE_URL'] = "postgresql:///newsmart-test"
+
+# Now we can import app
+from app import app, newsmart
+from base_api_session import HEAD_TIMEOUT
+from url_validator import UrlValidator
+
+app.testing = True
+
+logging.disable(logging.CRITICAL)   # Disable logging
+
+
+class UrlValidatorTestCase(TestCase):
+
+    def setUp(self):
+        self.validator = UrlValidator(newsmart)
+        newsmart.served_urls.clear()
+
+    def tearDown(self):
+        newsmart.served_urls.clear()
+
+    def test_served_urls_are_trusted(self):
+        newsmart.remember_served([{"url": "http://www.served.com/story"}])
+
+        with patch.object(newsmart, "check_url") as check_url:
+            self.assertTrue(self.validator.is_valid("http://www.served.com/story"))
+        check_url.assert_not_called()
+        self.assertEqual(self.validator.stats()['trusted'], 1)
+
+    def test_one_head_per_host(self):
+        urls = ["http://www.up.com/1", "http://WWW.UP.COM/2",
+                "https://www.down.com/1", "ftp://www.up.com/3"]
+
+        def check_url(url, timeout):
+            return "down" not in url
+
+        with patch.object(newsmart, "check_url", side_effect=check_url) as head:
+            self.assertDictEqual(self.validator.validate(urls), {
+                "http://www.up.com/1": True,
+                "http://WWW.UP.COM/2": True,
+                "https://www.down.com/1": False,
+                "ftp://www.up.com/3": False,
+            })
+            self.assertEqual(head.call_count, 2)
+
+            with self.subTest("Results are cached, including negative ones"):
+                self.assertTrue(self.validator.is_valid("http://www.up.com/4"))
+                self.assertFalse(self.validator.is_valid("https://www.down.com/2"))
+                self.assertEqual(head.call_count, 2)
+
+    def test_head_skips_api_guards(self):
+        with patch.object(newsmart.head_http, "head") as head, \
+                patch.object(newsmart.http, "request") as request:
+            self.assertTrue(newsmart.isUrlValid("http://www.site.com/1", timeout=10))
+        request.assert_not_called()
+        self.assertEqual(head.call_args[1]['timeout'], HEAD_TIMEOUT)
+        self.assertNotIn("www.site.com", newsmart.circuit_breaker.stats())
+
+    def test_head_has_own_pools(self):
+        self.assertIsNot(newsmart.head_http, newsmart.http)
+        self.assertIsNot(newsmart.head_http.get_adapter("https://newsapi.org"),
+                         newsmart.http.get_adapter("https://newsapi.org"))
+
+    def test_head_errors(self):
+        url = "http://www.site.com/1"
+        for error, valid in ((requests.ConnectionError("down"), False),
+                             (requests.ReadTimeout("slow"), True)):
+            with self.subTest(type(error).__name__), \
+                    patch.object(newsmart.head_http, "head", side_effect=error):
+                self.assertEqual(newsmart.isUrlValid(url), valid)
+
+    def test_inconclusive_checks_are_not_cached(self):
+        url = "http://www.slow.com/1"
+        with patch.object(newsmart.head_http, "head",
+                          side_effect=requests.ReadTimeout("slow")) as head:
+            self.assertTrue(self.validator.is_valid(url, timeout=10))
+            self.assertTrue(self.validator.is_valid(url))
+        self.assertEqual(head.call_count, 2)
+        self.assertLessEqual(head.call_args[1]['timeout'], HEAD_TIMEOUT)
+        self.assertIsNone(self.validator.hosts.get("http://www.slow.com"))
@@ -0,0 +1,101 @@
+"""Current user context tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/util/test_user_context.py
+#   python -m unittest discover tests/util/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import os
+import logging
+from unittest import TestCase
+
+# BEFORE we import our app, let's set an environmental variable
+# to use a different database for tests (we need to do this
+# before we import our app, since that will have already
+# connected to the database
+os.environ['DATABASE_URL'] = "postgresql:///newsmart-test"
+
+# Now we can import app
+from app import app
+from models import Category, User, UserCategory, db
+from user_context import CurrentUser, load_current_user, user_cache
+
+# Create our tables (we do this here, so we only create the tables
+# once for all tests --- in each test, we'll delete the data
+# and create fresh new clean test data
+
+db.create_all()
+
+app.testing = True
+
+logging.disable(logging.CRITICAL)   # Disable logging
+
+
+class UserContextTestCase(TestCase):
+
+    def setUp(self):
+        """Remove existing users, create sample user and categories"""
+
+        User.query.delete()
+        Category.query.delete()
+        user_cache.clear()
+
+        category1 = Category.new("test1")
+        category2 = Category.new("test2")
+        user = User.register(
+            "test", "raw_password", "test@test.com",
+            "Test", "User"
+        )
+        UserCategory.new(user.id, category1.id)
+
+        # keep track of id reference instead of db reference
+        self.category1_id = category1.id
+        self.category2_id = category2.id
+        self.user_id = user.id
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def test_load_current_user(self):
+        current_user = load_current_user(self.user_id)
+
+        self.assertIsInstance(current_user, CurrentUser)
+        self.assertEqual(current_user.id, self.user_id)
+        self.assertEqual(current_user.username, "test")
+        self.assertEqual(current_user.category_ids, (self.category1_id,))
+        self.assertEqual(current_user.category_names, ("test1",))
+
+        with self.subTest("Cached while version is unchanged"):
+            self.assertIs(load_current_user(self.user_id), current_user)
+
+        with self.subTest("Immutable"):
+            with self.assertRaises(AttributeError):
+                current_user.username = "changed"
+
+    def test_invalidated_on_change(self):
+        current_user = load_current_user(self.user_id)
+
+        UserCategory.new(self.user_id, self.category2_id)
+        updated_user = load_current_user(self.user_id)
+
+        self.assertIsNot(updated_user, current_user)
+        self.assertGreater(updated_user.version, current_user.version)
+        self.assertEqual(updated_user.category_ids,
+                         (self.category1_id, self.category2_id))
+
+        with self.subTest("Removed categories"):
+            UserCategory.remove_user(self.user_id)
+            self.assertEqual(load_current_user(self.user_id).category_ids, ())
+
+        with self.subTest("Updated username"):
+            User.update("test", "renamed", "raw_password")
+            self.assertEqual(load_current_user(self.user_id).username, "renamed")
+
+    def test_missing_user(self):
+        self.assertIsNone(load_current_user(self.user_id + 1))
+
+    def test_model(self):
+        with app.test_request_context():
+            current_user = load_current_user(self.user_id)
+            self.assertIs(current_user.model, User.query.get(self.user_id))
+            self.assertEqual(current_user.model.email, "test@test.com")
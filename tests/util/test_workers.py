@@ -0,0 +1,45 @@
+"""Background worker tests."""
+
+# from newsmart/, run this test like:
+#   python -m unittest tests/util/test_workers.py
+#   python -m unittest discover tests/util/
+# Note: This is necessary to avoid relative/absolute import based on path.
+
+import threading
+from unittest import TestCase
+
+from workers import BackgroundWorker
+
+
+class CountingWorker(BackgroundWorker):
+    thread_name = "counting-worker"
+
+    def __init__(self, interval):
+        super().__init__()
+        self.interval = interval
+        self.polls = 0
+        self.polled = threading.Event()
+
+    def enabled(self):
+        return self.interval > 0
+
+    def _poll(self):
+        self.polls += 1
+        self.polled.set()
+
+
+class BackgroundWorkerTestCase(TestCase):
+
+    def test_start_once_per_process(self):
+        worker = CountingWorker(interval=1)
+        worker.start()
+        worker.start()
+
+        self.assertTrue(worker.polled.wait(1))
+        self.assertEqual(worker.polls, 1)
+
+    def test_disabled_worker(self):
+        worker = CountingWorker(interval=0)
+        worker.start()
+
+        self.assertFalse(worker.polled.wait(0.05))
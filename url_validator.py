@@ -0,0 +1,99 @@
+import threading
+import urllib.parse
+
+from base_api_session import HEAD_TIMEOUT
+from cache import TTLCache
+
+
+class UrlValidator:
+    """
+    Decide whether article urls are worth storing without a HEAD request
+    per bookmark: urls served in a news feed recently are trusted, HEAD
+    results are cached per host, including unreachable hosts, and urls
+    of unknown hosts are checked with one HEAD per host concurrently.
+    Note: check_url only fails for unreachable hosts, so its result holds
+        for every url of the host; checks that said nothing of the host,
+        e.g. timeouts, are not cached.
+    """
+
+    def __init__(self, newsmart, ttl=24 * 60 * 60, negative_ttl=600,
+                 max_entries=4096):
+        self.newsmart = newsmart
+        self.negative_ttl = negative_ttl
+        # host -> whether it answered a HEAD request
+        self.hosts = TTLCache(ttl=ttl, max_entries=max_entries)
+        self.trusted = 0
+        self.cached = 0
+        self.checked = 0
+        self._lock = threading.Lock()
+
+    def is_valid(self, url, timeout=HEAD_TIMEOUT):
+        """Return True if url is valid; otherwise False."""
+        return self.validate([url], timeout)[url]
+
+    def validate(self, urls, timeout=HEAD_TIMEOUT):
+        """
+        Return a dictionary of url to whether it is valid; hosts that could
+        not be checked within timeout are given the benefit of the doubt,
+        as isUrlValid does for timeouts.
+        Note: each HEAD waits at most HEAD_TIMEOUT whatever the timeout.
+        """
+        results, pending = dict(), dict()
+        for url in urls:
+            if self.newsmart.served_urls.get(url):
+                results[url] = True
+                self._count("trusted")
+                continue
+            host = UrlValidator.host(url)
+            if host is None:
+                results[url] = False
+                continue
+            valid = self.hosts.get(host)
+            if valid is not None:
+                results[url] = valid
+                self._count("cached")
+                continue
+            pending.setdefault(host, []).append(url)
+
+        if pending:
+            checked = self.newsmart.run_concurrently({
+                host: (self._check, {"url": host_urls[0]})
+                for host, host_urls in pending.items()
+            }, timeout)
+            for host, host_urls in pending.items():
+                valid = checked.get(host)
+                self._count("checked")
+                if valid is not None:
+                    self.hosts.set(host, valid, ttl=None if valid else self.negative_ttl)
+                results.update((url, valid is not False) for url in host_urls)
+
+        return results
+
+    @staticmethod
+    def host(url):
+        """Return scheme and host of an http(s) url; None if url is not one."""
+        try:
+            parts = urllib.parse.urlsplit(url)
+        except ValueError:
+            return None
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            return None
+        return f"{parts.scheme}://{parts.netloc.lower()}"
+
+    def stats(self):
+        """Return a snapshot of validation counters and host cache usage."""
+        with self._lock:
+            return {
+                "trusted": self.trusted,
+                "cached": self.cached,
+                "checked": self.checked,
+                "hosts": self.hosts.stats(),
+            }
+
+    def _check(self, url, timeout):
+        # None if the check said nothing of the host
+        return self.newsmart.check_url(url, timeout=timeout)
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
@@ -0,0 +1,81 @@
+import os
+
+from flask import g
+
+from cache import TTLCache
+from models import Category, User, UserCategory, db
+
+
+class CurrentUser:
+    """
+    Lean, immutable view of the logged in user kept in g.user;
+    relationships are only loaded by views that need them via model.
+    """
+    __slots__ = ("id", "username", "category_ids", "category_names", "version")
+
+    def __init__(self, id, username, category_ids, category_names, version):
+        object.__setattr__(self, "id", id)
+        object.__setattr__(self, "username", username)
+        object.__setattr__(self, "category_ids", category_ids)
+        object.__setattr__(self, "category_names", category_names)
+        object.__setattr__(self, "version", version)
+
+    def __setattr__(self, name, value):
+        # instances are shared by every request of this worker
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    @property
+    def model(self):
+        """Full user object for views that need relationships; loaded once per request."""
+        if "user_model" not in g:
+            g.user_model = User.query.get(self.id)
+        return g.user_model
+
+    def __repr__(self):
+        return (f"<CurrentUser: id={self.id} username='{self.username}' "
+                f"category_ids={self.category_ids} version={self.version}>")
+
+
+# per-worker cache of user id -> CurrentUser, invalidated by users.data_version
+user_cache = TTLCache(ttl=None,
+                      max_entries=int(os.environ.get("USER_CACHE_SIZE", 1024)))
+
+
+def load_current_user(user_id):
+    """
+    Return CurrentUser for user_id from the per-worker cache when its
+    version stamp is current; otherwise rebuild it. Return None if the
+    user does not exist.
+    """
+    version = (
+        db.session.query(User.data_version).filter(User.id == user_id).scalar()
+    )
+    if version is None:
+        user_cache.delete(user_id)
+        return None
+
+    current_user = user_cache.get(user_id)
+    if current_user is not None and current_user.version == version:
+        return current_user
+
+    rows = (
+        db.session.query(User.username, User.data_version, Category.id, Category.name)
+                  .outerjoin(UserCategory, UserCategory.user_id == User.id)
+                  .outerjoin(Category, Category.id == UserCategory.category_id)
+                  .filter(User.id == user_id)
+                  .order_by(UserCategory.id)
+                  .all()
+    )
+    if not rows:
+        return None
+
+    categories = [(row.id, row.name) for row in rows if row.id is not None]
+    current_user = CurrentUser(
+        id=user_id,
+        username=rows[0].username,
+        category_ids=tuple(category_id for category_id, _ in categories),
+        category_names=tuple(name for _, name in categories),
+        version=rows[0].data_version,
+    )
+    user_cache.set(user_id, current_user)
+    return current_user
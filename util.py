@@ -1,9 +1,12 @@
 import logging
+import urllib.parse
 from functools import wraps
 
 from flask import flash, g, jsonify, redirect, session
 
 CURR_USER_KEY = "curr_user"
+# query parameters that only track the visitor and never change the page
+TRACKING_PARAMS = {"fbclid", "gclid", "ocid", "cmpid", "ref", "smid"}
 
 
 def do_login(user):
@@ -38,6 +41,32 @@ def login_required(redirect_url="/", isJSON=False):
     return _login_required
 
 
+def canonical_url(url):
+    """
+    Normalize url so the same article shared through different links maps
+    to one key: lowercase scheme and host, drop default ports, fragments,
+    tracking parameters and trailing slashes, and sort the query.
+    """
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    try:
+        port = parts.port
+    except ValueError:
+        # malformed port, e.g. out of range; keep the netloc as it is
+        port = None
+    if (scheme, port) in (("http", 80), ("https", 443)):
+        netloc = netloc.rsplit(":", 1)[0]
+    query = sorted(
+        (key, value)
+        for key, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urllib.parse.urlunsplit(
+        (scheme, netloc, path, urllib.parse.urlencode(query), ""))
+
+
 def new_logger(name="logger"):
     # create logger
     logger = logging.getLogger(name)
@@ -0,0 +1,40 @@
+import os
+import threading
+from contextlib import nullcontext
+
+from flask import has_app_context
+
+
+class BackgroundWorker:
+    """
+    Base of workers polling in a daemon thread of each worker process.
+    Subclasses name their thread, implement _poll and tell whether they
+    are enabled by their settings.
+    """
+    thread_name = "background-worker"
+
+    def __init__(self, app=None):
+        self.app = app
+        self._pid = None
+
+    def start(self):
+        """Start polling in this process; safe to call repeatedly."""
+        if self._pid == os.getpid() or not self.enabled():
+            return
+        self._pid = os.getpid()
+        threading.Thread(target=self._poll, name=self.thread_name,
+                         daemon=True).start()
+
+    def enabled(self):
+        """Return True if start should run the poller."""
+        return True
+
+    def _app_context(self):
+        """
+        Return a new app context unless one is active; popping an app
+        context removes its db session, which would detach the caller's objects.
+        """
+        return nullcontext() if has_app_context() else self.app.app_context()
+
+    def _poll(self):
+        raise NotImplementedError